@@ -44,6 +44,7 @@ setup(
             # noobit main module
             'noobit-aggregate=noobit.cli:aggregate_historical_trades',
             'noobit-feedhandler=noobit.cli:run_feedhandler',
+            'noobit-replay=noobit.cli:run_replay',
             'noobit-server=noobit.cli:run_server',
             'noobit-stratrunner=noobit.cli:run_stratrunner',
             'noobit-backtester=noobit.cli:run_backtester',
@@ -1,19 +1,24 @@
+import os
 import sys
 import asyncio
+from datetime import timezone
 from importlib import import_module
 import cProfile
 
 
 import yappi
 import click
-import httpx
 
 from noobit.engine.strat_runner import StratRunner
 from noobit.engine.backtest_runner import BackTestRunner
 from noobit.logger.structlogger import get_logger, log_exception
-from noobit.exchanges.mappings import rest_api_map
 from noobit.processor.feed_handler import FeedHandler
+from noobit.processor.supervisor import FeedHandlerSupervisor, plan_shards
+from noobit.processor.replay import ReplayServer
+from noobit.exchanges.base.rest.trade_downloader import TradeDownloader
 from noobit.server import main_server
+from noobit.server import settings
+from noobit_user import get_abs_path
 
 
 from noobit.models.data.base.types import PAIR, TIMEFRAME
@@ -23,11 +28,21 @@ logger = get_logger(__name__)
 
 @click.command()
 @click.option("--exchange", "-e", default="kraken", help="Lowercase exchange")
-@click.option("--symbol", "-s", required=True, help="Dash-separated lowercase pair")
-def aggregate_historical_trades(exchange, symbol):
-    api = rest_api_map[exchange]()
-    api.session = httpx.AsyncClient()
-    asyncio.run(api.aggregate_historical_trades(symbol=symbol.upper()))
+@click.option("--symbols", "-s", multiple=True, required=True, help="Dash-separated pairs, downloaded concurrently")
+@click.option("--ranges", "-r", type=int, default=4, help="Time ranges of a symbol downloaded concurrently")
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="UTC day to start a first download from, defaults to the first trade of each symbol")
+def aggregate_historical_trades(exchange, symbols, ranges, start):
+    async def aggregate():
+        try:
+            api = settings.CLIENTS.api(exchange)
+            downloader = TradeDownloader(api, ranges=ranges)
+            start_ns = None if start is None else int(start.replace(tzinfo=timezone.utc).timestamp()) * 10**9
+            counts = await downloader.download([symbol.upper() for symbol in symbols], start=start_ns)
+            logger.info(f"Downloaded trades : {counts}")
+        finally:
+            await settings.CLIENTS.shutdown()
+
+    asyncio.run(aggregate())
     # try:
     #     asyncio.run(api.aggregate_historical_trades(symbol=pair))
     # except KeyboardInterrupt:
@@ -41,12 +56,46 @@ def aggregate_historical_trades(exchange, symbol):
 @click.option("--symbols", "-s", multiple=True, default=["XBT-USD", "ETH-USD"], help="dash-separated uppercase pairs")
 @click.option("--private_feeds", "-prf", multiple=True, default=["trade", "order"], help="Private feeds to subscribe to")
 @click.option("--public_feeds", "-puf", multiple=True, default=["instrument", "trade", "orderbook", "spread"], help="Public feeds to subscribe to")
-def run_feedhandler(exchanges, symbols, private_feeds, public_feeds):
+@click.option("--orderbook_mode", "-obm", type=click.Choice(["full", "diff"]), default="full", help="Publish full orderbook or diffs + periodic snapshots")
+@click.option("--stream_validation", "-sv", type=click.Choice(["always", "sampled", "never"]), default="always", help="Pydantic validation of public stream data")
+@click.option("--numeric", "-n", type=click.Choice(["decimal", "float", "fixed"]), default="decimal", help="Numeric representation of trades and spreads when stream validation is not 'always'")
+@click.option("--publish_batch_size", "-pbs", type=int, default=100, help="Max redis publishes per pipeline (1 disables batching)")
+@click.option("--publish_delay", "-pd", type=float, default=0.005, help="Max seconds a redis publish waits in the batch")
+@click.option("--queue_size", "-qs", type=int, default=10000, help="Max pending websocket messages per connection")
+@click.option("--queue_workers", "-qw", type=int, default=1, help="Message handling tasks per connection")
+@click.option("--public_overflow", "-po", type=click.Choice(["block", "drop_oldest"]), default="drop_oldest", help="Public queue overflow policy (private messages are never dropped)")
+@click.option("--symbols_per_shard", "-sps", type=int, default=0, help="Run one process per (exchange, feed, group of n symbols), 0 runs everything in a single process")
+@click.option("--record", "-r", is_flag=True, default=False, help="Record public trades, spreads and orderbook diffs to parquet files")
+@click.option("--record_dir", "-rd", default=None, help="Root directory of recorded data (defaults to user data dir)")
+@click.option("--public_ws_uri", "-uri", default=None, help="Override public websocket uri (e.g ws://localhost:8765 for replay)")
+def run_feedhandler(exchanges, symbols, private_feeds, public_feeds, orderbook_mode, stream_validation, numeric,
+                    publish_batch_size, publish_delay, queue_size, queue_workers, public_overflow, symbols_per_shard,
+                    record, record_dir, public_ws_uri):
+    feedhandler_kwargs = dict(orderbook_mode=orderbook_mode,
+                              stream_validation=stream_validation,
+                              numeric=numeric,
+                              publish_batch_size=publish_batch_size,
+                              publish_delay=publish_delay,
+                              queue_size=queue_size,
+                              queue_workers=queue_workers,
+                              public_overflow=public_overflow,
+                              record=record,
+                              record_dir=record_dir,
+                              public_ws_uri=public_ws_uri
+                              )
+    pairs = [symbol.upper() for symbol in symbols]
     try:
+        if symbols_per_shard:
+            shards = plan_shards(exchanges, private_feeds, public_feeds, pairs, symbols_per_shard)
+            supervisor = FeedHandlerSupervisor(shards, feedhandler_kwargs=feedhandler_kwargs)
+            supervisor.run()
+            return
+
         fh = FeedHandler(exchanges=exchanges,
                          private_feeds=private_feeds,
                          public_feeds=public_feeds,
-                         pairs=[symbol.upper() for symbol in symbols]
+                         pairs=pairs,
+                         **feedhandler_kwargs
                          )
         fh.run()
     except KeyboardInterrupt:
@@ -55,6 +104,24 @@ def run_feedhandler(exchanges, symbols, private_feeds, public_feeds):
         log_exception(logger, e)
 
 
+@click.command()
+@click.option("--exchange", "-e", default="kraken", help="Lowercase exchange")
+@click.option("--record_dir", "-rd", default=None, help="Root directory of recorded data (defaults to user data dir)")
+@click.option("--speed", type=float, default=1, help="Replay speed multiplier, 0 for as fast as possible")
+@click.option("--start_date", "-sd", default=None, help="First day to replay (YYYY-MM-DD)")
+@click.option("--end_date", "-ed", default=None, help="Last day to replay (YYYY-MM-DD)")
+@click.option("--host", "-h", default="localhost", help="Host adress")
+@click.option("--port", "-p", default=8765, help="Host port")
+def run_replay(exchange, record_dir, speed, start_date, end_date, host, port):
+    server = ReplayServer(root=record_dir or os.path.join(get_abs_path(), "data", "market"),
+                          exchange=exchange,
+                          speed=speed,
+                          start_date=start_date,
+                          end_date=end_date
+                          )
+    server.run(host=host, port=port)
+
+
 @click.command()
 @click.option("--host", "-h", default="localhost", help="Host adress")
 @click.option("--port", "-p", default=8000, help="Host port")
@@ -0,0 +1,135 @@
+"""
+Indicators that keep their state across ticks
+
+Plain indicator functions (for ex TA-Lib) are computed again over the whole lookback window
+on every tick (see StratBase.calculate_indicator), recursive ones are then seeded from the
+start of the window and drift as it slides.
+Incremental indicators only process the new or changed bars of each tick, from their state at
+the last closed bar, so they give the same values as over the full history.
+
+Usage:
+    self.add_indicator(func=EMA(timeperiod=20), source="close")
+"""
+import math
+from typing import Any, Tuple
+
+import numpy as np
+
+
+class IncrementalIndicator():
+    """
+    Subclasses define initial_state() and step(state, value) ==> (new state, output value)
+
+    Notes:
+        The last value of each update belongs to the still open bar, its output is computed
+        from the state of the previous bar but not kept, so the open bar can change until it closes.
+    """
+
+    def __init__(self):
+        # column name in the strategy dataframe, as for indicator functions
+        self.__name__ = type(self).__name__
+        self.reset()
+
+
+    def reset(self):
+        # state after the last closed value
+        self._state = self.initial_state()
+
+
+    def initial_state(self) -> Any:
+        raise NotImplementedError
+
+
+    def step(self, state: Any, value: float) -> Tuple[Any, float]:
+        raise NotImplementedError
+
+
+    def update(self, values, rows: int = None) -> np.ndarray:
+        """Outputs of the last <rows> values
+
+        Args:
+            values: source values, the first of the last <rows> follows the last closed value
+                of the previous update
+            rows: number of new or changed values, None (or all values) to start over
+        """
+        values = np.asarray(values, dtype="float64")
+        if rows is None or rows >= len(values):
+            self.reset()
+            rows = len(values)
+
+        outputs = np.full(rows, np.nan)
+        if not rows:
+            return outputs
+
+        state = self._state
+        for i, value in enumerate(values[len(values) - rows:-1]):
+            state, outputs[i] = self.step(state, value)
+        self._state = state
+
+        _, outputs[-1] = self.step(state, values[-1])
+        return outputs
+
+
+
+
+class EMA(IncrementalIndicator):
+    """Exponential moving average, seeded with the simple average of the first <timeperiod> values (as TA-Lib)"""
+
+    def __init__(self, timeperiod: int = 30):
+        self.timeperiod = timeperiod
+        self.alpha = 2 / (timeperiod + 1)
+        super().__init__()
+
+
+    def initial_state(self):
+        # (values seen, running sum until seeded then average)
+        return (0, 0.)
+
+
+    def step(self, state, value):
+        count, average = state
+        count += 1
+        if count < self.timeperiod:
+            return (count, average + value), math.nan
+        if count == self.timeperiod:
+            average = (average + value) / self.timeperiod
+        else:
+            average += self.alpha * (value - average)
+        return (count, average), average
+
+
+
+
+class RSI(IncrementalIndicator):
+    """Relative strength index with Wilder smoothing (as TA-Lib)"""
+
+    def __init__(self, timeperiod: int = 14):
+        self.timeperiod = timeperiod
+        super().__init__()
+
+
+    def initial_state(self):
+        # (previous value, changes seen, average gain, average loss)
+        return (None, 0, 0., 0.)
+
+
+    def step(self, state, value):
+        previous, count, gain, loss = state
+        if previous is None:
+            return (value, 0, 0., 0.), math.nan
+
+        change = value - previous
+        count += 1
+        n = self.timeperiod
+        if count <= n:
+            # simple average of the first <timeperiod> changes
+            gain += max(change, 0) / n
+            loss += max(-change, 0) / n
+        else:
+            gain = (gain * (n - 1) + max(change, 0)) / n
+            loss = (loss * (n - 1) + max(-change, 0)) / n
+
+        state = (value, count, gain, loss)
+        if count < n:
+            return state, math.nan
+        return state, 0. if gain + loss == 0 else 100 * gain / (gain + loss)
@@ -1,19 +1,24 @@
 import os
+import time
 import asyncio
 import inspect
 import copy
 
-import httpx
 import ujson
 import websockets
+import aioredis
+import numpy as np
 import pandas as pd
 
 
 from noobit.logger.structlogger import get_logger, log_exception
-from noobit.exchanges.mappings import rest_api_map
+from noobit.server import settings
 
 from noobit_user import get_abs_path
 from noobit.engine import backtrader_extension
+from noobit.processor.trade_store import TradeStore, to_records
+from noobit.processor.bar_cache import BarCache, TIMEFRAMES, from_frame
+from noobit.engine.base.indicators import IncrementalIndicator
 
 # models
 from noobit.models.data.base.types import PAIR
@@ -28,6 +33,19 @@ WS_URI_MAP = {
 }
 
 
+def cross(x: np.ndarray, y, up: bool) -> np.ndarray:
+    """Rows of x, from the second one, where x crosses above (up) or under y
+
+    Args:
+        x: values
+        y: values of same length as x, or a single value
+    """
+    y = np.broadcast_to(y, x.shape)
+    if up:
+        return (x[1:] > y[1:]) & (x[:-1] < y[:-1])
+    return (x[1:] < y[1:]) & (x[:-1] > y[:-1])
+
+
 class StratBase():
     """
     Syntax should be similar to Tradingview
@@ -56,7 +74,7 @@ class StratBase():
     where self.execution is an instance subclassing BaseExecution
     """
 
-    def __init__(self, description: str, exchange: str, symbol: PAIR, timeframe: int, volume: int):
+    def __init__(self, description: str, exchange: str, symbol: PAIR, timeframe: int, volume: int, lookback: int = 720):
 
         self.name = os.path.basename(inspect.getmodule(self).__file__).split(".")[0]
         self.description = description
@@ -69,13 +87,28 @@ class StratBase():
         self.symbol = symbol.upper()
         self.timeframe = timeframe
         self.volume = volume
+        # number of bars kept in self.df when running live, indicators are computed over this window
+        self.lookback = lookback
 
-        self.api = rest_api_map[exchange]()
-        self.api.session = httpx.AsyncClient()   # or settings.SESSION if not None
+        # shared with other strategies, session is closed by the registry
+        self.api = settings.CLIENTS.api(exchange)
 
         self.df = None
         self.parameters = None      #! new
 
+        # live bars of our timeframe, seeded from rest ohlc then built from the public trade stream
+        # (other timeframes would only hold trades received since we subscribed)
+        self.bars = BarCache(os.path.join(get_abs_path(), "data", "bars", "live"),
+                             self.exchange,
+                             self.symbol,
+                             timeframes=[self.timeframe]
+                             )
+        # ns timestamp of the last rest seed, older trades are already in the seeded bars
+        self.seeded_at = None
+        self.aioredis_pool = None
+        self.trade_channel = None
+        self._new_trades = []
+
         self.should_exit = False
 
         self._tick_coros = []
@@ -147,6 +180,26 @@ class StratBase():
 
 
 
+    async def subscribe_to_trades(self):
+        """Subscribe to public trades published by the feed handler, to update bars without polling the rest api
+        """
+        self.aioredis_pool = await aioredis.create_redis_pool('redis://localhost')
+        subd_chan = await self.aioredis_pool.psubscribe(f"ws:public:data:trade:update:{self.exchange}:{self.symbol}")
+        # subscription always returns a list
+        self.trade_channel = subd_chan[0]
+
+
+
+    async def on_trade_update(self):
+        """Buffer public trades, they are added to bars on the next tick
+        """
+        async for _chan, msg in self.trade_channel.iter():
+            if self.should_exit:
+                break
+            self._new_trades.append(ujson.loads(msg.decode("utf-8")))
+
+
+
     async def register_to_db(self):
         """register strategy into db
         check if strategy table contains our strategy
@@ -178,11 +231,69 @@ class StratBase():
 
 
     async def setup_df(self):
-        self.df = await self.get_ohlc()
+        await self.seed_bars()
+        self.df = None
+        self.update_window()
+
+
+    async def seed_bars(self):
+        """Seed cached bars of our timeframe with rest api ohlc, fills the gap since the last run
+        """
+        ohlc = await self.get_ohlc()
+        if ohlc is not None:
+            # last bar is still open, trades received from now on are merged into it
+            self.seeded_at = time.time_ns()
+            self.bars.seed(self.timeframe, from_frame(ohlc))
 
 
-    async def update_df(self):
-        self.df = await self.get_ohlc()
+    async def update_df(self) -> int:
+        """Add new trades to cached bars and slide self.df to the last bars
+
+        Returns:
+            int: number of rows at the end of self.df that are new or changed
+        """
+        if self.trade_channel is None:
+            # no trade stream, poll the rest api
+            await self.seed_bars()
+        else:
+            trades, self._new_trades = self._new_trades, []
+            if self.seeded_at is not None:
+                trades = [trade for trade in trades if int(trade["transactTime"]) > self.seeded_at]
+            try:
+                self.bars.add_trades(to_records(trades))
+            except Exception as e:
+                log_exception(logger, e)
+
+        return self.update_window()
+
+
+    def update_window(self) -> int:
+        """Append bars that are not in self.df yet, keeping its last <lookback> rows only
+
+        Rows already in self.df keep their indicator and cross values,
+        new rows have them set by the next calculation (see on_tick)
+
+        Returns:
+            int: number of rows at the end of self.df that are new or changed
+        """
+        bars = self.bars.to_frame(self.timeframe, count=self.lookback)
+        if self.df is None or not len(self.df):
+            self.df = bars
+            return len(bars)
+
+        # the last bar we had may still have been open
+        start = self.df.index[-1]
+        new_bars = bars[bars.index >= start]
+        self.df = pd.concat([self.df[self.df.index < start], new_bars]).iloc[-self.lookback:]
+        return len(new_bars)
+
+
+    def _set_column(self, name: str, values, rows: int = None):
+        """Set column of self.df, or only its last <rows> values if the column exists"""
+        if rows is None or name not in self.df.columns or rows >= len(self.df):
+            self.df[name] = values
+        elif rows:
+            self.df.iloc[-rows:, self.df.columns.get_loc(name)] = np.asarray(values)[-rows:]
 
 
     async def get_ohlc(self):
@@ -213,21 +324,35 @@ class StratBase():
 
 
 
-    def calculate_indicator(self, func, source, **kwargs):
+    def calculate_indicators(self, rows: int = None):
+        for func_args in self._tick_args:
+            self.calculate_indicator(**func_args, rows=rows)
+
+
+
+    def calculate_indicator(self, func, source, rows: int = None, **kwargs):
         """
         Args:
-            talib_func: TA-Lib function
+            talib_func: TA-Lib function, or IncrementalIndicator instance
             source: column of self.ohlc we want to use as input
+            rows: only update the last rows (new bars), all rows if None
             kwargs: kwargs specific to TA-Lib function
 
         Notes:
         add signals into the instance data dataframe
+        functions are computed again over the whole lookback window (only the last rows are kept),
+        incremental indicators only process the last rows from their state (see engine.base.indicators)
 
         Example:
         self.add_signals(talib.MAMA, "close", fastlimit=0.5, slowlimit=0.05)
         """
         try:
-            result = func(self.df[source], **kwargs)
+            if isinstance(func, IncrementalIndicator):
+                result = func.update(self.df[source], rows)
+                if len(result) < len(self.df) and func.__name__ not in self.df.columns:
+                    result = np.r_[np.full(len(self.df) - len(result), np.nan), result]
+            else:
+                result = func(self.df[source], **kwargs)
         except Exception as e:
             log_exception(logger, e)
         i = 0
@@ -236,15 +361,69 @@ class StratBase():
             if isinstance(result, tuple):
                 for item in result:
                     col_name = f"{func_name}{i}"
-                    self.df[col_name] = item
+                    self._set_column(col_name, item, rows)
                     i += 1
             else:
-                self.df[func_name] = result
+                self._set_column(func_name, result, rows)
         except Exception as e:
             log_exception(logger, e)
 
 
 
+    # ================================================================================
+    # ==== CROSS
+    # ================================================================================
+
+
+    def calculate_crosses(self, rows: int = None):
+        """Calculate all registered crosses in one pass over numpy arrays, and set their columns at once
+
+        Args:
+            rows: only calculate the last rows (new bars), all rows if None
+        """
+        crosses = self._crosses()
+        if not crosses:
+            return
+
+        length = len(self.df)
+        if rows is None or rows >= length or not all(name in self.df.columns for name, *_ in crosses):
+            rows = length
+        if not rows:
+            return
+
+        # a cross only depends on the previous row, so we only need the new rows and the one before
+        start = max(length - rows - 1, 0)
+        arrays = {}
+
+        signals = {}
+        for name, col, other, up in crosses:
+            for source in (col, other):
+                if isinstance(source, str) and source not in arrays:
+                    arrays[source] = self.df[source].to_numpy(dtype="float64")[start:]
+
+            signal = np.zeros(length, dtype=bool)
+            if rows < length:
+                signal[:-rows] = self.df[name].to_numpy()[:-rows].astype(bool)
+            values = cross(arrays[col], arrays[other] if isinstance(other, str) else other, up)
+            signal[length - len(values):] = values
+            signals[name] = signal
+
+        self.df = self.df.assign(**signals)
+
+
+
+    def _crosses(self) -> list:
+        """(column name, col, other column or value, crosses up) of all registered crosses"""
+        return [
+            *[(f"CROSSUP_{col1}_{col2}", col1, col2, True) for col1, col2 in self._crossups_to_calc],
+            *[(f"CROSSDOWN_{col1}_{col2}", col1, col2, False) for col1, col2 in self._crossdowns_to_calc],
+            *[(f"CROSSOVER_{col}_{value}", col, value, True) for col, value in self._crossovers_to_calc],
+            *[(f"CROSSUNDER_{col}_{value}", col, value, False) for col, value in self._crossunders_to_calc],
+        ]
+
+
+
+
     # ================================================================================
     # ==== CROSS UP
     # ================================================================================
@@ -258,23 +437,11 @@ class StratBase():
 
 
 
-    def calculate_crossups(self):
-        for i in self._crossups_to_calc:
-            self.df = self.crossup(col1=i[0], col2=i[1], df=self.df)
-
-
-
     def crossup(self, col1: str, col2: str, df):
         """
         when col1 crosses above col2
         """
-        # df = await df_coro
-        # we need all values on one row to use df masks
-        df[f"previous_{col1}"] = df[col1].shift(1)
-        df[f"previous_{col2}"] = df[col2].shift(1)
-
-        df[f"CROSSUP_{col1}_{col2}"] = ((df[col1] > df[col2]) & (df[f"previous_{col1}"] < df[f"previous_{col2}"]))
-        df = df.drop(columns=[f"previous_{col1}", f"previous_{col2}"], axis=1)
+        df[f"CROSSUP_{col1}_{col2}"] = np.r_[False, cross(df[col1].to_numpy(dtype="float64"), df[col2].to_numpy(dtype="float64"), True)]
         return df
 
 
@@ -287,28 +454,17 @@ class StratBase():
 
     def add_crossdown(self, col1: str, col2: str):
         """
-        add crossup of cols to df
+        add crossdown of cols to df
         """
         self._crossdowns_to_calc.append((col1, col2))
 
 
 
-    def calculate_crossdowns(self):
-        for i in self._crossdowns_to_calc:
-            self.df = self.crossdown(col1=i[0], col2=i[1], df=self.df)
-
-
-
     def crossdown(self, col1: str, col2: str, df):
         """
         when col1 crosses under col2
         """
-        # we need all values on one row to use df masks
-        df[f"previous_{col1}"] = df[col1].shift(1)
-        df[f"previous_{col2}"] = df[col2].shift(1)
-
-        df[f"CROSSDOWN_{col1}_{col2}"] = ((df[col1] < df[col2]) & (df[f"previous_{col1}"] > df[f"previous_{col2}"]))
-        df = df.drop(columns=[f"previous_{col1}", f"previous_{col2}"], axis=1)
+        df[f"CROSSDOWN_{col1}_{col2}"] = np.r_[False, cross(df[col1].to_numpy(dtype="float64"), df[col2].to_numpy(dtype="float64"), False)]
         return df
 
 
@@ -324,17 +480,8 @@ class StratBase():
 
 
 
-    def calculate_crossovers(self):
-        for i in self._crossovers_to_calc:
-            self.df = self.crossover(col=i[0], value=i[1], df=self.df)
-
-
-
     def crossover(self, col: str, value: float, df):
-        df[f"previous_{col}"] = df[col].shift(1)
-
-        df[f"CROSSOVER_{col}_{value}"] = ((df[f"previous_{col}"] < value) & (df[col] > value))
-        df = df.drop(columns=[f"previous_{col}"], axis=1)
+        df[f"CROSSOVER_{col}_{value}"] = np.r_[False, cross(df[col].to_numpy(dtype="float64"), value, True)]
         return df
 
 
@@ -350,17 +497,8 @@ class StratBase():
 
 
 
-    def calculate_crossunders(self):
-        for i in self._crossunders_to_calc:
-            self.df = self.crossunder(col=i[0], value=i[1], df=self.df)
-
-
-
     def crossunder(self, col: str, value: float, df):
-        df[f"previous_{col}"] = df[col].shift(1)
-
-        df[f"CROSSUNDER_{col}_{value}"] = ((df[f"previous_{col}"] > value) & (df[col] < value))
-        df = df.drop(columns=[f"previous_{col}"], axis=1)
+        df[f"CROSSUNDER_{col}_{value}"] = np.r_[False, cross(df[col].to_numpy(dtype="float64"), value, False)]
         return df
 
 
@@ -380,6 +518,8 @@ class StratBase():
             dic["func"] = dic["func"].__name__
         logger.info(f"Parameters : {parameters}")
 
+        await self.setup_df()
+
         counter = 0
         should_exit = await self.on_tick(counter, tick_interval)
         while not should_exit:
@@ -399,15 +539,11 @@ class StratBase():
 
         # Check indicators every minute
         if counter % (60/tick_interval) == 0:
-            await self.update_df()
-
-            for func_args in self._tick_args:
-                self.calculate_indicator(**func_args)
+            # only new bars are calculated, over the last <lookback> bars
+            rows = await self.update_df()
 
-            self.calculate_crossups()
-            self.calculate_crossdowns()
-            self.calculate_crossovers()
-            self.calculate_crossunders()
+            self.calculate_indicators(rows)
+            self.calculate_crosses(rows)
 
             self.long_condition()
             self.short_condition()
@@ -435,9 +571,9 @@ class StratBase():
         fetch all historical data as pandas, mask signals, pass to backtrader
         """
 
-        # 1) read in csv file of aggregates trades
-        # 2) resample data to requested timeframe to get ohlc data
-        # 3) load this ohlc data into self.df
+        # 1) read trades from the trade store (see processor.trade_store)
+        # 2) aggregate new trades to cached bars of all timeframes (see processor.bar_cache)
+        # 3) load bars of requested timeframe into self.df
         # 4) calculate all indicators and crosses and add them to df
         # 5) calculate long/short conditions (bools) and add them to df
         # 6) pass the df to backtrader (see wrapper for gryphon)
@@ -445,75 +581,19 @@ class StratBase():
         logger.info(f"Strategy : {self.name} --- Backtesting")
         logger.info(f"Arguments : {self.exchange} - {self.symbol} - {self.timeframe}")
 
-        noobit_user_path = get_abs_path()
-        file_path = f"{noobit_user_path}/data/{self.exchange.lower()}_{self.symbol}_historical_trade_data_fix_api.csv"
-        # file_path = f"{noobit_user_path}/data/{self.exchange.lower()}_{self.pair.lower()}_historical_trade_data.csv"
-
-
-        # read in csv file and parse unix timestamp to datetime
-        try:
-            df = pd.read_csv(file_path,
-                             names=[
-                                 "symbol",
-                                 "side",
-                                 "ordType",
-                                 "avgPx",
-                                 "cumQty",
-                                 "grossTradeAmt",
-                                 "transactTime",
-                             ],
-                             index_col=6,
-                             parse_dates=True,
-                            #  date_parser=lambda x: pd.to_datetime(x, unit="ns")
-                            #  names=["price", "volume", "time", "side", "type", "misc"],
-                            #  index_col=2,
-                            #  parse_dates=True
-                             #  header=None,
-                             #  skiprows=1
-                             )
-            df = df.iloc[1:]
-            logger.debug(df)
-        except FileNotFoundError:
-            raise FileNotFoundError("CSV File not does exist, run historical trades aggregator")
-        except Exception as e:
-            raise log_exception(logger, e)
+        data_dir = os.path.join(get_abs_path(), "data")
+        store = TradeStore(data_dir, self.exchange, self.symbol)
+        store.import_legacy_csv()
+        if not len(store):
+            raise FileNotFoundError(f"No trade data for {self.exchange} {self.symbol}, run historical trades aggregator")
 
         logger.info("Preparing dataframe for backtest")
-        # prepare df for resampling
-        # needs a datetime like index
-        # df.set_index("transactTime")
-
-        df.index = pd.to_datetime(df.index, unit="ns")   #! change to ns later
-        # logger.debug("Df index converted to datetime")
-        # logger.debug(df)
-
-        # logger.debug(f"Minimum timestamp index : {df.index.min()}")
-        # logger.debug(f"Corresponding row:\n{df.loc[df.index.min()]}")
+        bars = BarCache(os.path.join(data_dir, "bars"), self.exchange, self.symbol, timeframes=(*TIMEFRAMES, self.timeframe))
+        # only trades since the last cached bars are aggregated
+        bars.update_from_store(store)
 
-        # For some reason we have one row with unix timestamp = 0
-        df = df.drop([df.index.min()])
-        df = df[["avgPx", "cumQty"]]
-        # logger.info(df)
-
-        # resample trade data into ohlc data with input timeframe
-        try:
-            resampled_df = df.resample('1H').agg({'avgPx': 'ohlc', 'cumQty': 'sum'})  #! change later to avgPx and cumQty
-            resampled_df = resampled_df.fillna(method="ffill")
-
-            logger.debug("Resampled DF")
-            # logger.info(resampled_df)
-
-            resampled_df = resampled_df.droplevel(0, axis=1)
-
-            logger.debug("Removing multiIndex")
-            logger.debug(resampled_df)
-
-        except Exception as e:
-            log_exception(logger, e)
-
-
-        # calculate indicators and crosses
-        self.df = resampled_df
+        # ohlc data with input timeframe, indexed by datetime
+        self.df = bars.to_frame(self.timeframe)
         logger.debug("Attach df to instance")
         logger.debug(self.df)
 
@@ -526,19 +606,14 @@ class StratBase():
             logger.info(f"Parameters : {parameters}")
             self.parameters = parameters
 
-            for func_args in self._tick_args:
-                self.calculate_indicator(**func_args)
-
-            self.calculate_crossups()
-            self.calculate_crossdowns()
-            self.calculate_crossovers()
-            self.calculate_crossunders()
+            self.calculate_indicators()
+            self.calculate_crosses()
 
             self.long_condition()
             self.short_condition()
-            self.df = self.df[["open", "high", "low", "close", "cumQty", "long", "short"]]
+            self.df = self.df[["open", "high", "low", "close", "volume", "long", "short"]]
             self.df = self.df.reset_index()
-            self.df = self.df.rename(columns={"cumQty": "volume", "transactTime": "datetime"})
+            self.df = self.df.rename(columns={"utcTime": "datetime"})
 
             logger.debug("DF prepared for backtester")
             logger.info(f"\n{self.df}")
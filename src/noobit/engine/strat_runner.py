@@ -10,6 +10,7 @@ stackprinter.set_excepthook(style="darkbg2")
 
 from noobit.logger.structlogger import get_logger, log_exception
 from noobit.engine.base import BaseStrategy
+from noobit.server import settings
 import noobit_user
 
 logger = get_logger(__name__)
@@ -57,6 +58,7 @@ class StratRunner():
             try:
                 await strat.register_to_db()
                 await strat.subscribe_to_ws()
+                await strat.subscribe_to_trades()
 
                 logger.debug(strat.ws)
                 logger.debug(strat.ws_token)
@@ -78,6 +80,8 @@ class StratRunner():
                     except Exception as e:
                         log_exception(logger, e)
 
+            if strat.trade_channel is not None:
+                self.tasks.append(strat.on_trade_update())
             self.tasks.append(strat.main_loop())
 
 
@@ -93,10 +97,14 @@ class StratRunner():
             for strat in self.strats:
                 await strat.close_ws()
                 logger.info(f"Closed WS for {strat}")
+                if strat.aioredis_pool is not None:
+                    strat.aioredis_pool.close()
                 for _key, model in strat.execution_models.items():
                     # await model.aioredis_pool.wait_closed()
                     model.aioredis_pool.close()
                     logger.info(f"Closed Redis Pool for {_key}")
+            # rest api sessions are shared by all strategies
+            await settings.CLIENTS.shutdown()
         except Exception as e:
             logger.error(e)
 
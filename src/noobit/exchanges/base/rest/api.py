@@ -3,6 +3,7 @@ Define Base Class for Exchange Rest API.
 Exchange Rest API Class must inherit from both Base Class and Abstract Base Class
 '''
 from abc import ABC, abstractmethod
+import os
 import time
 import asyncio
 from collections import deque
@@ -18,6 +19,11 @@ from starlette import status
 # general
 from noobit.server import settings
 from noobit.logger.structlogger import get_logger, log_exception, log_exc_to_db
+from noobit_user import get_abs_path
+from .pair_metadata import PairMetadataCache
+from .rate_limit import RateLimiter
+from .retry import RetryPolicy
+from .key_lanes import KeyScheduler
 
 # models
 from noobit.models.data.base.types import PAIR, TIMEFRAME, TIMESTAMP
@@ -51,24 +57,58 @@ class APIBase():
 
     env_keys_dq = deque()
 
+    # shared by all exchanges and instances, see pair_metadata module
+    pair_metadata = PairMetadataCache(cache_dir=os.path.join(get_abs_path(), "data", "pair_metadata"))
+
+    # per instance, see create_limiters and rate_limit module
+    rate_limiter = None
+    # exchange apis define {endpoint class: (max count, decay per second)}, None to disable rate limiting
+    rate_limits = None
+    # {method: (endpoint class, cost)}, other methods cost 1 in public or private class
+    method_costs = {}
+
+    # default retry policy of queries, shared by all instances (and their retry metrics)
+    retry_policy = RetryPolicy()
+
+    # per instance, dispatches private queries across env keys, see create_limiters and key_lanes module
+    key_scheduler = None
+    # max concurrent private queries per api key (1 unless keys have a nonce window)
+    max_in_flight_per_key = 1
+    # "local", or "file" / "redis" if keys are shared with other processes, see nonce module
+    nonce_source = "local"
+
 
     def __init__(self):
 
         self._load_all_env_keys()
-        self.to_standard_format = self._load_normalize_map()
-        self.to_exchange_format = {v:k for k, v in self.to_standard_format.items()}
-        self.exchange_pair_specs = self._load_pair_specs_map()
+        self.create_limiters()
+        # mappings are shared with other instances and updated in place on refresh
+        metadata = self.pair_metadata.get(self)
+        self.to_standard_format = metadata.to_standard_format
+        self.to_exchange_format = metadata.to_exchange_format
+        self.exchange_pair_specs = metadata.pair_specs
         self.session = settings.SESSION
+        # session owned by settings.CLIENTS registry, not closed by this instance
+        self.shared_session = False
         self.response = None
         self._json_options = {}
         settings.SYMBOL_MAP_TO_EXCHANGE[self.exchange.upper()] = self.to_exchange_format
         settings.SYMBOL_MAP_TO_STANDARD[self.exchange.upper()] = self.to_standard_format
+        settings.PAIR_SPECS[self.exchange.upper()] = self.exchange_pair_specs
 
         # must be defined by user
         # self.request_parser = BaseRequestParser
         # self.response_parser = BaseResponseParser
 
 
+    @classmethod
+    async def load_pair_metadata(cls):
+        """Load pair metadata without blocking the event loop, to call at startup
+        before any instance is created (instantiation then never queries the exchange)
+        """
+        return await cls.pair_metadata.load(cls)
+
+
     def json_options(self, **kwargs):
         """ Set keyword arguments to be passed to JSON deserialization.
         :param kwargs: passed to :py:meth:`requests.Response.json`
@@ -82,6 +122,8 @@ class APIBase():
         """ close this session.
         :returns: none
         """
+        if self.shared_session:
+            return
         await self.session.aclose()
         return
 
@@ -99,12 +141,22 @@ class APIBase():
             cls.env_keys_dq = value
 
 
-    @classmethod
-    def _rotate_api_keys(cls):
-        try:
-            cls.env_keys_dq.rotate(-1)
-        except Exception as e:
-            log_exception(logger, e)
+    def create_limiters(self):
+        """New rate limit counters and key lanes of this instance
+        (called again by settings.CLIENTS.startup, so that their locks belong to the running loop)
+
+        Notes:
+            To match our account tier, call rate_limiter.set_limits afterwards.
+        """
+        limits = {} if self.rate_limits is None else {self.exchange.lower(): self.rate_limits}
+        self.rate_limiter = RateLimiter(limits)
+        self.key_scheduler = KeyScheduler(exchange=self.exchange,
+                                          keys=list(self.env_keys_dq),
+                                          rate_limiter=self.rate_limiter,
+                                          max_in_flight=self.max_in_flight_per_key,
+                                          nonce_source=self.nonce_source
+                                          )
+
 
     def current_key(self):
         """env key we are currently using"""
@@ -122,15 +174,6 @@ class APIBase():
             log_exception(logger, e)
 
 
-    def _nonce(self):
-        """Nonce counter.
-
-        Returns:
-            an always-increasing unsigned integer (up to 64 bits wide)
-        """
-        return int(1000*time.time())
-
-
 
 
     # ================================================================================
@@ -138,21 +181,27 @@ class APIBase():
     # ================================================================================
 
 
-    async def retry(self, *, func: object, retry_attempts: int = 0, **kwargs):
-        attempts = 0
-        while True:
-            try:
-                r = await func(**kwargs)
-                return r
-            except Exception as e:
-                attempts += 1
-                if attempts > retry_attempts:
-                    raise e
-                else:
-                    logging.warning(u'[RETRY REQUEST] - This time failed.  Trying Again.')
-                    time.sleep(0.1)
+    def _rate_limit_class(self, method: str, private: bool):
+        """Endpoint class and cost of method"""
+        return self.method_costs.get(method, ("private" if private else "public", 1))
+
+
+    async def _throttle(self, method: str):
+        """Wait until the public rate limit budget allows a call (limited per IP, private budgets are per key lane)"""
+        if self.rate_limits is None:
+            return
+        endpoint_class, cost = self._rate_limit_class(method, private=False)
+        await self.rate_limiter.acquire(self.exchange, None, endpoint_class, cost)
 
 
+    def _check_rate_limited(self, result: ErrorHandlerResult, method: str, private: bool, key: str = None):
+        """Our counter was off if the exchange still rate limited us: assume a full counter"""
+        if self.rate_limits is None or result.is_ok:
+            return
+        if result.exception in ("RateLimitExceeded", "DDoSProtection"):
+            endpoint_class, _ = self._rate_limit_class(method, private)
+            self.rate_limiter.saturate(self.exchange, key if private else None, endpoint_class)
+
 
     async def _handle_response_errors(self, response, endpoint, data) -> ErrorHandlerResult:
 
@@ -179,10 +228,8 @@ class APIBase():
         if not result.is_ok:
             # result["value"] returns one of our custom error classes here
             # exception = result.value
+            # waiting before a retry is left to the retry policy
             logger.error(result.value)
-
-            if result.sleep:
-                await asyncio.sleep(result.sleep)
             return result
 
         else:
@@ -195,7 +242,7 @@ class APIBase():
     # ================================================================================
 
 
-    async def _query(self, endpoint, data: dict, private: bool, headers: dict = None, timeout: Union[float, int] = None, retries: int = 0):
+    async def _query(self, endpoint, data: dict, private: bool, headers: dict = None, timeout: Union[float, int] = None):
         """ Low-level query handling.
 
         Args:
@@ -208,11 +255,11 @@ class APIBase():
             requests.Response.json: deserialized python object
 
         Raises:
-            requests.HTTPError: if response status not successful
+            httpx.HTTPError: if response status not successful
 
         Note:
            Use :py:meth:`query_private` or :py:meth:`query_public`
-           unless you have a good reason not to.
+           unless you have a good reason not to (they handle rate limits and retries).
         """
 
         full_path = f"{self.base_url}{endpoint}"
@@ -226,21 +273,17 @@ class APIBase():
         #   This should also work for other exchanges
 
         if private:
-            self.response = await self.retry(func=self.session.post,
-                                             url=full_path,
-                                             data=data,
-                                             headers=headers,
-                                             timeout=timeout,
-                                             retry_attempts=retries
-                                             )
+            self.response = await self.session.post(url=full_path,
+                                                    data=data,
+                                                    headers=headers,
+                                                    timeout=timeout
+                                                    )
 
         else:
-            self.response = await self.retry(func=self.session.get,
-                                             url=full_path,
-                                             params=data,
-                                             timeout=timeout,
-                                             retry_attempts=retries
-                                             )
+            self.response = await self.session.get(url=full_path,
+                                                   params=data,
+                                                   timeout=timeout
+                                                   )
 
         if self.response.status_code not in (200, 201, 202):
             #TODO this stops the whole server, find better way to return a server side error
@@ -259,7 +302,95 @@ class APIBase():
 
 
 
-    async def query_public(self, method: str, data: dict = None, timeout: Union[float, int] = None, retries: int = 0):
+    def _retry_policy(self, retries: Optional[int], retry_policy: Optional[RetryPolicy]) -> RetryPolicy:
+        if retry_policy is not None:
+            return retry_policy
+        if retries is not None:
+            return self.retry_policy.replace(max_attempts=retries + 1)
+        return self.retry_policy
+
+
+    async def _send(self, method: str, method_path: str, data: dict, private: bool, timeout, policy: RetryPolicy) -> ErrorHandlerResult:
+        """Send query until the result is accepted or the retry policy gives up
+
+        Returns:
+            last ErrorHandlerResult (ErrorResult if we gave up)
+
+        Raises:
+            last exception raised by the request if it is not retryable or we gave up
+        """
+
+        retry = policy.start()
+
+        while True:
+
+            retry.attempt()
+
+            # rate limit waits count against the deadline
+            try:
+                if private:
+                    # key lane that can send the query the soonest, its rate budget is already acquired
+                    endpoint_class, cost = self._rate_limit_class(method, private=True)
+                    lane = await asyncio.wait_for(self.key_scheduler.acquire(endpoint_class, cost), retry.remaining())
+                    key = lane.key
+                else:
+                    key, headers = None, None
+                    await asyncio.wait_for(self._throttle(method), retry.remaining())
+            except asyncio.TimeoutError:
+                retry.give_up()
+                logger.error(f"Giving up {method} after {retry.attempts} attempts : rate limit wait exceeds the deadline")
+                return ErrorResult(accept=True, status_code=429, value=f"Rate limit wait for {method} exceeds the deadline", exception="RateLimitExceeded")
+
+            try:
+                if private:
+                    # nonce is set after waiting, so that it increases in the order requests are sent
+                    data['nonce'] = await lane.next_nonce()
+                    headers = {
+                        'API-Key': lane.key,
+                        'API-Sign': self._sign(data, method_path, lane.secret)
+                    }
+
+                resp = await self._query(endpoint=method_path,
+                                         data=data,
+                                         headers=headers,
+                                         private=private,
+                                         timeout=timeout
+                                         )
+            except Exception as e:
+                delay = retry.next_delay(e.__class__.__name__, retryable=policy.is_retryable_exception(e))
+                if delay is None:
+                    raise e
+                logger.warning(f"Retrying {method} in {delay:.2f}s after attempt {retry.attempts} failed : {e}")
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                if private:
+                    await self.key_scheduler.release(lane)
+
+            # returns an ErrorHandlerResult object
+            result = await self._handle_response_errors(response=resp, endpoint=method_path, data=data)
+            self._check_rate_limited(result, method, private=private, key=key)
+
+            if result.accept:
+                return result
+
+            delay = retry.next_delay(result.exception, min_delay=result.sleep)
+            if delay is None:
+                logger.error(f"Giving up {method} after {retry.attempts} attempts")
+                return result
+            logger.warning(f"Retrying {method} in {delay:.2f}s after attempt {retry.attempts} failed : {result.exception}")
+            await asyncio.sleep(delay)
+
+
+
+
+    async def query_public(self,
+                           method: str,
+                           data: dict = None,
+                           timeout: Union[float, int] = None,
+                           retries: int = None,
+                           retry_policy: RetryPolicy = None
+                           ) -> Union[ErrorResult, OKResult]:
         """ Performs an API query that does not require a valid key/secret pair.
 
         Args:
@@ -268,9 +399,11 @@ class APIBase():
                 pair value should be passed as a list
             timeout (float) : (optional)
                 if not ``None``, throw Error after ``timeout`` seconds if no response
+            retries (int) : (optional) max number of retries, overrides the default retry policy
+            retry_policy (RetryPolicy) : (optional) retry policy of this call
 
         Returns:
-            response.json (dict) : deserialised Python object
+            noobit.ErrorHandlerResult
         """
 
         # data = self._cleanup_input_data(data) ==> handled by request parser
@@ -278,32 +411,24 @@ class APIBase():
         method_endpoint = self.public_methods[method]
         method_path = f"{self.public_endpoint}/{method_endpoint}"
 
+        return await self._send(method=method,
+                                method_path=method_path,
+                                data=data,
+                                private=False,
+                                timeout=timeout,
+                                policy=self._retry_policy(retries, retry_policy)
+                                )
 
 
-        # retry while we have not accepted what the response returns
-        # handle_response_errors should return a dict of format {"accept": True, "value": response}
-        #! this is actually stupid as it may loop forever with no max retry number
-        result = ErrorResult(accept=False, value="")
-
-        while not result.accept:
-
-            resp = await self._query(endpoint=method_path,
-                                     data=data,
-                                     private=False,
-                                     timeout=timeout,
-                                     retries=retries
-                                     )
-
-            # returns an ErrorHandlerResult object
-            result = await self._handle_response_errors(response=resp, endpoint=method_path, data=data)
-
 
-        return result
 
-
-
-
-    async def query_private(self, method: str, data: dict = None, timeout: Union[float, int] = None, retries: int = 0) -> Union[ErrorResult, OKResult]:
+    async def query_private(self,
+                            method: str,
+                            data: dict = None,
+                            timeout: Union[float, int] = None,
+                            retries: int = None,
+                            retry_policy: RetryPolicy = None
+                            ) -> Union[ErrorResult, OKResult]:
         """ Performs an API query that requires a valid key/secret pair.
 
         Args:
@@ -311,6 +436,8 @@ class APIBase():
             data (dict): (optional) API request parameters
             timeout (float) : (optional)
                 if not ``None``, throw Error after ``timeout`` seconds if no response
+            retries (int) : (optional) max number of retries, overrides the default retry policy
+            retry_policy (RetryPolicy) : (optional) retry policy of this call
 
         Returns:
             noobit.ErrorHandlerResult
@@ -319,44 +446,26 @@ class APIBase():
         # if not self.current_key() or not self.current_secret():
         #     raise Exception('Either key or secret is not set! (Use `load_key()`.')
 
-        if not self.current_key() or not self.current_secret():
+        if not self.key_scheduler.lanes:
             logger.error('Either key or secret is not set!')
             # settings.SERVER.should_exit = True
             result = ErrorResult(accept=True, status_code=400, value="Either key or secret is not set")
             return result
 
-
         # data = self._cleanup_input_data(data) ==> this is handled by request parser
-        data['nonce'] = self._nonce()
+        if data is None:
+            data = {}
 
         method_endpoint = self.private_methods[method]
         method_path = f"{self.private_endpoint}/{method_endpoint}"
 
-
-        headers = {
-            'API-Key': self.current_key(),
-            'API-Sign': self._sign(data, method_path)
-        }
-
-        result = ErrorResult(accept=False, value="")
-
-        while not result.accept:
-
-            resp = await self._query(endpoint=method_path,
-                                     data=data,
-                                     headers=headers,
-                                     private=True,
-                                     timeout=timeout,
-                                     retries=retries
-                                     )
-
-            self._rotate_api_keys()
-
-            # returns an ErrorHandlerResult object
-            result = await self._handle_response_errors(response=resp, endpoint=method_path, data=data)
-
-
-        return result
+        return await self._send(method=method,
+                                method_path=method_path,
+                                data=data,
+                                private=True,
+                                timeout=timeout,
+                                policy=self._retry_policy(retries, retry_policy)
+                                )
 
 
 
@@ -573,13 +682,27 @@ class APIBase():
     async def get_orderbook(self,
                             symbol: PAIR,
                             retries: int = 1,
+                            cached: bool = False
                             ) -> NoobitResponse:
         """
+        Args:
+            cached (bool): return the shared book if it is kept in sync by a websocket feed
+                in this process, instead of querying a new snapshot
+
+        Note:
+            Books of settings.ORDERBOOKS belong to the websocket feeds (depth, sync state),
+            they are only read here, the rest snapshot is never written into them
         """
         params = self.validate_params(model=OrderBookRequest, symbol=symbol)
         if params.is_error:
             return ErrorResponse(status_code=400, value=params.value)
 
+        book = settings.ORDERBOOKS.find(self.exchange, params.value["symbol"])
+        if cached and book is not None and book.is_synced:
+            value = book.to_dict()
+            value["sendingTime"] = time.time_ns()
+            return OKResponse(status_code=status.HTTP_200_OK, value=value)
+
         try:
             data = self.request_parser.orderbook(params.value["symbol"])
         except Exception as e:
@@ -594,7 +717,8 @@ class APIBase():
             return ErrorResponse(status_code=result.status_code, value=result.value)
         else:
             parsed_response = self.response_parser.orderbook(response=result.value)
-            return self.orderbook_validate_and_serialize(parsed_response)
+            response = self.orderbook_validate_and_serialize(parsed_response)
+            return response
 
 
     async def get_orderbook_as_pandas(self,
@@ -27,7 +27,7 @@ class APIAbc(ABC):
 
 
     @abstractmethod
-    def _sign(self, data: dict, urlpath: str):
+    def _sign(self, data: dict, urlpath: str, secret: str = None):
         raise NotImplementedError
 
 
@@ -38,27 +38,38 @@ class APIAbc(ABC):
     # ================================================================================
 
 
+    @classmethod
     @abstractmethod
-    def _load_normalize_map(self):
-        '''Instantiate instance variable self.pair_map as dict.
+    def _request_pair_metadata(cls) -> dict:
+        '''Blocking request of the exchange raw pair metadata (for kraken: AssetPairs endpoint).
+
+        Only used on cold start when there is no on-disk copy, see pair_metadata.PairMetadataCache
+        '''
+        raise NotImplementedError
 
-        keys : exchange format
-        value : standard format
 
-        eg for kraken : {"XXBTZUSD": "XBT-USD", "ZUSD": "USD"}
+
+    @classmethod
+    @abstractmethod
+    async def _fetch_pair_metadata(cls) -> dict:
+        '''Same as _request_pair_metadata but async, used to load and refresh the cache.
         '''
         raise NotImplementedError
 
 
 
+    @classmethod
     @abstractmethod
-    def _load_pair_specs_map(self):
-        '''Instantiate instance variable self.pair_info as dict.
+    def _parse_pair_metadata(cls, response: dict):
+        '''Parse raw pair metadata into tuple (to_standard_format, pair_specs) of dicts.
 
-        keys : exchange format
-        value : standard format
+        to_standard_format :
+            keys : exchange format
+            value : standard format
+            eg for kraken : {"XXBTZUSD": "XBT-USD", "ZUSD": "USD"}
 
-        eg for kraken : {"XBT-USD": {"price_decimals": 0.1, "volume_decimals": 0.1}}
+        pair_specs :
+            eg for kraken : {"XBT-USD": {"price_decimals": 1, "volume_decimals": 8, "leverage_available": [2, 3]}}
         '''
         raise NotImplementedError
 
@@ -0,0 +1,117 @@
+"""
+Dispatch private rest queries across api keys
+
+Each api key is an independent lane, with its own nonce sequence and its own rate limit counters.
+A query is sent on the lane that can send it the soonest, so concurrent private queries
+(for ex balances, open orders and trades history pages gathered together) run in parallel
+on different keys instead of queueing behind a single key.
+
+Notes:
+    Nonces of a key must reach the exchange in increasing order, so by default a lane only
+    has one query in flight at a time. Raise max_in_flight if the keys have a nonce window.
+"""
+import asyncio
+from typing import List, Tuple, Optional
+
+from .rate_limit import RateLimiter
+from .nonce import NONCE_SOURCES, LocalNonce
+
+
+class KeyLane():
+
+    def __init__(self, key: str, secret: str, nonce=None):
+        self.key = key
+        self.secret = secret
+        # see nonce module
+        self.nonce = nonce if nonce is not None else LocalNonce("", key)
+
+        self.in_flight = 0
+        self.sent_count = 0
+
+
+    async def next_nonce(self) -> int:
+        """Strictly increasing nonce of this key"""
+        return await self.nonce.next()
+
+
+
+
+class KeyScheduler():
+    """
+    Args:
+        exchange (str)
+        keys (list): (key, secret) tuples
+        rate_limiter (RateLimiter): limiter holding the counters of each key, None to only limit in-flight queries
+        max_in_flight (int): max concurrent queries per key
+        nonce_source (str): "local", "file" or "redis", to share keys with other processes (see nonce module)
+
+    Usage:
+        lane = await scheduler.acquire(endpoint_class, cost)
+        try:
+            ...sign with lane.key, lane.secret and await lane.next_nonce()...
+        finally:
+            await scheduler.release(lane)
+    """
+
+    def __init__(self,
+                 exchange: str,
+                 keys: List[Tuple[str, str]],
+                 rate_limiter: Optional[RateLimiter] = None,
+                 max_in_flight: int = 1,
+                 nonce_source: str = "local"
+                 ):
+        self.exchange = exchange
+        self.rate_limiter = rate_limiter
+        self.max_in_flight = max_in_flight
+        self.lanes = [
+            KeyLane(key, secret, NONCE_SOURCES[nonce_source](exchange, key))
+            for key, secret in keys
+        ]
+
+        self._condition = asyncio.Condition()
+
+
+    def _counter(self, lane: KeyLane, endpoint_class: str):
+        if self.rate_limiter is None or self.exchange.lower() not in self.rate_limiter.limits:
+            return None
+        return self.rate_limiter.counter(self.exchange, lane.key, endpoint_class)
+
+
+    def _wait_for(self, lane: KeyLane, endpoint_class: str, cost: float) -> float:
+        counter = self._counter(lane, endpoint_class)
+        return 0 if counter is None else counter.wait_for(cost)
+
+
+    async def acquire(self, endpoint_class: str = "private", cost: float = 1) -> KeyLane:
+        """Reserve the lane that can send a query the soonest, and wait for its rate budget"""
+        if not self.lanes:
+            raise ValueError(f"No api key for {self.exchange}")
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: any(lane.in_flight < self.max_in_flight for lane in self.lanes))
+
+            free = [lane for lane in self.lanes if lane.in_flight < self.max_in_flight]
+            lane = min(free, key=lambda l: (self._wait_for(l, endpoint_class, cost), l.in_flight, l.sent_count))
+            # reserve before waiting for the budget, so concurrent queries pick other lanes
+            lane.in_flight += 1
+
+        counter = self._counter(lane, endpoint_class)
+        try:
+            if counter is not None:
+                await counter.acquire(cost)
+        except BaseException:
+            await self.release(lane)
+            raise
+
+        lane.sent_count += 1
+        return lane
+
+
+    async def release(self, lane: KeyLane):
+        async with self._condition:
+            lane.in_flight -= 1
+            self._condition.notify()
+
+
+    def metrics(self) -> dict:
+        return {lane.key[:8]: {"in_flight": lane.in_flight, "sent": lane.sent_count} for lane in self.lanes}
@@ -0,0 +1,103 @@
+"""
+Strictly increasing nonces per api key
+
+Nonces are milliseconds timestamps, bumped by one when two queries share the same millisecond,
+so they stay strictly increasing across coroutines and never go back after a restart.
+    - local : in-process, enough if a key is only used by a single process
+    - file  : last nonce kept in a file under an exclusive lock, for processes of the same machine
+    - redis : last nonce kept in redis and bumped atomically, for processes on several machines
+"""
+import os
+import time
+import fcntl
+import hashlib
+
+from noobit.server import settings
+from noobit_user import get_abs_path
+
+
+def _now_ms() -> int:
+    return int(1000*time.time())
+
+
+def _key_id(exchange: str, key: str) -> str:
+    # never write the api key itself
+    return f"{exchange.lower()}_{hashlib.sha256(key.encode()).hexdigest()[:16]}"
+
+
+class LocalNonce():
+
+    def __init__(self, exchange: str, key: str):
+        self._last = 0
+
+
+    async def next(self) -> int:
+        self._last = max(self._last + 1, _now_ms())
+        return self._last
+
+
+
+
+class FileNonce():
+    """
+    Args:
+        directory (str): directory of nonce files, defaults to <user dir>/data/nonces
+    """
+
+    def __init__(self, exchange: str, key: str, directory: str = None):
+        if directory is None:
+            directory = os.path.join(get_abs_path(), "data", "nonces")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, _key_id(exchange, key))
+
+
+    async def next(self) -> int:
+        # lock is only held for a read and a write, not worth a thread
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                last = f.read().strip()
+                nonce = max(int(last or 0) + 1, _now_ms())
+                f.seek(0)
+                f.truncate()
+                f.write(str(nonce))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return nonce
+
+
+
+
+class RedisNonce():
+    """
+    Args:
+        redis: aioredis pool, defaults to settings.AIOREDIS_POOL
+    """
+
+    # get, bump and set in a single atomic step
+    SCRIPT = """
+    local nonce = math.max(tonumber(redis.call('GET', KEYS[1]) or 0) + 1, tonumber(ARGV[1]))
+    redis.call('SET', KEYS[1], string.format('%d', nonce))
+    return string.format('%d', nonce)
+    """
+
+    def __init__(self, exchange: str, key: str, redis=None):
+        self.redis = redis
+        self.redis_key = f"nonce:{_key_id(exchange, key)}"
+
+
+    async def next(self) -> int:
+        redis = self.redis or settings.AIOREDIS_POOL
+        nonce = await redis.eval(self.SCRIPT, keys=[self.redis_key], args=[_now_ms()])
+        return int(nonce)
+
+
+
+
+NONCE_SOURCES = {
+    "local": LocalNonce,
+    "file": FileNonce,
+    "redis": RedisNonce,
+}
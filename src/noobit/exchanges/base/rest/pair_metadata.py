@@ -0,0 +1,177 @@
+"""
+Process-wide cache of exchange pair metadata (symbol mappings and pair specs)
+
+Pair metadata is loaded once per exchange and shared by all rest api instances,
+so instantiating an api does not query the exchange.
+    - warm start : metadata is persisted to disk and reloaded on the next start
+    - cold start : without disk copy, load() fetches it asynchronously (call at app startup),
+                   get() falls back to a single blocking request
+    - refresh    : once older than <ttl>, get() schedules an async refresh on the running loop,
+                   mappings are updated in place so every api instance sees the new values
+"""
+import os
+import time
+import asyncio
+from typing import Optional, Tuple
+
+import ujson
+
+from noobit.logger.structlogger import get_logger, log_exception
+
+
+logger = get_logger(__name__)
+
+
+class PairMetadata():
+    """Mappings shared by all api instances of an exchange, never reassigned, only updated in place"""
+
+    def __init__(self):
+        # {<XXBTZUSD>: <XBT-USD>, <XXBT>: <XBT>}
+        self.to_standard_format = {}
+        self.to_exchange_format = {}
+        # {<XBT-USD>: {"volume_decimals": int, "price_decimals": int, "leverage_available": list}}
+        self.pair_specs = {}
+        self.fetched_at = 0
+
+
+    def update(self, to_standard_format: dict, pair_specs: dict, fetched_at: float):
+        self.to_standard_format.clear()
+        self.to_standard_format.update(to_standard_format)
+        self.to_exchange_format.clear()
+        self.to_exchange_format.update({v: k for k, v in to_standard_format.items()})
+        self.pair_specs.clear()
+        self.pair_specs.update(pair_specs)
+        self.fetched_at = fetched_at
+
+
+
+
+class PairMetadataCache():
+    """
+    Args:
+        ttl (float): seconds after which metadata is refreshed
+        cache_dir (str): directory of the on-disk copy, None to disable it
+
+    Notes:
+        Exchange api classes must implement:
+            _request_pair_metadata() -> dict : blocking request of the raw exchange response
+            async _fetch_pair_metadata() -> dict : same, async
+            _parse_pair_metadata(raw) -> (to_standard_format, pair_specs)
+        as classmethods, so metadata can be loaded before any api is instantiated
+    """
+
+    def __init__(self, ttl: float = 3600, cache_dir: str = None):
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+
+        # exchange ==> PairMetadata
+        self._entries = {}
+        # exchange ==> refresh task
+        self._refreshing = {}
+
+
+    def get(self, api) -> PairMetadata:
+        """Metadata of the api's exchange, without network call unless there is no copy at all
+
+        Args:
+            api: exchange api class or instance
+        """
+        exchange = api.exchange.lower()
+        entry = self._entries.get(exchange)
+
+        if entry is None:
+            raw, fetched_at = self._read_disk(exchange)
+            if raw is None:
+                logger.warning(f"No cached pair metadata for {exchange} : blocking request")
+                raw, fetched_at = api._request_pair_metadata(), time.time()
+                self._write_disk(exchange, raw, fetched_at)
+            entry = self._set(api, raw, fetched_at)
+
+        if time.time() - entry.fetched_at > self.ttl:
+            self._schedule_refresh(api)
+
+        return entry
+
+
+    async def load(self, api) -> PairMetadata:
+        """Same as get, but a cold start fetches metadata without blocking the loop"""
+        exchange = api.exchange.lower()
+
+        if exchange not in self._entries:
+            raw, fetched_at = self._read_disk(exchange)
+            if raw is not None:
+                self._set(api, raw, fetched_at)
+            else:
+                await self.refresh(api)
+
+        return self.get(api)
+
+
+    async def refresh(self, api):
+        exchange = api.exchange.lower()
+        try:
+            raw = await api._fetch_pair_metadata()
+            fetched_at = time.time()
+            self._set(api, raw, fetched_at)
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._write_disk, exchange, raw, fetched_at)
+            logger.info(f"Refreshed pair metadata for {exchange}")
+        except Exception as e:
+            log_exception(logger, e)
+        finally:
+            self._refreshing.pop(exchange, None)
+
+
+    def _schedule_refresh(self, api):
+        exchange = api.exchange.lower()
+        if exchange in self._refreshing:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no running loop, stale metadata is kept until next call from a coroutine
+            return
+        self._refreshing[exchange] = loop.create_task(self.refresh(api))
+
+
+    def _set(self, api, raw: dict, fetched_at: float) -> PairMetadata:
+        to_standard_format, pair_specs = api._parse_pair_metadata(raw)
+        entry = self._entries.setdefault(api.exchange.lower(), PairMetadata())
+        entry.update(to_standard_format, pair_specs, fetched_at)
+        return entry
+
+
+    # ================================================================================
+    # ==== DISK COPY
+
+
+    def _path(self, exchange: str) -> str:
+        return os.path.join(self.cache_dir, f"{exchange}.json")
+
+
+    def _read_disk(self, exchange: str) -> Tuple[Optional[dict], float]:
+        if self.cache_dir is None:
+            return None, 0
+        try:
+            with open(self._path(exchange)) as f:
+                cached = ujson.load(f)
+            return cached["raw"], cached["fetched_at"]
+        except FileNotFoundError:
+            return None, 0
+        except Exception as e:
+            log_exception(logger, e)
+            return None, 0
+
+
+    def _write_disk(self, exchange: str, raw: dict, fetched_at: float):
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write to temp file first so a crash never leaves a truncated copy
+            tmp_path = f"{self._path(exchange)}.tmp"
+            with open(tmp_path, "w") as f:
+                ujson.dump({"raw": raw, "fetched_at": fetched_at}, f)
+            os.replace(tmp_path, self._path(exchange))
+        except Exception as e:
+            log_exception(logger, e)
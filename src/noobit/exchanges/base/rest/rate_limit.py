@@ -0,0 +1,109 @@
+"""
+Client-side rate limiting modeled on Kraken's call counters
+
+Each (exchange, api key, endpoint class) has its own counter: every call adds its cost,
+the counter decays by <decay_rate> per second and a call waits until its cost fits under <max_count>.
+Calls are thus sent as soon as the budget allows instead of sleeping a fixed delay,
+and we never hit the exchange limit (which would cost us a ban period).
+
+Public calls are limited per IP, so they share one counter per exchange regardless of api key.
+"""
+import time
+import asyncio
+from typing import Dict, Tuple
+
+
+class DecayingCounter():
+    """
+    Args:
+        max_count (float): max value of the counter
+        decay_rate (float): counter decrease per second
+
+    Notes:
+        Waiting calls are served in order (first come, first served).
+    """
+
+    def __init__(self, max_count: float, decay_rate: float):
+        self.max_count = max_count
+        self.decay_rate = decay_rate
+
+        self.count = 0
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+        self.wait_time = 0
+
+
+    def _decay(self):
+        now = time.monotonic()
+        self.count = max(0, self.count - (now - self._updated_at) * self.decay_rate)
+        self._updated_at = now
+
+
+    def wait_for(self, cost: float = 1) -> float:
+        """Seconds until a call of <cost> fits in the budget"""
+        self._decay()
+        # a call costing more than max_count only waits for an empty counter
+        excess = self.count + min(cost, self.max_count) - self.max_count
+        return max(0, excess / self.decay_rate)
+
+
+    async def acquire(self, cost: float = 1):
+        async with self._lock:
+            delay = self.wait_for(cost)
+            while delay > 0:
+                self.wait_time += delay
+                await asyncio.sleep(delay)
+                delay = self.wait_for(cost)
+            self.count += cost
+
+
+    def saturate(self):
+        """Exchange says we are over the limit: our count is off, assume a full counter"""
+        self._decay()
+        self.count = max(self.count, self.max_count)
+
+
+
+
+class RateLimiter():
+    """Counters of all keys and endpoint classes of a rest client
+
+    Args:
+        limits: {exchange: {endpoint class: (max count, decay per second)}}
+
+    Notes:
+        Rest apis call acquire() before each request, with the endpoint class and cost
+        of their method (see exchange endpoints maps).
+        Each api instance has its own limiter, settings.CLIENTS holds one long-lived api per exchange.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, Tuple[float, float]]] = None):
+        self.limits = limits or {}
+
+        # (exchange, key, endpoint class) ==> DecayingCounter
+        self._counters = {}
+
+
+    def set_limits(self, exchange: str, limits: Dict[str, Tuple[float, float]]):
+        """Set limits of an exchange (for ex to match our account tier), applies to new counters"""
+        self.limits[exchange.lower()] = limits
+
+
+    def counter(self, exchange: str, key: str, endpoint_class: str) -> DecayingCounter:
+        exchange = exchange.lower()
+        try:
+            return self._counters[(exchange, key, endpoint_class)]
+        except KeyError:
+            max_count, decay_rate = self.limits[exchange][endpoint_class]
+            counter = DecayingCounter(max_count, decay_rate)
+            self._counters[(exchange, key, endpoint_class)] = counter
+            return counter
+
+
+    async def acquire(self, exchange: str, key: str, endpoint_class: str, cost: float = 1):
+        await self.counter(exchange, key, endpoint_class).acquire(cost)
+
+
+    def saturate(self, exchange: str, key: str, endpoint_class: str):
+        self.counter(exchange, key, endpoint_class).saturate()
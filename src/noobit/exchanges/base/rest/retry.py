@@ -0,0 +1,131 @@
+"""
+Retry policy of rest queries
+
+A query is retried when the request itself failed (network error, timeout, server error)
+or when the exchange returned an error our error hierarchy does not accept
+(see models.data.base.errors, for ex RateLimitExceeded or ExchangeNotAvailable).
+Retries are bounded by a number of attempts and a deadline, waits are async
+with capped exponential backoff, and at least the sleep advised by the error class.
+A query whose advised sleep ends after the deadline is given up right away, since a retry
+within the exchange penalty window is bound to fail again. Rate limit waits count against
+the deadline too (see APIBase._send).
+"""
+import time
+import random
+import asyncio
+from collections import Counter
+from typing import Optional
+
+import httpx
+
+
+class RetryPolicy():
+    """
+    Args:
+        max_attempts (int): max number of attempts, including the first one
+        deadline (float): max seconds spent on a query including waits, None for no deadline
+        base (float): backoff delay after the first failed attempt (before jitter)
+        cap (float): max backoff delay
+
+    Notes:
+        Policies are immutable, use replace() to derive a policy for a single call.
+        Policies derived with replace() share the metrics of their parent.
+    """
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 deadline: Optional[float] = 30,
+                 base: float = 0.5,
+                 cap: float = 10,
+                 _metrics: Counter = None
+                 ):
+        self.max_attempts = max(1, max_attempts)
+        self.deadline = deadline
+        self.base = base
+        self.cap = cap
+
+        # "attempts", "retries", "giveups" and one "retry:<error>" entry per error name
+        self._metrics = Counter() if _metrics is None else _metrics
+
+
+    def replace(self, **kwargs) -> "RetryPolicy":
+        params = {
+            "max_attempts": self.max_attempts,
+            "deadline": self.deadline,
+            "base": self.base,
+            "cap": self.cap,
+        }
+        params.update(kwargs)
+        return RetryPolicy(**params, _metrics=self._metrics)
+
+
+    def start(self) -> "RetryState":
+        """State of a single query"""
+        return RetryState(self)
+
+
+    @staticmethod
+    def is_retryable_exception(e: Exception) -> bool:
+        """Transient transport errors and server side http errors"""
+        response = getattr(e, "response", None)
+        if response is not None:
+            return response.status_code >= 500 or response.status_code == 429
+        return isinstance(e, (httpx.HTTPError, OSError, asyncio.TimeoutError))
+
+
+    def metrics(self) -> dict:
+        return dict(self._metrics)
+
+
+
+
+class RetryState():
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.attempts = 0
+        self.started_at = time.monotonic()
+
+
+    def attempt(self):
+        """To call before each attempt"""
+        self.attempts += 1
+        self.policy._metrics["attempts"] += 1
+
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, None for no deadline"""
+        if self.policy.deadline is None:
+            return None
+        return max(0, self.policy.deadline - (time.monotonic() - self.started_at))
+
+
+    def give_up(self):
+        self.policy._metrics["giveups"] += 1
+
+
+    def next_delay(self, error: str, retryable: bool = True, min_delay: float = None) -> Optional[float]:
+        """Seconds to wait before retrying after a failed attempt, None to give up
+
+        Args:
+            error (str): name of the error, for metrics
+            retryable (bool): False to give up right away
+            min_delay (float): delay advised by the exchange error
+        """
+        policy = self.policy
+
+        if retryable and self.attempts < policy.max_attempts:
+            backoff = random.uniform(0, min(policy.cap, policy.base * 2 ** min(self.attempts - 1, 32)))
+            remaining = self.remaining()
+
+            # no retry before the advised sleep is over (for ex 60s for rate limits)
+            if remaining is None or (remaining > 0 and (min_delay or 0) < remaining):
+                delay = max(backoff, min_delay or 0)
+                if remaining is not None:
+                    delay = min(delay, remaining)
+                policy._metrics["retries"] += 1
+                policy._metrics[f"retry:{error}"] += 1
+                return delay
+
+        self.give_up()
+        return None
@@ -0,0 +1,207 @@
+"""
+Resumable download of historical public trades
+
+History is split into time ranges fetched concurrently (each range pages through public trades
+from its start until its end), trades are appended to one binary part file per range and stitched
+to the symbol's trade store (see processor.trade_store) once all ranges are done.
+Progress is kept in a small checkpoint:
+    {"cursor": <ns timestamp up to which trades are in the trade store>,
+     "ranges": [{"start", "end", "cursor", "size"}, ...]}     <== ranges still being downloaded
+so an interrupted download restarts where it stopped, without reading back the trade store.
+A first download starts at the symbol's first trade (or at a given start), so that ranges are
+split over actual history instead of mostly empty years before it.
+
+Notes:
+    Public queries are rate limited per IP by the api rate limiter, concurrent ranges and symbols
+    share that budget: they keep it busy instead of waiting on each other's responses.
+"""
+import os
+import time
+import asyncio
+from typing import List, Optional
+
+import ujson
+
+from noobit.logger.structlogger import get_logger, log_exception
+from noobit.processor.trade_store import TradeStore, to_records
+from noobit_user import get_abs_path
+
+
+logger = get_logger(__name__)
+
+
+class TradeDownloader():
+    """
+    Args:
+        api: rest api instance of the exchange
+        data_dir (str): directory of trade stores and checkpoints, defaults to user data dir
+        ranges (int): number of time ranges of a symbol downloaded concurrently
+    """
+
+    def __init__(self, api, data_dir: str = None, ranges: int = 4):
+        self.api = api
+        self.data_dir = data_dir or os.path.join(get_abs_path(), "data")
+        self.ranges = max(1, ranges)
+
+
+    def store(self, symbol: str) -> TradeStore:
+        return TradeStore(self.data_dir, self.api.exchange, symbol)
+
+
+    def _checkpoint_file(self, symbol: str) -> str:
+        return f"{self.store(symbol).path}.checkpoint.json"
+
+
+    def _part_file(self, symbol: str, index: int) -> str:
+        return f"{self.store(symbol).path}.part{index}"
+
+
+    # ================================================================================
+    # ==== CHECKPOINT
+
+
+    def load_checkpoint(self, symbol: str) -> dict:
+        try:
+            with open(self._checkpoint_file(symbol)) as f:
+                return ujson.load(f)
+        except FileNotFoundError:
+            # store may have been imported from csv
+            return {"cursor": self.store(symbol).last_timestamp or 0, "ranges": []}
+
+
+    def _save_checkpoint(self, symbol: str, checkpoint: dict):
+        # write to temp file first so a crash never leaves a truncated checkpoint
+        path = self._checkpoint_file(symbol)
+        with open(f"{path}.tmp", "w") as f:
+            ujson.dump(checkpoint, f)
+        os.replace(f"{path}.tmp", path)
+
+
+    def plan_ranges(self, start: int, end: int) -> List[dict]:
+        step = max(1, (end - start) // self.ranges)
+        bounds = [start + i*step for i in range(self.ranges)] + [end]
+        return [
+            {"start": lo, "end": hi, "cursor": lo, "size": 0}
+            for lo, hi in zip(bounds, bounds[1:]) if hi > lo
+        ]
+
+
+    # ================================================================================
+    # ==== DOWNLOAD
+
+
+    async def download(self, symbols: List[str], start: Optional[int] = None, end: Optional[int] = None) -> dict:
+        """Download trades of all symbols concurrently, from <start> up to <end> (ns timestamps)
+
+        Args:
+            start: only used when nothing was downloaded yet, defaults to the first trade of the symbol
+            end: defaults to now
+
+        Returns:
+            dict: {symbol: number of trades downloaded}
+        """
+        counts = await asyncio.gather(*[self.download_symbol(symbol, start, end) for symbol in symbols])
+        return dict(zip(symbols, counts))
+
+
+    async def first_trade_time(self, symbol: str) -> Optional[int]:
+        """Timestamp of the first trade of <symbol>, None if it has no trade or the query failed"""
+        response = await self.api.get_public_trades(symbol=symbol, since=0)
+        if not response.is_ok:
+            logger.error(f"{symbol} first trade not found : {response.value}")
+            return None
+        if not response.value["data"]:
+            return None
+        return int(response.value["data"][0]["transactTime"])
+
+
+    async def download_symbol(self, symbol: str, start: Optional[int] = None, end: Optional[int] = None) -> int:
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.store(symbol).import_legacy_csv()
+        checkpoint = self.load_checkpoint(symbol)
+
+        if not checkpoint["ranges"]:
+            end = end or time.time_ns()
+            cursor = checkpoint["cursor"]
+            if not cursor:
+                if start is None:
+                    first = await self.first_trade_time(symbol)
+                    # since is exclusive
+                    start = 0 if first is None else first - 1
+                cursor = start
+            if end <= cursor:
+                return 0
+            checkpoint["ranges"] = self.plan_ranges(cursor, end)
+            self._save_checkpoint(symbol, checkpoint)
+        else:
+            logger.info(f"Resuming {symbol} download : {len(checkpoint['ranges'])} ranges")
+
+        counts = await asyncio.gather(*[
+            self._download_range(symbol, index, checkpoint)
+            for index in range(len(checkpoint["ranges"]))
+        ])
+
+        if all(r["cursor"] >= r["end"] for r in checkpoint["ranges"]):
+            self._stitch(symbol, checkpoint)
+
+        return sum(counts)
+
+
+    async def _download_range(self, symbol: str, index: int, checkpoint: dict) -> int:
+        trade_range = checkpoint["ranges"][index]
+        path = self._part_file(symbol, index)
+        count = 0
+
+        # drop rows written after the last checkpoint (interrupted between write and checkpoint)
+        with open(path, "ab") as f:
+            f.truncate(trade_range["size"])
+
+        try:
+            while trade_range["cursor"] < trade_range["end"]:
+                response = await self.api.get_public_trades(symbol=symbol, since=trade_range["cursor"])
+                if not response.is_ok:
+                    logger.error(f"{symbol} range {index} stopped at {trade_range['cursor']} : {response.value}")
+                    break
+
+                # since is exclusive, so a range holds trades in (start, end]
+                trades = [t for t in response.value["data"] if t["transactTime"] <= trade_range["end"]]
+                last = int(response.value["last"])
+
+                with open(path, "ab") as f:
+                    to_records(trades).tofile(f)
+                    trade_range["size"] = f.tell()
+
+                count += len(trades)
+                # no new trade means we reached the most recent one
+                if last <= trade_range["cursor"] or not response.value["data"]:
+                    trade_range["cursor"] = trade_range["end"]
+                else:
+                    trade_range["cursor"] = min(last, trade_range["end"])
+                self._save_checkpoint(symbol, checkpoint)
+
+        except Exception as e:
+            log_exception(logger, e)
+
+        logger.info(f"{symbol} range {index} : {count} trades, cursor {trade_range['cursor']}")
+        return count
+
+
+    def _stitch(self, symbol: str, checkpoint: dict):
+        """Append part files to the trade store in range order"""
+        store = self.store(symbol)
+
+        # rows before stitching, so an interrupted stitch is redone instead of appended twice
+        if "store_rows" not in checkpoint:
+            checkpoint["store_rows"] = len(store)
+            self._save_checkpoint(symbol, checkpoint)
+
+        store.truncate(checkpoint["store_rows"])
+        for index, trade_range in enumerate(checkpoint["ranges"]):
+            # parts may hold rows written after their checkpointed size
+            store.append_file(self._part_file(symbol, index), trade_range["size"])
+
+        part_count = len(checkpoint["ranges"])
+        self._save_checkpoint(symbol, {"cursor": checkpoint["ranges"][-1]["end"], "ranges": []})
+
+        for index in range(part_count):
+            os.remove(self._part_file(symbol, index))
@@ -3,6 +3,7 @@ import asyncio
 from typing import List
 
 import ujson
+import rapidjson
 from pydantic import ValidationError
 
 from noobit.logger.structlogger import get_logger, log_exception, log_exc_to_db
@@ -31,6 +32,8 @@ class PrivateFeedReaderBase():
 
         self.ws = None
         self.terminate = False
+        self.ping_interval = None
+        self.ping_timeout = None
 
         # we need to append order updates to order snapshot
         self.all_orders = {}
@@ -48,6 +51,9 @@ class PrivateFeedReaderBase():
 
     async def subscribe(self, ping_interval: int, ping_timeout: int):
 
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+
         self.ws = await websockets.connect(uri=self.ws_uri,
                                            ping_interval=ping_interval,
                                            ping_timeout=ping_timeout
@@ -69,6 +75,18 @@ class PrivateFeedReaderBase():
                 await log_exc_to_db(logger, e)
 
 
+    async def reconnect(self):
+        """Open a new connection and subscribe again to all private feeds
+        (a new auth token is requested by the subscription parser)
+        """
+        try:
+            await self.ws.close()
+        except Exception as e:
+            log_exception(logger, e)
+
+        await self.subscribe(self.ping_interval, self.ping_timeout)
+
+
     async def close(self):
         try:
             # await self.ws.wait_closed()
@@ -84,6 +102,13 @@ class PrivateFeedReaderBase():
 
         #! should this return a NoobitResponse object ?
 
+        # raw frame is decoded only once, routing and publish methods receive the decoded message
+        try:
+            msg = rapidjson.loads(msg)
+        except ValueError as e:
+            logger.error(e)
+            return
+
         route = await self.route_message(msg)
 
         if route not in WS_ROUTE:
@@ -91,7 +116,7 @@ class PrivateFeedReaderBase():
 
         logger.debug(f"msg handler routing to {route}")
         try:
-            await self.route_to_method[route](ujson.loads(msg), redis_pool)
+            await self.route_to_method[route](msg, redis_pool)
         except Exception as e:
             log_exception(logger, e)
             await log_exc_to_db(logger, e)
@@ -1,20 +1,23 @@
 from noobit.models.data.base.response import ErrorResponse, OKResponse
 import websockets
 import asyncio
-from typing import List
-from collections import Counter
+from typing import List, Dict
 
 import ujson
+import rapidjson
+from typing_extensions import Literal
 from pydantic import ValidationError
 
+from noobit.server import settings
 from noobit.logger.structlogger import get_logger, log_exc_to_db, log_exception
+from noobit.processor.orderbook import serialize_levels
 
 # models
 from noobit.models.data.base.types import PAIR, WS_ROUTE
 from noobit.models.data.websockets.status import HeartBeat, SubscriptionStatus, SystemStatus
 
 from noobit.models.data.websockets.stream import (
-    TradesList, Instrument, OrderBook, Spread
+    Trade, TradesList, Instrument, OrderBook, Spread
 )
 
 logger = get_logger(__name__)
@@ -29,20 +32,52 @@ class PublicFeedReaderBase():
                  pairs: List[PAIR],
                  timeframe: int = 1,
                  depth: int = 10,
-                 feeds: List[str] = ["instrument", "trade", "orderbook"]
+                 feeds: List[str] = ["instrument", "trade", "orderbook"],
+                 orderbook_mode: Literal["full", "diff"] = "full",
+                 snapshot_interval: int = 100,
+                 stream_validation: Literal["always", "sampled", "never"] = "always",
+                 validation_sample_rate: int = 1000,
+                 recorder=None
                  ):
+        """
+        Args:
+            orderbook_mode: publish the full book on every update ("full")
+                or only changed levels with a sequence number ("diff")
+            snapshot_interval: in "diff" mode, publish a full snapshot every <snapshot_interval> updates
+            stream_validation: validate trade, spread and orderbook messages against pydantic models
+                "always", or trust the stream and publish parser records directly,
+                validating one message every <validation_sample_rate> ("sampled") or none ("never")
+                records use the numeric representation of the stream parser (see models.data.base.numeric)
+            recorder: optional noobit.processor.recorder.Recorder, trades, spreads and orderbook diffs
+                are written to disk alongside publishing
+        """
         self.pairs = pairs
         self.feeds = feeds
         self.timeframe = timeframe
         self.depth = depth
+        self.orderbook_mode = orderbook_mode
+        self.snapshot_interval = snapshot_interval
+        self.stream_validation = stream_validation
+        self.validation_sample_rate = validation_sample_rate
+        self._validation_counter = 0
+        self.recorder = recorder
 
         self.ws = None
         self.terminate = False
 
-        # we need to append book updates to book snapshot
-        self.full_orderbook = {"asks": Counter(), "bids": Counter()}
+        # we need to apply book updates to book snapshot
+        # books are shared process-wide, one L2Book per exchange and symbol
+        self.orderbooks = settings.ORDERBOOKS
         self.feed_counters = {}
 
+        # channelID ==> route, filled from subscription status messages
+        self.channel_routes = {}
+
+        # feed ==> pairs we subscribed to, replayed on reconnection
+        self.subscriptions = {}
+        self.ping_interval = None
+        self.ping_timeout = None
+
         self.route_to_method = {
             "heartbeat": self.publish_heartbeat,
             "system_status": self.publish_status_system,
@@ -55,22 +90,35 @@ class PublicFeedReaderBase():
 
 
 
-    async def subscribe(self, ping_interval: int, ping_timeout: int):
+    async def subscribe(self, ping_interval: int, ping_timeout: int, subscriptions: Dict[str, List[PAIR]] = None):
+        """
+        Args:
+            subscriptions: feed ==> pairs to subscribe to, defaults to all pairs for every feed
+        """
+
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
 
         self.ws = await websockets.connect(uri=self.ws_uri,
                                            ping_interval=ping_interval,
                                            ping_timeout=ping_timeout
                                            )
+        # channel ids are only valid for the connection they were assigned on
+        self.channel_routes.clear()
 
-        for feed in self.feeds:
+        if subscriptions is None:
+            subscriptions = {feed: list(self.pairs) for feed in self.feeds}
+
+        for feed, pairs in subscriptions.items():
             try:
 
                 #! implement way of checking which feeds we have already subd to
-                data = await self.subscription_parser.public(self.pairs, self.timeframe, self.depth, feed)
+                data = await self.subscription_parser.public(pairs, self.timeframe, self.depth, feed)
 
 
                 payload = ujson.dumps(data)
                 await self.ws.send(payload)
+                self.subscriptions[feed] = pairs
                 await asyncio.sleep(0.1)
 
             except Exception as e:
@@ -78,6 +126,37 @@ class PublicFeedReaderBase():
                 await log_exc_to_db(logger, e)
 
 
+    async def reconnect(self):
+        """Open a new connection and subscribe again to the feeds and pairs that were active.
+        Books of the exchange are invalidated, updates are ignored until the new snapshots arrive.
+        """
+        self.orderbooks.invalidate(self.exchange, self.subscriptions.get("orderbook", []))
+        subscriptions = dict(self.subscriptions) or None
+
+        try:
+            await self.ws.close()
+        except Exception as e:
+            log_exception(logger, e)
+
+        await self.subscribe(self.ping_interval, self.ping_timeout, subscriptions)
+
+
+    async def resync_orderbook(self, symbol: PAIR):
+        """Invalidate book of a single symbol and resubscribe to get a new snapshot,
+        other symbols and feeds are left untouched
+        """
+        self.orderbooks.get(self.exchange, symbol, depth=self.depth).clear()
+
+        try:
+            data = await self.subscription_parser.public([symbol], self.timeframe, self.depth, "orderbook")
+            await self.ws.send(ujson.dumps({**data, "event": "unsubscribe"}))
+            await self.ws.send(ujson.dumps(data))
+
+        except Exception as e:
+            log_exception(logger, e)
+            await log_exc_to_db(logger, e)
+
+
     async def close(self):
         try:
             # await self.ws.wait_closed()
@@ -87,6 +166,13 @@ class PublicFeedReaderBase():
             await log_exc_to_db(logger, e)
 
 
+    def is_droppable(self, msg: str) -> bool:
+        """Raw frames that may be dropped when the feedhandler queue overflows
+        (defaults to none, exchanges override)
+        """
+        return False
+
+
     async def msg_handler(self, msg, redis_pool):
         """feedhandler will async iterate over message
         we need to route them to each publish method
@@ -94,6 +180,13 @@ class PublicFeedReaderBase():
 
         #! should this return a NoobitResponse object ?
 
+        # raw frame is decoded only once, routing and publish methods receive the decoded message
+        try:
+            msg = rapidjson.loads(msg)
+        except ValueError as e:
+            logger.error(e)
+            return
+
         route = await self.route_message(msg)
 
         if route not in WS_ROUTE:
@@ -101,7 +194,7 @@ class PublicFeedReaderBase():
 
         logger.debug(f"msg handler routing to {route}")
         try:
-            await self.route_to_method[route](ujson.loads(msg), redis_pool)
+            await self.route_to_method[route](msg, redis_pool)
         except Exception as e:
             log_exception(logger, e)
             await log_exc_to_db(logger, e)
@@ -177,16 +270,50 @@ class PublicFeedReaderBase():
 
 
 
+    def validate_record_sample(self, model, record):
+        """In "sampled" stream validation mode, validate one record every <validation_sample_rate>
+        against the pydantic model, raises pydantic.ValidationError
+        """
+        if self.stream_validation != "sampled":
+            return
+
+        self._validation_counter += 1
+        if self._validation_counter % self.validation_sample_rate == 0:
+            model(**record._asdict())
+
+
+
+    def record_to_dict(self, record) -> dict:
+        """Published records carry float prices and volumes, whatever the numeric mode of the stream parser"""
+        if self.stream_parser.numeric is None:
+            return record._asdict()
+        return self.stream_parser.numeric.record_to_dict(record)
+
+
+
     async def publish_data_trade(self, msg, redis_pool):
         # public trades
         # no snapshots
         try:
+            if self.stream_validation != "always":
+                records = self.stream_parser.trade_records(msg)
+                if records:
+                    self.validate_record_sample(Trade, records[0])
+                if self.recorder is not None:
+                    self.recorder.record_trades(self.exchange, records, self.stream_parser.numeric)
+                for record in records:
+                    update_chan = f"ws:public:data:trade:update:{self.exchange}:{record.symbol}"
+                    await redis_pool.publish(update_chan, ujson.dumps(self.record_to_dict(record)))
+                return
+
             parsed = self.stream_parser.trade(msg)
             # should return dict that we validates vs Trade Model
             validated = TradesList(data=parsed, last=None)
             # then we want to return a response
 
             value = validated.data
+            if self.recorder is not None:
+                self.recorder.record_trades(self.exchange, value)
 
             resp = OKResponse(
                 status_code=200,
@@ -243,26 +370,63 @@ class PublicFeedReaderBase():
     #! use a message counter to determine snapshot instead of conditional for each message
     async def publish_data_orderbook(self, msg, redis_pool):
         try:
-            # with current logic parser needs to return a dict
-            # that has bool values for keys is_snapshot and is_update
-            parsed = self.stream_parser.orderbook(msg)
-            # should return dict that we validates vs Trade Model
-            validated = OrderBook(**parsed)
-            # then we want to return a response
+            if self.stream_validation != "always":
+                # record has the same fields as the validated model
+                validated = self.stream_parser.orderbook_record(msg)
+                self.validate_record_sample(OrderBook, validated)
+            else:
+                # with current logic parser needs to return a dict
+                # that has bool values for keys is_snapshot and is_update
+                parsed = self.stream_parser.orderbook(msg)
+                # should return dict that we validates vs Trade Model
+                validated = OrderBook(**parsed)
+
+            book = self.orderbooks.get(self.exchange, validated.symbol, depth=self.depth)
 
             if validated.is_snapshot:
-                self.full_orderbook["asks"] = Counter(validated.asks)
-                self.full_orderbook["bids"] = Counter(validated.bids)
+                book.apply_snapshot(validated.asks, validated.bids)
+                if self.recorder is not None:
+                    self.recorder.record_orderbook(self.exchange, book.symbol, book.sequence, book.asks, book.bids, is_snapshot=True, utcTime=validated.utcTime)
+                if self.orderbook_mode == "diff":
+                    await self.publish_orderbook_snapshot(book, redis_pool)
+                    return
                 update_chan = f"ws:public:data:orderbook:snapshot:{self.exchange}:{validated.symbol}"
             else:
-                self.full_orderbook["asks"] += Counter(validated.asks)
-                self.full_orderbook["bids"] += Counter(validated.bids)
+                if not book.is_synced:
+                    # updates received before the snapshot can not be applied
+                    return
+                asks_diff, bids_diff = book.apply_update(validated.asks, validated.bids)
                 update_chan = f"ws:public:data:orderbook:update:{self.exchange}:{validated.symbol}"
 
+                if validated.checksum is not None:
+                    checksum = self.stream_parser.orderbook_checksum(book)
+                    if checksum != validated.checksum:
+                        logger.warning(f"Orderbook checksum mismatch for {validated.symbol} : resyncing")
+                        await self.resync_orderbook(validated.symbol)
+                        return
+
+                if self.recorder is not None:
+                    self.recorder.record_orderbook(self.exchange, book.symbol, book.sequence, asks_diff, bids_diff, is_snapshot=False, utcTime=validated.utcTime)
+
+                if self.orderbook_mode == "diff":
+                    # always publish, even if empty, so consumers do not see a gap in the sequence
+                    diff_chan = f"ws:public:data:orderbook:diff:{self.exchange}:{validated.symbol}"
+                    diff = {
+                        "symbol": validated.symbol,
+                        "sequence": book.sequence,
+                        "asks": serialize_levels(asks_diff),
+                        "bids": serialize_levels(bids_diff)
+                    }
+                    await redis_pool.publish(diff_chan, ujson.dumps(diff))
+
+                    if book.sequence % self.snapshot_interval == 0:
+                        await self.publish_orderbook_snapshot(book, redis_pool)
+                    return
+
 
             resp = OKResponse(
                 status_code=200,
-                value=self.full_orderbook
+                value=book.to_dict()
             )
 
             await redis_pool.publish(update_chan, ujson.dumps(resp.value))
@@ -279,11 +443,37 @@ class PublicFeedReaderBase():
 
 
 
+    async def publish_orderbook_snapshot(self, book, redis_pool):
+        """full image of the book with its sequence number, so that diff consumers can (re)sync
+        see: noobit.processor.orderbook.L2BookReplica
+        """
+        snapshot_chan = f"ws:public:data:orderbook:snapshot:{self.exchange}:{book.symbol}"
+        snapshot = {
+            "symbol": book.symbol,
+            "sequence": book.sequence,
+            "asks": serialize_levels(book.asks),
+            "bids": serialize_levels(book.bids)
+        }
+        await redis_pool.publish(snapshot_chan, ujson.dumps(snapshot))
+
+
+
     async def publish_data_spread(self, msg, redis_pool):
         try:
+            if self.stream_validation != "always":
+                record = self.stream_parser.spread_record(msg)
+                self.validate_record_sample(Spread, record)
+                if self.recorder is not None:
+                    self.recorder.record_spread(self.exchange, record, self.stream_parser.numeric)
+                update_chan = f"ws:public:data:spread:update:{self.exchange}:{record.symbol}"
+                await redis_pool.publish(update_chan, ujson.dumps(self.record_to_dict(record)))
+                return
+
             parsed = self.stream_parser.spread(msg)
 
             validated = Spread(**parsed)
+            if self.recorder is not None:
+                self.recorder.record_spread(self.exchange, validated)
 
             resp = OKResponse(
                 status_code=200,
@@ -12,6 +12,8 @@ class PublicFeedReaderABC(ABC):
             - publish_subscription_status
             - publish_data
 
+        msg is already json loaded by msg_handler
+
         To be implemented by ExchangeFeedReader
         """
         raise NotImplementedError
@@ -8,21 +8,19 @@ import hashlib
 import base64
 import hmac
 import os
-import asyncio
 from collections import deque
 
 import requests
+import httpx
 from dotenv import load_dotenv
 from starlette import status
-import pandas as pd
-
-from noobit_user import get_abs_path
 
 # logger
 from noobit.logger.structlogger import (get_logger, log_exc_to_db, log_exception)
 
 # base classes
 from noobit.exchanges.base.rest import BaseRestAPI
+from noobit.exchanges.base.rest.trade_downloader import TradeDownloader
 
 # models
 from noobit.models.data.base.types import PAIR
@@ -51,11 +49,14 @@ class KrakenRestAPI(BaseRestAPI):
     as attribute :py:attr:`response` of this object. It is overwritten
     on each query.
     .. note::
-       No query rate limiting is performed.
+       Queries are rate limited client side, see :py:mod:`noobit.exchanges.base.rest.rate_limit`.
     """
 
     # env_keys_dq = deque()
 
+    # class level so pair metadata can be loaded before instantiation
+    exchange = "Kraken"
+
     def __init__(self):
 
         #! SETTLE FOR A FORMAT FOR ALL PAIRS AND EXCHANGE NAMES
@@ -66,6 +67,8 @@ class KrakenRestAPI(BaseRestAPI):
         self.private_endpoint = mapping[self.exchange]["private_endpoint"]
         self.public_methods = mapping[self.exchange]["public_methods"]
         self.private_methods = mapping[self.exchange]["private_methods"]
+        self.rate_limits = mapping[self.exchange]["rate_limits"]
+        self.method_costs = mapping[self.exchange]["method_costs"]
 
 
         self.response_parser = KrakenResponseParser()
@@ -106,12 +109,13 @@ class KrakenRestAPI(BaseRestAPI):
 
 
 
-    def _sign(self, data: dict, urlpath: str):
+    def _sign(self, data: dict, urlpath: str, secret: str = None):
         """Sign request data according to Kraken's scheme.
 
         Args:
             data (dict): API request parameters
             urlpath (str): API URL path sans host
+            secret (str): api secret, defaults to current secret
 
         Returns
             signature digest
@@ -122,7 +126,10 @@ class KrakenRestAPI(BaseRestAPI):
         encoded = (str(data['nonce']) + postdata).encode()
         message = urlpath.encode() + hashlib.sha256(encoded).digest()
 
-        signature = hmac.new(base64.b64decode(self.current_secret()),
+        if secret is None:
+            secret = self.current_secret()
+
+        signature = hmac.new(base64.b64decode(secret),
                              message,
                              hashlib.sha512)
         sigdigest = base64.b64encode(signature.digest())
@@ -138,28 +145,46 @@ class KrakenRestAPI(BaseRestAPI):
 
 
 
-    def _request_kraken_asset_pairs(self):
-        base_url = mapping[self.exchange]["base_url"]
-        public_endpoint = mapping[self.exchange]["public_endpoint"]
-        method_endpoint = mapping[self.exchange]["public_methods"]["tradable_pairs"]
-        response = requests.get(f"{base_url}{public_endpoint}/{method_endpoint}")
-        response = response.json()
+    @classmethod
+    def _asset_pairs_url(cls):
+        base_url = mapping[cls.exchange]["base_url"]
+        public_endpoint = mapping[cls.exchange]["public_endpoint"]
+        method_endpoint = mapping[cls.exchange]["public_methods"]["tradable_pairs"]
+        return f"{base_url}{public_endpoint}/{method_endpoint}"
+
 
-        return response
+    @classmethod
+    def _request_pair_metadata(cls):
+        """Blocking request, only used on cold start without on-disk copy (see pair_metadata)"""
+        response = requests.get(cls._asset_pairs_url())
+        return response.json()
 
 
+    @classmethod
+    async def _fetch_pair_metadata(cls):
+        """We can't use query_public method because it will cause a recursion error so we use a separate client"""
+        async with httpx.AsyncClient() as client:
+            response = await client.get(cls._asset_pairs_url())
+            response.raise_for_status()
+            return response.json()
 
-    def _load_normalize_map(self):
+
+    @classmethod
+    def _parse_pair_metadata(cls, response: dict):
+        return cls._load_normalize_map(response), cls._load_pair_specs_map(response)
+
+
+    @staticmethod
+    def _load_normalize_map(response: dict):
         """Map kraken format assets or pair to standardized format assets or pair.
 
+        Args:
+            response: AssetPairs endpoint response
+
         Returns:
             dict of format :
                 {<XXBTZUSD>:<XBT-USD>, <XXBT>:<XBT>}
-
-        Note:
-            We can't use query_public method because it will cause a recursion error so we use the requests module
         """
-        response = self._request_kraken_asset_pairs()
         # {XXBTZUSD: XBT-USD}
         pair_map = {k:v["wsname"].replace("/", "-") for k, v in response["result"].items() if ".d" not in k}
         # {XBTUSD: XBT-USD}
@@ -182,13 +207,15 @@ class KrakenRestAPI(BaseRestAPI):
 
 
 
-    def _load_pair_specs_map(self):
+    @staticmethod
+    def _load_pair_specs_map(response: dict):
         """
         Map standard format pairs to their specs (decimal places of price and volume as well as available leverage)
         Needed to check if we do not pass incorrect values when placing orders
-        """
-        response = self._request_kraken_asset_pairs()
 
+        Args:
+            response: AssetPairs endpoint response
+        """
         pair_specs = {
             v["wsname"].replace("/", "-"): {
                 "volume_decimals": (v["lot_decimals"]),
@@ -267,125 +294,19 @@ class KrakenRestAPI(BaseRestAPI):
     # ==== AGGREGATE HISTRICAL TRADES IF THERE IS NO DIRECT ENDPOINT
     # ================================================================================
 
-    async def aggregate_historical_trades(self, symbol: PAIR):
+    async def aggregate_historical_trades(self, symbol: PAIR, ranges: int = 4):
         """
         kraken does not provide historical ohlc data
         ==> aggregate all historical trades into ohlc
 
+        Args:
+            symbol (str): pair to download trades of
+            ranges (int): number of time ranges downloaded concurrently
+
         Note:
-            So far this is very slow, since we use the get_public_trades method from the API.
-            The method is public and Krakens rate limits are very low for public requests.
-            Eventually, change this to make an authenticated requests.
+            Resumable, an interrupted download continues from its checkpoint (see trade_downloader).
+            Kraken public trades endpoint is rate limited per IP, ranges share that budget.
         """
-        noobit_user_path = get_abs_path()
-        file_path = f"{noobit_user_path}/data/{self.exchange.lower()}_{symbol}_historical_trade_data_fix_api.csv"
-
-        # init
-        since = 0
-        count = 0
-
-        parsed_response = await self.get_public_trades(symbol=symbol)
-        most_recent_trades = parsed_response.value["data"]
-        most_recent_last = parsed_response.value["last"]
-
-        # verify data validity
-        try:
-            df = pd.read_csv(file_path,
-                             names=[
-                                 "symbol",
-                                 "side",
-                                 "ordType",
-                                 "avgPx",
-                                 "cumQty",
-                                 "grossTradeAmt",
-                                 "transactTime",
-                             ],
-                            #  header=None,
-                            #  skiprows=1
-                             )
-            logger.info(df.tail(10))
-
-            # get index for row with highest timestamp
-            max_ts = df["transactTime"].max()
-            logger.info(f"most recent timestamp:  {max_ts}")
-
-            [max_ts_index] = df.index[df["transactTime"] == max_ts].tolist()
-            logger.info(f"corresponding index: {max_ts_index}")
-            # drop row where index > max_ts_index
-            # (means they were wrongly appended to file)
-            df = df[(df["transactTime"] <= max_ts) & (df.index <= max_ts_index)]
-
-            # overwrite
-            df.to_csv(path_or_buf=file_path,
-                      mode="w",
-                      header=False,
-                      index=False,
-                      )
-
-            since = df["transactTime"].iloc[-1]
-            logger.info(df.tail(10))
-            logger.info(f"Datetime of last Trade entry: {pd.to_datetime(since)}")
-
-        except FileNotFoundError as e:
-            logger.warning("CSV file does not exist")
-            logger.warning("Creating file and populating with latest trades data")
-            since_0_trades = await self.get_public_trades(symbol, since=0)
-            trades_df = pd.DataFrame(since_0_trades.value["data"])
-            trades_df = trades_df.drop(
-                [
-                    "trdMatchID",
-                    "orderID",
-                    "clOrdID",
-                    "commission",
-                    "tickDirection",
-                    "text"
-                ],
-                axis=1
-            )
-            trades_df.to_csv(path_or_buf=file_path,
-                             mode="w",
-                             header=False,
-                             index=False,
-                             )
-
-        except Exception as e:
-            log_exception(logger, e)
-            await log_exc_to_db(logger, e)
-
-
-
-        try:
-            while since < most_recent_last:
-                #! get_public_trades has no since arg yet, need to add it
-                trades = await self.get_public_trades(symbol=symbol, since=since)
-                #! now returns data under a different format
-                trades_df = pd.DataFrame(trades.value["data"])
-                trades_df = trades_df.drop(
-                    [
-                        "trdMatchID",
-                        "orderID",
-                        "clOrdID",
-                        "commission",
-                        "tickDirection",
-                        "text"
-                    ],
-                    axis=1
-                )
-                trades_df.to_csv(path_or_buf=file_path,
-                                 mode="a",
-                                 header=False,
-                                 index=False,
-                                 )
-                count += len(trades.value["data"])
-                since = trades.value["last"]
-                # otherwise we will get rate limited
-                await asyncio.sleep(2)
-                logger.info(f"count : {count}")
-                logger.info(pd.to_datetime(int(since)))
-        except KeyboardInterrupt:
-            pass
-        except Exception as e:
-            log_exception(logger, e)
-            await log_exc_to_db(logger, e)
-
-        return {"count": count}
+        downloader = TradeDownloader(self, ranges=ranges)
+        counts = await downloader.download([symbol])
+        return {"count": counts[symbol]}
@@ -50,6 +50,27 @@ mapping = {
                         "place_order": "AddOrder",
                         "cancel_order": "CancelOrder",
                         "ws_token": "GetWebSocketsToken"
+                    },
+
+                    # see https://support.kraken.com/hc/en-us/articles/206548367
+                    # endpoint class: (max counter, counter decay per second)
+                    # private values are for starter tier (intermediate: 20, 0.5 / pro: 20, 1)
+                    "rate_limits": {
+                        "public": (1, 1),
+                        "private": (15, 0.33),
+                        # orders have their own counter, separate from other private calls
+                        "trading": (60, 1),
+                    },
+
+                    # method: (endpoint class, cost), methods not listed cost 1 in public or private class
+                    "method_costs": {
+                        "trades_history": ("private", 2),
+                        "closed_positions": ("private", 2),
+                        "ledger": ("private", 2),
+                        "ledger_info": ("private", 2),
+                        "trades_info": ("private", 2),
+                        "place_order": ("trading", 1),
+                        "cancel_order": ("trading", 1),
                     }
                 },
 
@@ -0,0 +1,6 @@
+# events shared by public and private connections
+EVENT_TO_ROUTE = {
+    "systemStatus": "system_status",
+    "subscriptionStatus": "subscription_status",
+    "heartbeat": "heartbeat",
+}
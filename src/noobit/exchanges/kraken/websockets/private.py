@@ -5,8 +5,6 @@ to appropriate redis channel
 from typing import List
 from typing_extensions import Literal
 
-import ujson
-
 
 # base classes
 from noobit.exchanges.base.websockets import BasePrivateFeedReader
@@ -14,11 +12,20 @@ from noobit.exchanges.base.websockets import BasePrivateFeedReader
 # models
 from noobit.models.data.base.types import PAIR, WS_ROUTE
 
+# routing
+from noobit.exchanges.kraken.websockets import EVENT_TO_ROUTE
+
 # parser
 from noobit.models.data.websockets.stream.parse.kraken import KrakenStreamParser
 from noobit.models.data.websockets.subscription.parse.kraken import KrakenSubParser
 
 
+FEED_TO_ROUTE = {
+    "ownTrades": "trade",
+    "openOrders": "order",
+}
+
+
 class KrakenPrivateFeedReader(BasePrivateFeedReader):
 
 
@@ -41,28 +48,13 @@ class KrakenPrivateFeedReader(BasePrivateFeedReader):
         """
         forward to appropriate parser and eventually publish
         to redis channel
-        """
 
-        if "systemStatus" in msg:
-            route = "system_status"
-            return route
-
-        elif "subscription" in msg:
-            route = "subscription_status"
-            return route
-
-        elif "heartbeat" in msg:
-            route = "heartbeat"
-            return route
-
-        else:
-            msg = ujson.loads(msg)
-            feed = msg[1]
-
-            if feed == "ownTrades":
-                route = "trade"
+        Args:
+            msg: json loaded message
+                events are dicts, data messages are lists
+        """
 
-            if feed == "openOrders":
-                route = "order"
+        if isinstance(msg, dict):
+            return EVENT_TO_ROUTE.get(msg.get("event"))
 
-            return route
+        return FEED_TO_ROUTE.get(msg[1])
@@ -1,20 +1,31 @@
 from typing import List
 from typing_extensions import Literal
 
-import ujson
-
 
 # base classes
 from noobit.exchanges.base.websockets import BasePublicFeedReader
 
 # models
 from noobit.models.data.base.types import TIMEFRAME, PAIR, WS_ROUTE
+from noobit.models.data.base.numeric import NumericConverter
+
+# routing
+from noobit.exchanges.kraken.websockets import EVENT_TO_ROUTE
 
 # parser
 from noobit.models.data.websockets.stream.parse.kraken import KrakenStreamParser
 from noobit.models.data.websockets.subscription.parse.kraken import KrakenSubParser
 
 
+# book channels are named after their depth (e.g "book-10")
+FEED_TO_ROUTE = {
+    "ticker": "instrument",
+    "ohlc": "ohlc",
+    "spread": "spread",
+    "trade": "trade",
+}
+
+
 class KrakenPublicFeedReader(BasePublicFeedReader):
 
 
@@ -22,53 +33,91 @@ class KrakenPublicFeedReader(BasePublicFeedReader):
                  pairs: List[PAIR],
                  timeframe: TIMEFRAME = 1,
                  depth: int = 10,
-                 feeds: List[str] = ["instrument", "trade", "orderbook"]
+                 feeds: List[str] = ["instrument", "trade", "orderbook"],
+                 orderbook_mode: Literal["full", "diff"] = "full",
+                 snapshot_interval: int = 100,
+                 stream_validation: Literal["always", "sampled", "never"] = "always",
+                 validation_sample_rate: int = 1000,
+                 numeric: NumericConverter = None,
+                 recorder=None,
+                 ws_uri: str = None
                  ):
 
         self.exchange = "kraken"
-        self.ws_uri = "wss://ws.kraken.com"
+        # can be pointed to a local replay server (see noobit.processor.replay)
+        self.ws_uri = ws_uri or "wss://ws.kraken.com"
 
         self.subscription_parser = KrakenSubParser()
-        self.stream_parser = KrakenStreamParser()
+        self.stream_parser = KrakenStreamParser(numeric=numeric)
 
-        super().__init__(pairs=pairs, timeframe=timeframe, depth=depth, feeds=feeds)
+        super().__init__(pairs=pairs,
+                         timeframe=timeframe,
+                         depth=depth,
+                         feeds=feeds,
+                         orderbook_mode=orderbook_mode,
+                         snapshot_interval=snapshot_interval,
+                         stream_validation=stream_validation,
+                         validation_sample_rate=validation_sample_rate,
+                         recorder=recorder
+                         )
 
 
 
     async def route_message(self, msg) -> Literal[WS_ROUTE]:
         """
         forward to appropriate parser ==> redis channel
+
+        Args:
+            msg: json loaded message
+                events are dicts, data messages are lists
         """
 
-        if "systemStatus" in msg:
-            route = "system_status"
+        if isinstance(msg, dict):
+            route = EVENT_TO_ROUTE.get(msg.get("event"))
+            if route == "subscription_status":
+                self.update_channel_routes(msg)
             return route
 
-        elif "subscription" in msg:
-            route = "subscription_status"
-            return route
+        # data messages start with the channelID assigned in subscription status
+        try:
+            return self.channel_routes[msg[0]]
+        except (KeyError, TypeError):
+            pass
 
-        elif "heartbeat" in msg:
-            route = "heartbeat"
-            return route
+        # book updates for both sides have one more element
+        feed = msg[-2]
 
-        else:
-            msg = ujson.loads(msg)
-            feed = msg[2]
+        if feed.startswith("book"):
+            return "orderbook"
 
-            if feed == "ticker":
-                route = "instrument"
+        return FEED_TO_ROUTE.get(feed)
 
-            if feed == "ohlc":
-                route = "ohlc"
 
-            if feed == "spread":
-                route = "spread"
 
-            if "book" in feed:
-                route = "orderbook"
+    def is_droppable(self, msg: str) -> bool:
+        """Book updates can be dropped on queue overflow, snapshots can not.
+        A missed update shows up as a checksum mismatch and the book gets resynced.
 
-            if feed == "trade":
-                route = "trade"
+        Args:
+            msg: raw frame, not json loaded
+        """
+        return '"book-' in msg and '"as":' not in msg
 
-            return route
+
+
+    def update_channel_routes(self, msg: dict):
+        """Map channelID to route from subscriptionStatus message
+        so that data messages can be routed with a single lookup
+        (symbol and depth are read from the message itself by the stream parser)
+        """
+
+        channel_id = msg.get("channelID")
+        if channel_id is None:
+            return
+
+        if msg.get("status") == "subscribed":
+            feed = msg["subscription"]["name"]
+            route = "orderbook" if feed == "book" else FEED_TO_ROUTE.get(feed)
+            self.channel_routes[channel_id] = route
+        else:
+            self.channel_routes.pop(channel_id, None)
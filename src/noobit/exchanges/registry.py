@@ -0,0 +1,106 @@
+"""
+Application-wide registry of exchange rest clients
+
+One pooled httpx.AsyncClient per exchange (connections and TLS sessions are reused across requests)
+and one long-lived rest api instance per exchange bound to it.
+Instance lives in settings.CLIENTS, use settings.CLIENTS.api(exchange) instead of instantiating apis.
+"""
+import logging
+from typing import List
+
+import httpx
+
+
+# settings imports this module and structlogger imports settings, so we can not use structlogger here
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry():
+    """
+    Args:
+        http2 (bool): allow HTTP/2 (negotiated with the server)
+        max_keepalive (int): max idle connections kept alive per exchange
+        max_connections (int): max concurrent connections per exchange
+        timeout (float): default request timeout in seconds
+
+    Notes:
+        Clients and apis are created lazily on first use, startup() creates them upfront
+        along with the rate limit counters and key lanes of each api, on the running loop.
+        shutdown() closes all clients, api.close() does not close a registry session.
+    """
+
+    def __init__(self,
+                 http2: bool = True,
+                 max_keepalive: int = 10,
+                 max_connections: int = 100,
+                 timeout: float = 30
+                 ):
+        self.http2 = http2
+        self.max_keepalive = max_keepalive
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        # exchange ==> httpx.AsyncClient
+        self._sessions = {}
+        # exchange ==> rest api instance
+        self._apis = {}
+
+
+    def _new_session(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=self.http2,
+            pool_limits=httpx.PoolLimits(soft_limit=self.max_keepalive, hard_limit=self.max_connections),
+            timeout=self.timeout
+        )
+
+
+    def session(self, exchange: str) -> httpx.AsyncClient:
+        exchange = exchange.lower()
+        try:
+            return self._sessions[exchange]
+        except KeyError:
+            session = self._new_session()
+            self._sessions[exchange] = session
+            return session
+
+
+    def api(self, exchange: str):
+        """Long-lived rest api of exchange, bound to the exchange pooled session"""
+        exchange = exchange.lower()
+        try:
+            return self._apis[exchange]
+        except KeyError:
+            # rest apis import settings, which holds the registry instance
+            from noobit.exchanges.mappings import rest_api_map
+
+            api = rest_api_map[exchange]()
+            api.session = self.session(exchange)
+            api.shared_session = True
+            self._apis[exchange] = api
+            return api
+
+
+    async def startup(self, exchanges: List[str]):
+        """Load pair metadata and create clients for exchanges, to call once the event loop is running"""
+        from noobit.exchanges.mappings import rest_api_map
+
+        for exchange in exchanges:
+            exchange = exchange.lower()
+            try:
+                await rest_api_map[exchange].load_pair_metadata()
+                # api may have been created before, and used on another loop
+                self.api(exchange).create_limiters()
+                logger.info(f"Registered {exchange} rest client")
+            except Exception as e:
+                logger.error(e)
+
+
+    async def shutdown(self):
+        for exchange, session in self._sessions.items():
+            try:
+                await session.aclose()
+            except Exception as e:
+                logger.error(e)
+        self._sessions.clear()
+        self._apis.clear()
+        logger.info("Closed all rest clients")
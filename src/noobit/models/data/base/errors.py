@@ -68,9 +68,11 @@ class ErrorResult(ErrorHandlerResult):
         value (Union[list, dict, str])
         accept (bool)
         sleep (Optional[float])
+        exception (Optional[str]): name of the error class
     """
     accept: bool
     sleep: Optional[float] = None
+    exception: Optional[str] = None
     is_ok: bool = False
     is_error: bool = True
 
@@ -95,15 +97,22 @@ class Ok():
 
 
 class BaseError(Exception):
+    """
+    Class attributes, overriden by subclasses:
+        accept (bool): False if the query should be retried (see exchanges.base.rest.retry)
+        sleep (float): min seconds to wait before retrying
+        status_code (int)
+    """
+
+    accept = True
+    sleep = None
+    status_code = status.HTTP_400_BAD_REQUEST
 
     def __init__(self, raw_error: str, endpoint: str, query_args: dict):
         self.raw_error = raw_error
         self.exception = self.__class__.__name__
         self.endpoint = endpoint
         self.query_args = query_args
-        self.accept = True
-        self.sleep = None
-        self.status_code = status.HTTP_400_BAD_REQUEST
 
         msg = f"EXCEPTION:{self.exception}\nRaw Error: {self.raw_error}\n{14*' '}Query Endpoint: {self.endpoint}\n{14*' '}Query Arguments: {self.query_args}"
         super().__init__(msg)
@@ -225,6 +234,8 @@ class OnMaintenance(ExchangeNotAvailable):
 
 class InvalidNonce(NetworkError):
     status_code = status.HTTP_400_BAD_REQUEST
+    # a new nonce is generated on each attempt
+    accept = False
 
 
 class RequestTimeout(NetworkError):
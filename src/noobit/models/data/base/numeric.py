@@ -0,0 +1,125 @@
+"""
+Numeric representations for prices and volumes parsed from exchange strings.
+
+    "decimal" : decimal.Decimal (exact, slowest)
+    "float"   : float64
+    "fixed"   : integers scaled by 10**price_decimals / 10**volume_decimals of the pair,
+                notional (price * volume) is scaled by 10**(price_decimals + volume_decimals)
+"""
+from decimal import Decimal
+from operator import mul
+
+from typing_extensions import Literal
+
+
+NUMERIC_MODE = Literal["decimal", "float", "fixed"]
+
+# fields of stream records (see models.data.websockets.stream.records) by kind of value
+PRICE_FIELDS = ("avgPx", "bestBid", "bestAsk")
+VOLUME_FIELDS = ("cumQty",)
+NOTIONAL_FIELDS = ("grossTradeAmt",)
+
+
+def to_fixed(value: str, decimals: int) -> int:
+    """Parse decimal string into integer scaled by 10**decimals, without going through Decimal or float
+    ("5541.30000", 1) ==> 55413
+
+    Note:
+        digits beyond <decimals> are truncated
+    """
+    if value[0] == "-":
+        return -to_fixed(value[1:], decimals)
+
+    whole, _, fraction = value.partition(".")
+    return int(whole or "0") * 10**decimals + int(fraction[:decimals].ljust(decimals, "0") or "0")
+
+
+def from_fixed(value: int, decimals: int) -> Decimal:
+    """Inverse of to_fixed"""
+    return Decimal(value).scaleb(-decimals)
+
+
+class NumericConverter():
+    """Convert price and volume strings to the requested numeric mode.
+
+    Args:
+        mode (str): one of "decimal", "float", "fixed"
+        pair_specs (dict): needed for "fixed" mode, as in APIBase.exchange_pair_specs
+            {<symbol>: {"price_decimals": int, "volume_decimals": int, ...}}
+
+    Notes:
+        Conversion methods are bound once at init so there is no mode check per value.
+    """
+
+    def __init__(self, mode: NUMERIC_MODE = "decimal", pair_specs: dict = None):
+
+        if mode == "fixed" and not pair_specs:
+            raise ValueError("Fixed point numeric mode needs pair specs (price and volume decimals)")
+
+        self.mode = mode
+        self.pair_specs = pair_specs or {}
+
+        # price / volume parse exchange strings, price_to_float / volume_to_float convert parsed values back
+        if mode == "decimal":
+            self.price = self.volume = self._to_decimal
+            self.price_to_float = self.volume_to_float = self.notional_to_float = self._to_float
+        elif mode == "float":
+            self.price = self.volume = self._to_float
+            self.price_to_float = self.volume_to_float = self.notional_to_float = self._to_float
+        elif mode == "fixed":
+            self.price = self._price_to_fixed
+            self.volume = self._volume_to_fixed
+            self.price_to_float = self._price_fixed_to_float
+            self.volume_to_float = self._volume_fixed_to_float
+            self.notional_to_float = self._notional_fixed_to_float
+        else:
+            raise ValueError(f"Unknown numeric mode: {mode}")
+
+        # works for Decimal, float and scaled integers
+        self.notional = mul
+
+
+    @staticmethod
+    def _to_decimal(value: str, symbol: str):
+        return Decimal(value)
+
+
+    @staticmethod
+    def _to_float(value: str, symbol: str):
+        return float(value)
+
+
+    def _price_to_fixed(self, value: str, symbol: str):
+        return to_fixed(value, self.pair_specs[symbol]["price_decimals"])
+
+
+    def _volume_to_fixed(self, value: str, symbol: str):
+        return to_fixed(value, self.pair_specs[symbol]["volume_decimals"])
+
+
+    def _price_fixed_to_float(self, value: int, symbol: str):
+        return value / 10**self.pair_specs[symbol]["price_decimals"]
+
+
+    def _volume_fixed_to_float(self, value: int, symbol: str):
+        return value / 10**self.pair_specs[symbol]["volume_decimals"]
+
+
+    def _notional_fixed_to_float(self, value: int, symbol: str):
+        specs = self.pair_specs[symbol]
+        return value / 10**(specs["price_decimals"] + specs["volume_decimals"])
+
+
+    def record_to_dict(self, record) -> dict:
+        """Stream record parsed with this converter to a dict of float prices and volumes,
+        to publish to consumers that do not know the numeric mode (or the pair decimals)
+        """
+        values = record._asdict()
+        symbol = record.symbol
+        for field in values.keys() & PRICE_FIELDS:
+            values[field] = self.price_to_float(values[field], symbol)
+        for field in values.keys() & VOLUME_FIELDS:
+            values[field] = self.volume_to_float(values[field], symbol)
+        for field in values.keys() & NOTIONAL_FIELDS:
+            values[field] = self.notional_to_float(values[field], symbol)
+        return values
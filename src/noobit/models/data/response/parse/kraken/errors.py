@@ -86,6 +86,7 @@ def handle_error_messages(response, endpoint, data):
         try:
             error_result = ErrorResult(accept=noobit_error.accept,
                                        sleep=noobit_error.sleep,
+                                       exception=noobit_error.exception,
                                        value=str(noobit_error),
                                        status_code=noobit_error.status_code
                                        )
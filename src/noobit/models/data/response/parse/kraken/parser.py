@@ -1,6 +1,7 @@
 from typing_extensions import Literal
 
 from noobit.models.data.base.types import PAIR
+from noobit.models.data.base.numeric import NumericConverter
 from noobit.models.data.response.parse.base import BaseResponseParser
 
 from .orders import parse_orders_to_list, parse_orders_by_id
@@ -18,6 +19,13 @@ from .exposure import parse_exposure
 class KrakenResponseParser(BaseResponseParser):
 
 
+    def __init__(self, numeric: NumericConverter = None):
+        # numeric representation of public trade prices and volumes (see parse_public_trades)
+        if numeric is not None and numeric.mode == "fixed":
+            raise ValueError("Rest responses are validated against Decimal models, fixed point numeric mode is only for stream records")
+        self.numeric = numeric if numeric is not None else NumericConverter("decimal")
+
+
     def handle_errors(self, response, endpoint, data):
         return handle_error_messages(response, endpoint, data)
 
@@ -74,7 +82,7 @@ class KrakenResponseParser(BaseResponseParser):
 
 
     def trades(self, response):
-        return parse_public_trades(response)
+        return parse_public_trades(response, self.numeric)
 
 
     def orderbook(self, response):
@@ -1,13 +1,16 @@
 import logging
-from decimal import Decimal
 
 import stackprinter
 
 from noobit.server import settings
 from noobit.models.data.base.types import PAIR
+from noobit.models.data.base.numeric import NumericConverter
 
 
-def parse_public_trades(response):
+DECIMAL = NumericConverter("decimal")
+
+
+def parse_public_trades(response, numeric: NumericConverter = DECIMAL):
 
     try:
         key = list(response.keys())[0]
@@ -19,7 +22,7 @@ def parse_public_trades(response):
 
     try:
         parsed_trades = [
-            parse_single_trade(item, key) for item in raw_trades
+            parse_single_trade(item, key, numeric) for item in raw_trades
         ]
     except Exception as e:
         logging.error(stackprinter.format(e, style="darkbg2"))
@@ -31,21 +34,29 @@ def parse_public_trades(response):
 
 
 
-def parse_single_trade(list_item: list, symbol: PAIR):
+def parse_single_trade(list_item: list, symbol: PAIR, numeric: NumericConverter = DECIMAL):
+    """
+    Args:
+        numeric (NumericConverter): numeric representation of prices and volumes,
+            "decimal" or "float" since responses are validated against Decimal models
+    """
     map_to_standard = settings.SYMBOL_MAP_TO_STANDARD["KRAKEN"]
     # map_to_exchange = settings.SYMBOL_MAP_TO_EXCHANGE["KRAKEN"]
 
     try:
+        pair = map_to_standard[symbol.upper()]
+        price = numeric.price(list_item[0], pair)
+        volume = numeric.volume(list_item[1], pair)
         parsed_info = {
             "trdMatchID": None,
             "orderID": None,
-            "symbol": map_to_standard[symbol.upper()],
+            "symbol": pair,
             "transactTime": list_item[2]*10**9,
             "side": "buy" if list_item[3] == "b" else "sell",
             "ordType": "market" if list_item[4] == "m" else "limit",
-            "avgPx": list_item[0],
-            "cumQty": list_item[1],
-            "grossTradeAmt": Decimal(list_item[0]) * Decimal(list_item[1]),
+            "avgPx": price,
+            "cumQty": volume,
+            "grossTradeAmt": numeric.notional(price, volume),
             "text": list_item[5]
         }
     except Exception as e:
@@ -1,5 +1,8 @@
+from typing import Optional
+
 from typing_extensions import Literal
 
+from noobit.models.data.base.types import TIMESTAMP
 from noobit.models.data.response.orderbook import OrderBook as OBRestModel
 
 
@@ -17,4 +20,10 @@ class OrderBook(OBRestModel):
     action: Literal["partial", "update", "insert", "delete"] = "insert"
 
     is_snapshot: bool
-    is_update: bool
\ No newline at end of file
+    is_update: bool
+
+    # checksum of the book after update has been applied (if exchange provides it)
+    checksum: Optional[int] = None
+
+    # exchange time of the most recent level in the message (if exchange provides it)
+    utcTime: Optional[TIMESTAMP] = None
\ No newline at end of file
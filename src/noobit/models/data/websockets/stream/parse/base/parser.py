@@ -1,7 +1,19 @@
 from abc import ABC, abstractmethod
 
+from noobit.models.data.websockets.stream import Trade, Spread, OrderBook
+from noobit.models.data.websockets.stream.records import TradeRecord, SpreadRecord, OrderBookRecord
+
+
+def _to_record(record_type, validated):
+    return record_type(**{field: getattr(validated, field) for field in record_type._fields})
+
+
 class BaseStreamParser(ABC):
 
+    # numeric representation of trusted stream records, None for Decimal values
+    # (see noobit.models.data.base.numeric)
+    numeric = None
+
 
     @abstractmethod
     def trade(self, message) -> dict:
@@ -13,6 +25,40 @@ class BaseStreamParser(ABC):
         raise NotImplementedError
 
 
+    @abstractmethod
+    def spread(self, message) -> dict:
+        raise NotImplementedError
+
+
     @abstractmethod
     def orderbook(self, message) -> dict:
         raise NotImplementedError
+
+
+    def orderbook_checksum(self, book) -> int:
+        """Checksum of L2Book to compare against the one sent by the exchange
+        Returns None if exchange does not send checksums
+        """
+        return None
+
+
+
+    # ================================================================================
+    # ==== TRUSTED STREAM MODE (no pydantic validation)
+    # ================================================================================
+    # defaults go through the validated path, exchanges override them to skip validation
+
+
+    def trade_records(self, message) -> list:
+        """list of noobit.models.data.websockets.stream.records.TradeRecord"""
+        return [_to_record(TradeRecord, Trade(**trade)) for trade in self.trade(message)]
+
+
+    def spread_record(self, message):
+        """noobit.models.data.websockets.stream.records.SpreadRecord"""
+        return _to_record(SpreadRecord, Spread(**self.spread(message)))
+
+
+    def orderbook_record(self, message):
+        """noobit.models.data.websockets.stream.records.OrderBookRecord"""
+        return _to_record(OrderBookRecord, OrderBook(**self.orderbook(message)))
@@ -1,12 +1,22 @@
+import zlib
+from decimal import Decimal
+from itertools import islice
+
 from noobit.logger.structlogger import get_logger, log_exception
+from noobit.models.data.websockets.stream.records import OrderBookRecord
+from noobit.models.data.websockets.stream.parse.kraken.trade import timestamp_to_ns
 
 logger = get_logger(__name__)
 
 
 def parse_orderbook(message):
 
-    info = message[1]
-    pair = message[3].replace("/", "-")
+    # updates for both sides can be sent as two separate dicts
+    # [channelID, {"a": [...]}, {"b": [...]}, "book-10", "XBT/USD"]
+    info = {}
+    for item in message[1:-2]:
+        info.update(item)
+    pair = message[-1].replace("/", "-")
 
     #! we could possibly be a lot more efficient if we count the messages we have received from each channel
     #! so we dont need to do an if check every time
@@ -31,7 +41,8 @@ def parse_snapshot(info, pair):
                 item[0]: item[1] for item in info["bs"]
             },
             "is_snapshot": True,
-            "is_update": False
+            "is_update": False,
+            "utcTime": latest_timestamp(info["as"], info["bs"])
         }
 
     except Exception as e:
@@ -57,7 +68,9 @@ def parse_update(info, pair):
                 item[0]: item[1] for item in info["b"]
             } if "b" in keys else {},
             "is_snapshot": False,
-            "is_update": True
+            "is_update": True,
+            "checksum": info.get("c"),
+            "utcTime": latest_timestamp(info.get("a", ()), info.get("b", ()))
         }
 
     except Exception as e:
@@ -67,6 +80,68 @@ def parse_update(info, pair):
 
 
 
+def parse_orderbook_record(message):
+    """Same as parse_orderbook but returns an OrderBookRecord
+    with Decimal prices and volumes, for trusted stream mode
+    """
+
+    info = {}
+    for item in message[1:-2]:
+        info.update(item)
+    pair = message[-1].replace("/", "-")
+
+    is_snapshot = "as" in info
+
+    if is_snapshot:
+        asks, bids = info["as"], info["bs"]
+    else:
+        asks, bids = info.get("a", ()), info.get("b", ())
+
+    return OrderBookRecord(
+        symbol=pair,
+        asks={Decimal(item[0]): Decimal(item[1]) for item in asks},
+        bids={Decimal(item[0]): Decimal(item[1]) for item in bids},
+        is_snapshot=is_snapshot,
+        is_update=not is_snapshot,
+        checksum=int(info["c"]) if "c" in info else None,
+        utcTime=latest_timestamp(asks, bids)
+    )
+
+
+
+def latest_timestamp(asks, bids):
+    """Most recent level timestamp (ns), levels are [price, volume, timestamp(, "r")]"""
+    timestamps = [item[2] for item in asks] + [item[2] for item in bids]
+    if not timestamps:
+        return None
+    return max(timestamp_to_ns(timestamp) for timestamp in timestamps)
+
+
+
+def checksum_orderbook(book):
+    """CRC32 checksum of top 10 levels of each side of an L2Book
+    see: https://docs.kraken.com/websockets/#book-checksum
+
+    Note:
+        Prices and volumes need to keep the precision they were sent with
+        (Decimal parsed from the message strings does)
+    """
+
+    concat = []
+    for side in (book.asks, book.bids):
+        for price, volume in islice(side.items(), 10):
+            concat.append(_format_checksum_value(price))
+            concat.append(_format_checksum_value(volume))
+
+    return zlib.crc32("".join(concat).encode())
+
+
+def _format_checksum_value(value):
+    # "0.05005" ==> "5005"
+    return format(value, "f").replace(".", "").lstrip("0")
+
+
+
 
 
 
@@ -134,4 +209,30 @@ def parse_update(info, pair):
 #   },
 #   "book-10",
 #   "XBT/USD"
+# ]
+
+
+# EXAMPLE OF UPDATE MESSAGE FOR BOTH SIDES
+# [
+#   1234,
+#   {
+#     "a": [
+#       [
+#         "5541.30000",
+#         "2.50700000",
+#         "1534614248.456738"
+#       ]
+#     ]
+#   },
+#   {
+#     "b": [
+#       [
+#         "5541.20000",
+#         "0.00000000",
+#         "1534614335.345903"
+#       ]
+#     ]
+#   },
+#   "book-10",
+#   "XBT/USD"
 # ]
\ No newline at end of file
@@ -1,18 +1,25 @@
 
+from noobit.models.data.base.numeric import NumericConverter
 from noobit.models.data.websockets.stream.parse.base import BaseStreamParser
-from .trade import parse_trades_to_list
+from .trade import parse_trades_to_list, parse_trade_records
 from .instrument import parse_instrument
-from .orderbook import parse_orderbook
+from .orderbook import parse_orderbook, parse_orderbook_record, checksum_orderbook
 from .order import parse_order_snapshot_by_id, parse_order_update_by_id
 from .user_trade import parse_user_trade
 from .add_order import parse_add_order
 from .cancel_order import parse_cancel_order
-from .spread import parse_spread
+from .spread import parse_spread, parse_spread_record
 
 
 class KrakenStreamParser(BaseStreamParser):
 
 
+    def __init__(self, numeric: NumericConverter = None):
+        # numeric representation used by trusted stream records (trades and spreads)
+        # orderbook records always use Decimal, the checksum needs the precision prices were sent with
+        self.numeric = numeric if numeric is not None else NumericConverter("decimal")
+
+
     def trade(self, message) -> list:
         return parse_trades_to_list(message)
 
@@ -25,6 +32,20 @@ class KrakenStreamParser(BaseStreamParser):
     def orderbook(self, message) -> dict:
         return parse_orderbook(message)
 
+    def orderbook_checksum(self, book) -> int:
+        return checksum_orderbook(book)
+
+    # trusted stream mode
+
+    def trade_records(self, message) -> list:
+        return parse_trade_records(message, self.numeric)
+
+    def spread_record(self, message):
+        return parse_spread_record(message, self.numeric)
+
+    def orderbook_record(self, message):
+        return parse_orderbook_record(message)
+
     def order_snapshot(self, message) -> dict:
         return parse_order_snapshot_by_id(message)
 
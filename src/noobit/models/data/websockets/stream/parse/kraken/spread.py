@@ -1,6 +1,8 @@
 from decimal import Decimal
 
 from noobit.logger.structlogger import get_logger, log_exception
+from noobit.models.data.websockets.stream.records import SpreadRecord
+from .trade import timestamp_to_ns
 
 
 logger = get_logger(__name__)
@@ -24,6 +26,23 @@ def parse_spread(message):
     return parsed
 
 
+def parse_spread_record(message, numeric):
+    """Same as parse_spread but returns a SpreadRecord, for trusted stream mode
+
+    Args:
+        numeric (NumericConverter): numeric representation of prices
+    """
+
+    pair = message[3].replace("/", "-")
+
+    return SpreadRecord(
+        symbol=pair,
+        bestBid=numeric.price(message[1][0], pair),
+        bestAsk=numeric.price(message[1][1], pair),
+        utcTime=timestamp_to_ns(message[1][2])
+    )
+
+
 # KRAKEN PAYLOAD EXAMPLE
 # [
 #   0,
@@ -1,6 +1,7 @@
 from decimal import Decimal
 
 from noobit.logger.structlogger import get_logger, log_exception
+from noobit.models.data.websockets.stream.records import TradeRecord
 
 logger = get_logger(__name__)
 
@@ -43,6 +44,45 @@ def parse_single_trade(info, pair):
     return parsed_trade
 
 
+def parse_trade_records(message, numeric):
+    """Same as parse_trades_to_list but returns a list of TradeRecord, for trusted stream mode
+
+    Args:
+        numeric (NumericConverter): numeric representation of prices and volumes
+    """
+
+    pair = message[3].replace("/", "-")
+    to_price, to_volume, notional = numeric.price, numeric.volume, numeric.notional
+
+    records = []
+    for info in message[1]:
+        price = to_price(info[0], pair)
+        volume = to_volume(info[1], pair)
+        records.append(
+            TradeRecord(
+                trdMatchID=None,
+                orderID=None,
+                symbol=pair,
+                side="buy" if (info[3] == "b") else "sell",
+                ordType="market" if (info[4] == "m") else "limit",
+                avgPx=price,
+                cumQty=volume,
+                grossTradeAmt=notional(price, volume),
+                transactTime=timestamp_to_ns(info[2])
+            )
+        )
+
+    return records
+
+
+def timestamp_to_ns(timestamp: str) -> int:
+    """Convert kraken timestamp string (seconds since epoch) to integer nanoseconds
+    "1534614057.321597" ==> 1534614057321597000
+    """
+    seconds, _, fraction = timestamp.partition(".")
+    return int(seconds) * 10**9 + int(fraction[:9].ljust(9, "0"))
+
+
 # KRAKEN STREAM FORMAT (FROM DOC)
 
 # channelID: integer   ChannelID of pair-trade subscription
@@ -0,0 +1,42 @@
+"""
+Lightweight records emitted by stream parsers in trusted stream mode.
+
+Same field names as the pydantic stream models (Trade, Spread, OrderBook)
+but no validation or coercion, so they can be serialized directly on the hot path.
+Use record._asdict() to get the dict to publish or to validate against the pydantic model.
+"""
+from decimal import Decimal
+from typing import NamedTuple, Optional, Dict, Any
+
+from noobit.models.data.base.types import TIMESTAMP
+
+
+class TradeRecord(NamedTuple):
+    trdMatchID: Optional[str]
+    orderID: Optional[str]
+    symbol: str
+    side: str
+    ordType: str
+    avgPx: Any
+    cumQty: Any
+    grossTradeAmt: Any
+    transactTime: TIMESTAMP
+
+
+class SpreadRecord(NamedTuple):
+    symbol: str
+    bestBid: Any
+    bestAsk: Any
+    utcTime: TIMESTAMP
+
+
+class OrderBookRecord(NamedTuple):
+    symbol: str
+    # {<price>: <volume>} with comparable numeric prices, as needed by L2Book
+    asks: Dict[Decimal, Decimal]
+    bids: Dict[Decimal, Decimal]
+    is_snapshot: bool
+    is_update: bool
+    checksum: Optional[int] = None
+    # exchange time of the most recent level in the message (ns)
+    utcTime: Optional[TIMESTAMP] = None
@@ -1,9 +1,8 @@
 import asyncio
 
-import httpx
 
 from noobit.logger.structlogger import get_logger, log_exception
-from noobit.exchanges.mappings import rest_api_map
+from noobit.server import settings
 from noobit.models.data.websockets.subscription.parse.base import BaseSubParser
 
 
@@ -26,7 +25,7 @@ class KrakenSubParser(BaseSubParser):
             data = {"event": "subscribe", "pair": [pair.replace("-", "/") for pair in pairs], "subscription": {"name": map_to_exchange[feed]}}
             if feed == "ohlc":
                 data["subscription"]["interval"] = timeframe
-            if feed == "book":
+            if feed == "orderbook":
                 data["subscription"]["depth"] = depth
 
             return data
@@ -44,9 +43,8 @@ class KrakenSubParser(BaseSubParser):
         exchange_name = map_to_exchange[feed]
 
         try:
-            api = rest_api_map["kraken"]()
-            async with httpx.AsyncClient() as api.session:
-                ws_token = await api.get_websocket_auth_token()
+            api = settings.CLIENTS.api("kraken")
+            ws_token = await api.get_websocket_auth_token()
             data = {"event": "subscribe", "subscription": {"name": map_to_exchange[feed], "token": ws_token.value["token"]}}
             return data
 
@@ -0,0 +1,258 @@
+"""
+Cached OHLCV bars of several timeframes, one binary file per exchange, symbol and timeframe
+
+Bars are fixed-width records (see BAR_DTYPE) in time order, mapped with numpy like trade stores
+(see processor.trade_store). Trades are aggregated to 1 minute bars, higher timeframes are
+derived from these, and only the tail of each file is rewritten on update:
+    <root>/<exchange>_<symbol>_<timeframe>m.bars
+
+Bars are opened at utcTime (ns timestamp of the start of the bar, aligned on the epoch),
+bars without any trade are not stored (see BarCache.to_frame to fill them).
+
+Notes:
+    A cache is fed from a single source: either a trade store (see update_from_store, idempotent)
+    or a live trade stream (see add_trades), so they should be kept in different directories.
+    A live cache can be seeded with complete bars (see seed), for ex from rest api ohlc,
+    as long as only trades more recent than the seed are added.
+"""
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from noobit.logger.structlogger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+BAR_DTYPE = np.dtype([
+    ("utcTime", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+    ("trdCount", "<i8"),
+])
+
+# in minutes
+TIMEFRAMES = (1, 5, 15, 60, 240, 1440)
+
+MINUTE = 60 * 10**9
+
+# trade store rows aggregated at once when building from the store
+CHUNK_ROWS = 10_000_000
+
+
+def _reduce(bins: np.ndarray, open, high, low, close, volume, count) -> np.ndarray:
+    """Reduce rows sharing the same bin (bins must be sorted)"""
+    if not len(bins):
+        return np.empty(0, dtype=BAR_DTYPE)
+
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    ends = np.r_[starts[1:], len(bins)] - 1
+
+    bars = np.empty(len(starts), dtype=BAR_DTYPE)
+    bars["utcTime"] = bins[starts]
+    bars["open"] = open[starts]
+    bars["high"] = np.maximum.reduceat(high, starts)
+    bars["low"] = np.minimum.reduceat(low, starts)
+    bars["close"] = close[ends]
+    bars["volume"] = np.add.reduceat(volume, starts)
+    bars["trdCount"] = np.add.reduceat(count, starts)
+    return bars
+
+
+def aggregate(records: np.ndarray, timeframe: int = 1) -> np.ndarray:
+    """Trade store records (see processor.trade_store.TRADE_DTYPE) to bars of <timeframe> minutes"""
+    times = records["transactTime"]
+    price = records["avgPx"]
+    return _reduce(
+        times - times % (timeframe * MINUTE),
+        price, price, price, price,
+        records["cumQty"],
+        np.ones(len(records), dtype="<i8")
+    )
+
+
+def resample(bars: np.ndarray, timeframe: int) -> np.ndarray:
+    """Bars to bars of a higher <timeframe> (in minutes), also merges bars with the same utcTime"""
+    times = bars["utcTime"]
+    return _reduce(
+        times - times % (timeframe * MINUTE),
+        bars["open"], bars["high"], bars["low"], bars["close"], bars["volume"], bars["trdCount"]
+    )
+
+
+def from_frame(df: pd.DataFrame) -> np.ndarray:
+    """Ohlc dataframe as returned by api.get_ohlc_as_pandas (utcTime in ns) to bars"""
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    for field in BAR_DTYPE.names:
+        bars[field] = pd.to_numeric(df[field])
+    return bars
+
+
+
+
+class BarCache():
+    """
+    Args:
+        root (str): directory of bar files
+        exchange (str)
+        symbol (str)
+        timeframes (iterable): timeframes in minutes, defaults to TIMEFRAMES
+
+    Notes:
+        Any timeframe in minutes is supported, all are derived from 1 minute bars
+    """
+
+    def __init__(self, root: str, exchange: str, symbol: str, timeframes: Iterable[int] = TIMEFRAMES):
+        self.root = root
+        self.exchange = exchange.lower()
+        self.symbol = symbol
+        self.timeframes = sorted(set(int(tf) for tf in timeframes))
+
+
+    def path(self, timeframe: int) -> str:
+        return os.path.join(self.root, f"{self.exchange}_{self.symbol}_{timeframe}m.bars")
+
+
+    def rows(self, timeframe: int) -> int:
+        try:
+            return os.path.getsize(self.path(timeframe)) // BAR_DTYPE.itemsize
+        except FileNotFoundError:
+            return 0
+
+
+    def last_bar(self, timeframe: int) -> Optional[np.void]:
+        bars = self.read(timeframe)
+        return bars[-1] if len(bars) else None
+
+
+    # ================================================================================
+    # ==== WRITE
+
+
+    def _append(self, timeframe: int, bars: np.ndarray):
+        if not len(bars):
+            return
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.path(timeframe), "ab") as f:
+            bars.astype(BAR_DTYPE, copy=False).tofile(f)
+
+
+    def _truncate(self, timeframe: int, rows: int):
+        if rows >= self.rows(timeframe):
+            return
+        with open(self.path(timeframe), "r+b") as f:
+            f.truncate(rows * BAR_DTYPE.itemsize)
+
+
+    def _replace_from(self, timeframe: int, bars: np.ndarray):
+        """Replace cached bars from the first utcTime of <bars> on"""
+        if not len(bars):
+            return
+        cached = self.read(timeframe)
+        self._truncate(timeframe, int(np.searchsorted(cached["utcTime"], bars["utcTime"][0], side="left")))
+        self._append(timeframe, bars)
+
+
+    def _merge(self, timeframe: int, bars: np.ndarray):
+        """Merge <bars> into the last cached bar if they share its utcTime, append the others"""
+        last = self.last_bar(timeframe)
+        if last is not None:
+            # bars before the last cached one are already closed
+            bars = bars[bars["utcTime"] >= last["utcTime"]]
+            if len(bars) and bars["utcTime"][0] == last["utcTime"]:
+                bars = resample(np.concatenate([np.array([last], dtype=BAR_DTYPE), bars]), timeframe)
+        self._replace_from(timeframe, bars)
+
+
+    def add_trades(self, records: np.ndarray):
+        """Add trade store records received in time order (for ex from the live trade stream)"""
+        if not len(records):
+            return
+        minute_bars = aggregate(records)
+        for timeframe in self.timeframes:
+            self._merge(timeframe, resample(minute_bars, timeframe))
+
+
+    def seed(self, timeframe: int, bars: np.ndarray):
+        """Replace cached bars of <timeframe> with bars from another source (for ex rest api ohlc)"""
+        self._replace_from(timeframe, bars)
+
+
+    def update_from_store(self, store) -> int:
+        """Aggregate trades of a trade store that are not in the cache yet
+
+        Only the trades since the last bar of the highest timeframe are read, the last bar of
+        each timeframe is then recomputed entirely, so an interrupted update is simply redone.
+
+        Returns:
+            int: number of trades aggregated
+        """
+        lasts = {tf: self.last_bar(tf) for tf in self.timeframes}
+        start = None if any(last is None for last in lasts.values()) else min(int(last["utcTime"]) for last in lasts.values())
+
+        records = store.read(start=start)
+        if not len(records):
+            return 0
+
+        minute_bars = resample(
+            np.concatenate([aggregate(records[i:i+CHUNK_ROWS]) for i in range(0, len(records), CHUNK_ROWS)]),
+            1
+        )
+
+        for timeframe, last in lasts.items():
+            bars = resample(minute_bars, timeframe)
+            if last is not None:
+                # bars before the last cached one were aggregated from all their trades already
+                bars = bars[bars["utcTime"] >= last["utcTime"]]
+            self._replace_from(timeframe, bars)
+
+        logger.info(f"Aggregated {len(records)} trades to {self.exchange} {self.symbol} bars")
+        return len(records)
+
+
+    # ================================================================================
+    # ==== READ
+
+
+    def read(self, timeframe: int) -> np.ndarray:
+        """Memory-mapped bars of <timeframe>"""
+        if timeframe not in self.timeframes:
+            raise ValueError(f"Timeframe {timeframe} not cached, available : {self.timeframes}")
+        rows = self.rows(timeframe)
+        if not rows:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.memmap(self.path(timeframe), dtype=BAR_DTYPE, mode="r", shape=(rows,))
+
+
+    def to_frame(self, timeframe: int, count: int = None, fill: bool = True) -> pd.DataFrame:
+        """Bars as a dataframe indexed by datetime, columns open, high, low, close, volume and trdCount
+
+        Args:
+            count (int): number of most recent bars, all bars if None
+            fill (bool): add bars without trades (prices at the previous close, no volume)
+        """
+        bars = self.read(timeframe)
+        if count is not None:
+            bars = bars[-count:]
+
+        df = pd.DataFrame(
+            {field: bars[field] for field in BAR_DTYPE.names[1:]},
+            index=pd.to_datetime(bars["utcTime"], unit="ns").rename("utcTime")
+        )
+
+        if fill and len(df):
+            df = df.reindex(pd.date_range(df.index[0], df.index[-1], freq=f"{timeframe}min", name="utcTime"))
+            df["close"] = df["close"].ffill()
+            for col in ("open", "high", "low"):
+                df[col] = df[col].fillna(df["close"])
+            df[["volume", "trdCount"]] = df[["volume", "trdCount"]].fillna(0)
+            if count is not None:
+                df = df.iloc[-count:]
+
+        return df
@@ -1,4 +1,5 @@
 import os
+import time
 import asyncio
 from asyncio import CancelledError
 from typing import List
@@ -11,6 +12,11 @@ from tortoise import Tortoise
 
 from noobit.logger.structlogger import get_logger, log_exception, log_exc_to_db
 from noobit.exchanges.mappings.websockets import private_ws_map, public_ws_map
+from noobit.models.data.base.numeric import NumericConverter
+from noobit.processor.publisher import BatchPublisher
+from noobit.processor.feed_queue import FeedQueue
+from noobit.processor.reconnect import Backoff
+from noobit.processor.recorder import Recorder
 
 from noobit.server import settings
 from noobit_user import get_abs_path
@@ -38,7 +44,29 @@ class FeedHandler(object):
     """
 
 
-    def __init__(self, exchanges: List[str], private_feeds: List[str], public_feeds: List[str], pairs: List[str], retries: int = 10):
+    def __init__(self,
+                 exchanges: List[str],
+                 private_feeds: List[str],
+                 public_feeds: List[str],
+                 pairs: List[str],
+                 retries: int = 10,
+                 max_backoff: float = 60,
+                 healthy_period: float = 60,
+                 orderbook_mode: str = "full",
+                 stream_validation: str = "always",
+                 numeric: str = "decimal",
+                 publish_batch_size: int = 100,
+                 publish_delay: float = 0.005,
+                 queue_size: int = 10000,
+                 queue_workers: int = 1,
+                 public_overflow: str = "drop_oldest",
+                 metrics_interval: int = 60,
+                 heartbeat=None,
+                 heartbeat_interval: int = 1,
+                 record: bool = False,
+                 record_dir: str = None,
+                 public_ws_uri: str = None
+                 ):
         """For now, feeds will be common to all exchanges, meaning all
         exchanges will subscribe to the same feeds we passed
 
@@ -51,6 +79,20 @@ class FeedHandler(object):
         }
         and define the arg passed as a model of Dict[str, FeedsModel]
         where FeedsModel is a pydantic.BaseModel with fields private_feeds: List[str] and public_feeds: List[str]
+
+        Websocket frames are read into a bounded queue per connection and handled by <queue_workers> tasks,
+        so slow handling never blocks reading the socket. Public queues follow <public_overflow> policy
+        ("drop_oldest" drops oldest book updates), private queues never drop messages.
+        More than one worker per queue does not guarantee publishing order.
+
+        Empty private_feeds or public_feeds skip the corresponding connection (see processor.supervisor for sharding).
+        <heartbeat> is an optional multiprocessing.Value("d") set every <heartbeat_interval> seconds to the time
+        the stalest connection last received a frame (exchanges send heartbeat frames on quiet connections),
+        for a supervisor to check that the connections are still alive.
+
+        <record> writes public trades, spreads and orderbook diffs to parquet files under <record_dir>
+        (defaults to <user_dir>/data/market), see processor.recorder
+        <public_ws_uri> overrides the exchange public websocket uri, for example to connect to a replay server
         """
 
         self.exchanges = [exchange.lower() for exchange in exchanges]
@@ -60,12 +102,48 @@ class FeedHandler(object):
         self.private_feed_readers = {}
         self.public_feed_readers = {}
         self.pairs = pairs
+        # "full" publishes whole book on every update, "diff" only changed levels + periodic snapshots
+        self.orderbook_mode = orderbook_mode
+        # "always" validates public stream data with pydantic, "sampled" or "never" publish parser records directly
+        self.stream_validation = stream_validation
+        # numeric representation of prices and volumes in trusted stream mode ("decimal", "float" or "fixed")
+        self.numeric = numeric
 
         self.redis_pool = None
+        # redis publishes are batched into pipelines (batch size of 1 publishes every message directly)
+        self.publish_batch_size = publish_batch_size
+        self.publish_delay = publish_delay
+        self.publisher = None
         self.db_connection = None
 
+        # exchange ==> FeedQueue of raw frames
+        self.queue_size = queue_size
+        self.queue_workers = queue_workers
+        self.public_overflow = public_overflow
+        self.metrics_interval = metrics_interval
+        self.private_queues = {}
+        self.public_queues = {}
+
+        self.heartbeat = heartbeat
+        self.heartbeat_interval = heartbeat_interval
+        # ("private" or "public", exchange) ==> time.time() of the last frame received
+        self.last_frame_at = {}
+
+        self.recorder = None
+        if record:
+            self.recorder = Recorder(root=record_dir or os.path.join(user_dir, "data", "market"))
+        self.public_ws_uri = public_ws_uri
+
         self.tasks = []
+        # asyncio tasks of self.tasks once running (see main)
+        self.running_tasks = []
+        # consecutive failed reconnections per connection (-1 for unlimited), reset after <healthy_period> seconds up
         self.retries = retries
+        self.max_backoff = max_backoff
+        self.healthy_period = healthy_period
+        # exchange ==> Backoff
+        self.private_backoffs = {}
+        self.public_backoffs = {}
 
         # if settings.TORTOISE_CONNECTION:
         #     logger.info(settings.TORTOISE_CONNECTION)
@@ -86,39 +164,61 @@ class FeedHandler(object):
         await exchange_private_ws.subscribe(ping_interval, ping_timeout)
         if exchange_private_ws is not None:
             self.private_feed_readers[exchange] = exchange_private_ws
+            self.last_frame_at[("private", exchange)] = time.time()
 
 
     async def consume_private(self, exchange):
 
-        retries = 0
-        delay = 1
+        backoff = self.private_backoffs[exchange] = self.new_backoff()
+        backoff.connected()
+        key = ("private", exchange)
 
-        while retries <= self.retries or self.retries == -1:
+        while not self.terminate:
 
             try:
 
                 async for msg in self.private_feed_readers[exchange].ws:
                     if self.terminate:
                         break
-                    private_fr = self.private_feed_readers[exchange]
-                    await private_fr.msg_handler(msg, self.redis_pool)
-                    # print(msg)
+                    self.last_frame_at[key] = time.time()
+                    await self.private_queues[exchange].put(msg)
 
             except CancelledError:
                 return
 
             except (ConnectionClosed, ConnectionAbortedError, ConnectionResetError, socket_error) as e:
                 log_exception(logger, e)
-                await asyncio.sleep(delay)
-                await self.connect_private(exchange)
-                retries += 1
-                delay *= 2
 
             except Exception as e:
                 log_exception(logger, e)
-                await asyncio.sleep(delay)
-                retries += 1
-                delay *= 2
+                await log_exc_to_db(logger, e)
+
+            # connection closed, with or without error
+            if self.terminate:
+                return
+            if not await self.reconnect(self.private_feed_readers[exchange], backoff):
+                self.stop()
+                return
+
+
+    async def handle_private(self, exchange):
+        queue = self.private_queues[exchange]
+
+        while not self.terminate:
+            msg = await queue.get()
+            try:
+                private_fr = self.private_feed_readers[exchange]
+                await private_fr.msg_handler(msg, self.publisher)
+
+            except CancelledError:
+                return
+
+            except Exception as e:
+                log_exception(logger, e)
+                await log_exc_to_db(logger, e)
+
+            finally:
+                queue.task_done()
 
 
     async def close_private(self, exchange):
@@ -129,42 +229,82 @@ class FeedHandler(object):
 
 
     async def connect_public(self, exchange, ping_interval: int = 60, ping_timeout: int = 30):
-        exchange_public_ws = public_ws_map[exchange](pairs=self.pairs, feeds=self.public_feeds)
+        exchange_public_ws = public_ws_map[exchange](pairs=self.pairs,
+                                                     feeds=self.public_feeds,
+                                                     orderbook_mode=self.orderbook_mode,
+                                                     stream_validation=self.stream_validation,
+                                                     numeric=self.numeric_converter(exchange),
+                                                     recorder=self.recorder,
+                                                     ws_uri=self.public_ws_uri
+                                                     )
         await exchange_public_ws.subscribe(ping_interval, ping_timeout)
         if exchange_public_ws is not None:
             self.public_feed_readers[exchange] = exchange_public_ws
+            self.last_frame_at[("public", exchange)] = time.time()
+
+
+    def numeric_converter(self, exchange) -> NumericConverter:
+        if self.numeric != "fixed":
+            return NumericConverter(self.numeric)
+
+        # fixed point needs price and volume decimals of each pair
+        pair_specs = settings.PAIR_SPECS.get(exchange.upper())
+        if not pair_specs:
+            pair_specs = settings.CLIENTS.api(exchange).exchange_pair_specs
+        return NumericConverter(self.numeric, pair_specs=pair_specs)
 
 
     async def consume_public(self, exchange):
-        retries = 0
-        delay = 1
 
-        while retries <= self.retries or self.retries == -1:
+        backoff = self.public_backoffs[exchange] = self.new_backoff()
+        backoff.connected()
+        key = ("public", exchange)
+
+        while not self.terminate:
 
             try:
                 async for msg in self.public_feed_readers[exchange].ws:
                     if self.terminate:
                         break
-                    public_fr = self.public_feed_readers[exchange]
-                    await public_fr.msg_handler(msg, self.redis_pool)
-                    # print(msg)
+                    self.last_frame_at[key] = time.time()
+                    await self.public_queues[exchange].put(msg)
 
             except CancelledError:
                 return
 
             except (ConnectionClosed, ConnectionAbortedError, ConnectionResetError, socket_error) as e:
                 log_exception(logger, e)
-                await asyncio.sleep(delay)
-                await self.connect_public(exchange)
-                retries += 1
-                delay *= 2
 
             except Exception as e:
                 log_exception(logger, e)
                 await log_exc_to_db(logger, e)
-                await asyncio.sleep(delay)
-                retries += 1
-                delay *= 2
+
+            # connection closed, with or without error
+            if self.terminate:
+                return
+            if not await self.reconnect(self.public_feed_readers[exchange], backoff):
+                self.stop()
+                return
+
+
+    async def handle_public(self, exchange):
+        queue = self.public_queues[exchange]
+
+        while not self.terminate:
+            msg = await queue.get()
+            try:
+                public_fr = self.public_feed_readers[exchange]
+                await public_fr.msg_handler(msg, self.publisher)
+
+            except CancelledError:
+                return
+
+            except Exception as e:
+                log_exception(logger, e)
+                await log_exc_to_db(logger, e)
+
+            finally:
+                queue.task_done()
 
 
     async def close_public(self, exchange):
@@ -173,9 +313,46 @@ class FeedHandler(object):
 
 
 
+    def new_backoff(self) -> Backoff:
+        return Backoff(base=1, cap=self.max_backoff, reset_after=self.healthy_period, max_retries=self.retries)
+
+
+    async def reconnect(self, feed_reader, backoff: Backoff) -> bool:
+        """Reconnect feed reader with jittered backoff until it succeeds or retries are exhausted.
+        Feed reader subscribes again to its active feeds and pairs (and invalidates its order books).
+
+        Returns:
+            bool: False if we gave up
+        """
+        while not self.terminate:
+            backoff.failed()
+            if backoff.exhausted:
+                logger.error(f"FeedHandler --- Giving up reconnecting {feed_reader.__class__.__name__} after {backoff.attempts - 1} attempts")
+                return False
+
+            delay = backoff.delay()
+            logger.warning(f"FeedHandler --- Reconnecting {feed_reader.__class__.__name__} in {delay:.2f}s (attempt {backoff.attempts})")
+            await asyncio.sleep(delay)
+
+            try:
+                await feed_reader.reconnect()
+                backoff.connected()
+                return True
+            except CancelledError:
+                raise
+            except Exception as e:
+                log_exception(logger, e)
+
+        return False
+
+
     async def setup(self):
 
         self.redis_pool = await aioredis.create_redis_pool(('localhost', 6379))
+        if self.publish_batch_size > 1:
+            self.publisher = BatchPublisher(self.redis_pool, max_batch=self.publish_batch_size, max_delay=self.publish_delay)
+        else:
+            self.publisher = self.redis_pool
         await Tortoise.init(config=config, config_file=config_file, db_url=db_url, modules=modules)
         if generate_schemas:
             try:
@@ -188,21 +365,78 @@ class FeedHandler(object):
         settings.DB_CONNECTION = self.db_connection
 
         for exchange in self.exchanges:
-            await self.connect_private(exchange)
-            await asyncio.sleep(1)
-            await self.connect_public(exchange)
-            await asyncio.sleep(1)
-            self.tasks.append(self.consume_private(exchange))
-            self.tasks.append(self.consume_public(exchange))
+
+            # private subscription parser and fixed point numeric mode instantiate rest apis
+            await settings.CLIENTS.startup([exchange])
+
+            if self.private_feeds:
+                await self.connect_private(exchange)
+                await asyncio.sleep(1)
+                # private order and trade messages are never dropped
+                self.private_queues[exchange] = FeedQueue(maxsize=self.queue_size, policy="block")
+                self.tasks.append(self.consume_private(exchange))
+                for _ in range(self.queue_workers):
+                    self.tasks.append(self.handle_private(exchange))
+
+            if self.public_feeds:
+                await self.connect_public(exchange)
+                await asyncio.sleep(1)
+                self.public_queues[exchange] = FeedQueue(maxsize=self.queue_size,
+                                                         policy=self.public_overflow,
+                                                         droppable=self.public_feed_readers[exchange].is_droppable
+                                                         )
+                self.tasks.append(self.consume_public(exchange))
+                for _ in range(self.queue_workers):
+                    self.tasks.append(self.handle_public(exchange))
+
+        if self.metrics_interval:
+            self.tasks.append(self.log_queue_metrics())
+        if self.recorder is not None:
+            self.tasks.append(self.recorder.run())
+
+
+    async def beat(self):
+        """Report the last frame time of the stalest connection (current time while setting up)"""
+        while not self.terminate:
+            self.heartbeat.value = min(self.last_frame_at.values(), default=time.time())
+            try:
+                await asyncio.sleep(self.heartbeat_interval)
+            except CancelledError:
+                return
+
+
+    async def log_queue_metrics(self):
+        while not self.terminate:
+            try:
+                await asyncio.sleep(self.metrics_interval)
+            except CancelledError:
+                return
+
+            for exchange, queue in self.private_queues.items():
+                logger.info(f"FeedHandler --- {exchange} private queue : {queue.metrics()}")
+            for exchange, queue in self.public_queues.items():
+                logger.info(f"FeedHandler --- {exchange} public queue : {queue.metrics()}")
 
 
     async def main(self):
-        results = await asyncio.gather(*self.tasks)
+        self.running_tasks = [asyncio.ensure_future(task) for task in self.tasks]
+        # cancelled tasks (see stop) are returned as exceptions
+        results = await asyncio.gather(*self.running_tasks, return_exceptions=True)
         logger.info(self.public_feeds)
         logger.info(self.private_feeds)
         return results
 
 
+    def stop(self):
+        """Stop all tasks, so that main returns and the process exits (for ex when a connection gave up reconnecting)"""
+        logger.error("FeedHandler --- Stopping")
+        self.terminate = True
+        current = asyncio.current_task()
+        for task in self.running_tasks:
+            if task is not current:
+                task.cancel()
+
+
     def run(self):
 
         process_id = os.getpid()
@@ -211,6 +445,9 @@ class FeedHandler(object):
         loop = uvloop.new_event_loop()
         asyncio.set_event_loop(loop)
 
+        # beat during setup too, it makes rest calls and waits for subscriptions
+        if self.heartbeat is not None:
+            loop.create_task(self.beat())
         loop.run_until_complete(self.setup())
         logger.info(self.db_connection)
 
@@ -238,9 +475,15 @@ class FeedHandler(object):
 
         await Tortoise.close_connections()
 
-        for exchange in self.exchanges:
+        for exchange in self.private_feed_readers:
             await self.close_private(exchange)
+        for exchange in self.public_feed_readers:
             await self.close_public(exchange)
+        if isinstance(self.publisher, BatchPublisher):
+            await self.publisher.close()
+        if self.recorder is not None:
+            await self.recorder.close()
+        await settings.CLIENTS.shutdown()
         logger.info("FeedHandler --- Closing redis")
         self.redis_pool.close()
         await self.redis_pool.wait_closed()
@@ -0,0 +1,71 @@
+"""
+Bounded queues between websocket readers and message handlers
+"""
+import asyncio
+from typing import Callable, Any
+
+from typing_extensions import Literal
+
+
+OVERFLOW_POLICY = Literal["block", "drop_oldest"]
+
+
+class FeedQueue(asyncio.Queue):
+    """Bounded queue of raw websocket frames.
+
+    Args:
+        maxsize (int): max number of pending frames
+        policy (str): what to do when the queue is full
+            "block" : reader waits for a free slot (nothing is ever dropped)
+            "drop_oldest" : drop the oldest pending frame for which <droppable> returns True,
+                if there is none the reader waits as in "block"
+        droppable (callable): frame ==> bool, which frames may be dropped
+
+    Notes:
+        Metrics are kept as plain counters, see metrics()
+    """
+
+    def __init__(self,
+                 maxsize: int = 10000,
+                 policy: OVERFLOW_POLICY = "block",
+                 droppable: Callable[[Any], bool] = None
+                 ):
+
+        if policy not in ("block", "drop_oldest"):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+
+        super().__init__(maxsize=maxsize)
+        self.policy = policy
+        self.droppable = droppable or (lambda frame: False)
+
+        self.received_count = 0
+        self.dropped_count = 0
+        self.max_depth = 0
+
+
+    async def put(self, item):
+        if self.policy == "drop_oldest" and self.full():
+            self._drop_oldest()
+
+        await super().put(item)
+        self.received_count += 1
+        self.max_depth = max(self.max_depth, self.qsize())
+
+
+    def _drop_oldest(self):
+        for i, frame in enumerate(self._queue):
+            if self.droppable(frame):
+                del self._queue[i]
+                # dropped frame will never be marked as done by a worker
+                self.task_done()
+                self.dropped_count += 1
+                return
+
+
+    def metrics(self) -> dict:
+        return {
+            "depth": self.qsize(),
+            "max_depth": self.max_depth,
+            "received": self.received_count,
+            "dropped": self.dropped_count,
+        }
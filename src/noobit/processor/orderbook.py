@@ -0,0 +1,245 @@
+"""
+Price-level (L2) order book maintained from websocket snapshots and updates
+"""
+from operator import neg
+from decimal import Decimal
+from typing import Optional, Tuple, Any, Dict, List, Callable
+
+from sortedcontainers import SortedDict
+
+
+class L2Book():
+    """Sorted price levels for a single symbol.
+
+    Args:
+        symbol (str): dash-separated uppercase pair
+        depth (int): number of levels to keep on each side (None means no truncation)
+
+    Notes:
+        Prices and volumes need to be comparable numerics (Decimal or float).
+        Updates carry absolute volumes, not deltas: a volume of 0 deletes the level.
+        Insert/delete are O(log n), best bid/ask are O(1).
+        Bids are sorted by descending price so that the best level of both sides is at index 0.
+    """
+
+    def __init__(self, symbol: str, depth: Optional[int] = 10):
+        self.symbol = symbol
+        self.depth = depth
+
+        self.asks = SortedDict()
+        self.bids = SortedDict(neg)
+
+        # False until we receive a snapshot, updates are meaningless before that
+        self.is_synced = False
+
+        # incremented for every snapshot/update applied, never reset
+        # so that consumers of diffs can detect gaps
+        self.sequence = 0
+
+
+    def clear(self):
+        self.asks.clear()
+        self.bids.clear()
+        self.is_synced = False
+
+
+    def apply_snapshot(self, asks: dict, bids: dict):
+        """Replace the whole book with a snapshot"""
+        self.clear()
+        self._update_side(self.asks, asks)
+        self._update_side(self.bids, bids)
+        self.is_synced = True
+        self.sequence += 1
+
+
+    def apply_update(self, asks: dict, bids: dict) -> Tuple[dict, dict]:
+        """Replace volume of each level, delete levels with 0 volume and truncate to depth
+
+        Returns:
+            tuple of dicts (asks, bids) of {<price>: <volume>} for levels that changed
+            (volume is 0 for deleted levels, including those truncated out of depth)
+        """
+        asks_diff = self._update_side(self.asks, asks)
+        bids_diff = self._update_side(self.bids, bids)
+        self.sequence += 1
+        return asks_diff, bids_diff
+
+
+    def _update_side(self, side: SortedDict, levels: dict) -> dict:
+        diff = {}
+
+        for price, volume in levels.items():
+            if volume == 0:
+                if side.pop(price, None) is not None:
+                    diff[price] = volume
+            else:
+                side[price] = volume
+                diff[price] = volume
+
+        # exchanges do not send deletes for levels that fall out of the subscribed depth
+        if self.depth is not None:
+            while len(side) > self.depth:
+                price, _volume = side.popitem(-1)
+                diff[price] = 0
+
+        return diff
+
+
+    def best_ask(self) -> Optional[Tuple[Any, Any]]:
+        """(price, volume) of lowest ask"""
+        if not self.asks:
+            return None
+        return self.asks.peekitem(0)
+
+
+    def best_bid(self) -> Optional[Tuple[Any, Any]]:
+        """(price, volume) of highest bid"""
+        if not self.bids:
+            return None
+        return self.bids.peekitem(0)
+
+
+    def to_dict(self) -> dict:
+        """Plain dict image of the book, sorted from best to worst level"""
+        return {
+            "symbol": self.symbol,
+            "asks": dict(self.asks.items()),
+            "bids": dict(self.bids.items())
+        }
+
+
+    def __len__(self):
+        return len(self.asks) + len(self.bids)
+
+
+    def __repr__(self):
+        return f"L2Book(symbol={self.symbol}, depth={self.depth}, best_bid={self.best_bid()}, best_ask={self.best_ask()})"
+
+
+
+
+class L2BookReplica():
+    """Rebuild an L2Book from the snapshot and diff messages
+    published by feed readers in "diff" orderbook mode.
+
+    Args:
+        symbol (str): dash-separated uppercase pair
+        depth (int): levels to keep on each side (None keeps every level received)
+        cast (callable): applied to prices and volumes (received as strings)
+
+    Usage:
+        replica = L2BookReplica("XBT-USD")
+        subscribe to ws:public:data:orderbook:snapshot:<exchange>:<symbol>
+            and ws:public:data:orderbook:diff:<exchange>:<symbol>
+        pass json loaded messages to on_snapshot / on_diff
+        replica.book is up to date as long as replica.book.is_synced
+    """
+
+    def __init__(self, symbol: str, depth: Optional[int] = None, cast: Callable = Decimal):
+        self.book = L2Book(symbol=symbol, depth=depth)
+        self.cast = cast
+
+
+    def _cast_levels(self, levels: dict) -> dict:
+        return {self.cast(price): self.cast(volume) for price, volume in levels.items()}
+
+
+    def on_snapshot(self, msg: dict) -> bool:
+        """Returns:
+            bool: True if snapshot was applied
+        """
+        if self.book.is_synced and msg["sequence"] <= self.book.sequence:
+            # we already have a more recent state
+            return False
+
+        self.book.apply_snapshot(self._cast_levels(msg["asks"]), self._cast_levels(msg["bids"]))
+        self.book.sequence = msg["sequence"]
+        return True
+
+
+    def on_diff(self, msg: dict) -> bool:
+        """Returns:
+            bool: False if book is out of sync and waits for next snapshot
+        """
+        if not self.book.is_synced:
+            return False
+
+        if msg["sequence"] <= self.book.sequence:
+            # stale diff, already contained in last snapshot
+            return True
+
+        if msg["sequence"] != self.book.sequence + 1:
+            # we missed at least one diff
+            self.book.clear()
+            return False
+
+        self.book.apply_update(self._cast_levels(msg["asks"]), self._cast_levels(msg["bids"]))
+        self.book.sequence = msg["sequence"]
+        return True
+
+
+
+def serialize_levels(levels: dict) -> dict:
+    """{<price>: <volume>} with string keys and values so we do not lose precision in json"""
+    return {str(price): str(volume) for price, volume in levels.items()}
+
+
+
+
+class BookRegistry():
+    """Process-wide store of L2Books keyed by exchange and symbol.
+
+    Books are created and kept in sync by websocket feed readers,
+    other users (rest api, redis publishers) only read them, so that each symbol
+    has exactly one book per exchange with the depth of its feed.
+    """
+
+    def __init__(self):
+        self._books: Dict[str, Dict[str, L2Book]] = {}
+
+
+    def get(self, exchange: str, symbol: str, depth: Optional[int] = 10) -> L2Book:
+        """Return book for exchange/symbol, create it if it does not exist yet
+
+        Note:
+            depth is only used when the book is created
+        """
+        exchange_books = self._books.setdefault(exchange.lower(), {})
+        try:
+            return exchange_books[symbol]
+        except KeyError:
+            book = L2Book(symbol=symbol, depth=depth)
+            exchange_books[symbol] = book
+            return book
+
+
+    def find(self, exchange: str, symbol: str) -> Optional[L2Book]:
+        """Return book for exchange/symbol or None"""
+        return self._books.get(exchange.lower(), {}).get(symbol)
+
+
+    def symbols(self, exchange: str) -> List[str]:
+        return list(self._books.get(exchange.lower(), {}).keys())
+
+
+    def invalidate(self, exchange: str, symbols: Optional[List[str]] = None):
+        """Mark books of exchange as out of sync (all or only given symbols),
+        updates are then ignored until a new snapshot is applied
+        """
+        exchange_books = self._books.get(exchange.lower(), {})
+        for symbol in (exchange_books if symbols is None else symbols):
+            book = exchange_books.get(symbol)
+            if book is not None:
+                book.clear()
+
+
+    def remove(self, exchange: str, symbol: str):
+        self._books.get(exchange.lower(), {}).pop(symbol, None)
+
+
+    def clear(self, exchange: Optional[str] = None):
+        """Drop all books, or only those of given exchange"""
+        if exchange is None:
+            self._books.clear()
+        else:
+            self._books.pop(exchange.lower(), None)
@@ -0,0 +1,84 @@
+"""
+Batch redis publishes of feed readers into pipelines
+"""
+import asyncio
+
+from noobit.logger.structlogger import get_logger, log_exception
+
+logger = get_logger(__name__)
+
+
+class BatchPublisher():
+    """Accumulate redis publishes and send them in a single pipeline.
+
+    Has the same publish signature as an aioredis pool, so it can be passed
+    to feed readers msg_handler instead of the pool itself.
+
+    Args:
+        redis_pool: aioredis pool
+        max_batch (int): flush as soon as this many messages are pending
+        max_delay (float): flush at the latest this many seconds after the first pending message
+            (0 flushes on the next event loop iteration)
+
+    Notes:
+        Flushes are serialized with a lock so messages are published in the order they were received.
+    """
+
+    def __init__(self, redis_pool, max_batch: int = 100, max_delay: float = 0.005):
+        self.redis_pool = redis_pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self._pending = []
+        self._timer = None
+        self._lock = asyncio.Lock()
+
+        # counters to monitor batching efficiency
+        self.published_count = 0
+        self.flush_count = 0
+
+
+    async def publish(self, channel: str, message):
+        self._pending.append((channel, message))
+
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+
+        elif self._timer is None:
+            loop = asyncio.get_event_loop()
+            self._timer = loop.call_later(self.max_delay, self._schedule_flush)
+
+
+    def _schedule_flush(self):
+        self._timer = None
+        asyncio.ensure_future(self.flush())
+
+
+    async def flush(self):
+        """Publish all pending messages in one pipeline"""
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        async with self._lock:
+            if not self._pending:
+                return
+
+            batch, self._pending = self._pending, []
+
+            try:
+                pipe = self.redis_pool.pipeline()
+                for channel, message in batch:
+                    pipe.publish(channel, message)
+                await pipe.execute()
+
+                self.published_count += len(batch)
+                self.flush_count += 1
+
+            except Exception as e:
+                log_exception(logger, e)
+
+
+    async def close(self):
+        await self.flush()
@@ -0,0 +1,60 @@
+"""
+Backoff between reconnection attempts of websocket connections
+"""
+import time
+import random
+
+
+class Backoff():
+    """Capped exponential backoff with full jitter, one per connection.
+
+    Attempts are reset once a connection has stayed up for <reset_after> seconds,
+    so that a connection that flaps once a day never exhausts its retries.
+
+    Args:
+        base (float): delay of the first attempt (before jitter)
+        cap (float): max delay
+        reset_after (float): seconds a connection must stay up to reset attempts
+        max_retries (int): consecutive failed attempts before giving up, -1 for never
+
+    Usage:
+        backoff.connected()
+        ...connection drops...
+        backoff.failed()
+        if backoff.exhausted: give up
+        await asyncio.sleep(backoff.delay())
+    """
+
+    def __init__(self, base: float = 1, cap: float = 60, reset_after: float = 60, max_retries: int = -1):
+        self.base = base
+        self.cap = cap
+        self.reset_after = reset_after
+        self.max_retries = max_retries
+
+        self.attempts = 0
+        self.connected_at = None
+
+        # total number of reconnections, never reset
+        self.reconnect_count = 0
+
+
+    def connected(self):
+        self.connected_at = time.monotonic()
+
+
+    def failed(self):
+        if self.connected_at is not None and time.monotonic() - self.connected_at >= self.reset_after:
+            self.attempts = 0
+        self.connected_at = None
+        self.attempts += 1
+        self.reconnect_count += 1
+
+
+    @property
+    def exhausted(self) -> bool:
+        return self.max_retries != -1 and self.attempts > self.max_retries
+
+
+    def delay(self) -> float:
+        # exponent is bounded to avoid float overflow after many attempts
+        return random.uniform(0, min(self.cap, self.base * 2 ** min(self.attempts - 1, 32)))
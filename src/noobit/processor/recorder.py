@@ -0,0 +1,284 @@
+"""
+Record public market data (trades, spreads, orderbook diffs) to compressed parquet files
+
+Files are partitioned hive-style so they can be read back as a single dataset:
+    <root>/<feed>/exchange=<exchange>/symbol=<symbol>/date=<YYYY-MM-DD>/<file creation time>.parquet
+
+Each file is append-only (one row group per flush) and rotated on day change,
+after <max_rows_per_file> rows or once it is <max_file_age> seconds old.
+A file is only readable once closed (parquet footer), so a killed process loses
+at most the last <max_file_age> seconds of each stream.
+"""
+import os
+import time
+import asyncio
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from noobit.logger.structlogger import get_logger, log_exception
+from noobit.models.data.base.numeric import NumericConverter
+
+
+logger = get_logger(__name__)
+
+
+# column names follow stream model fields, orderbook rows are single levels
+SCHEMAS = {
+    "trade": pa.schema([
+        ("transactTime", pa.int64()),
+        ("avgPx", pa.float64()),
+        ("cumQty", pa.float64()),
+        ("side", pa.string()),
+        ("ordType", pa.string()),
+    ]),
+    "spread": pa.schema([
+        ("utcTime", pa.int64()),
+        ("bestBid", pa.float64()),
+        ("bestAsk", pa.float64()),
+    ]),
+    "orderbook": pa.schema([
+        ("utcTime", pa.int64()),
+        ("sequence", pa.int64()),
+        ("is_snapshot", pa.bool_()),
+        ("side", pa.string()),
+        ("price", pa.float64()),
+        ("volume", pa.float64()),
+    ]),
+}
+
+NS_PER_DAY = 86400 * 10**9
+
+
+def partition_day(timestamp_ns: int) -> str:
+    return datetime.utcfromtimestamp(timestamp_ns // 10**9).strftime("%Y-%m-%d")
+
+
+class Recorder():
+    """Buffer market data rows in memory and write them in batches.
+
+    Record methods only append to in-memory buffers, writes happen in a single background
+    thread so the event loop is never blocked on disk and rows are written in order.
+
+    Args:
+        root (str): root directory of recorded data
+        batch_size (int): flush once this many rows are buffered (all feeds and symbols)
+        flush_interval (float): flush at least every <flush_interval> seconds (see run)
+        max_rows_per_file (int): rotate files after this many rows
+        max_file_age (float): rotate files after this many seconds, checked on every flush
+        compression (str): parquet compression codec
+    """
+
+    def __init__(self,
+                 root: str,
+                 batch_size: int = 10000,
+                 flush_interval: float = 5,
+                 max_rows_per_file: int = 5_000_000,
+                 max_file_age: float = 3600,
+                 compression: str = "zstd"
+                 ):
+        self.root = root
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows_per_file = max_rows_per_file
+        self.max_file_age = max_file_age
+        self.compression = compression
+
+        # (feed, exchange, symbol) ==> list of row tuples, in schema column order
+        self._buffers: Dict[Tuple[str, str, str], List[tuple]] = {}
+        self._buffered = 0
+        self._flushing = None
+
+        # (exchange, symbol) ==> utcTime of the last recorded orderbook rows
+        self._book_times: Dict[Tuple[str, str], int] = {}
+
+        # (feed, exchange, symbol) ==> [day, ParquetWriter, rows in file, opened at], only touched by the writer thread
+        self._writers = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        self.written_count = 0
+        self.file_count = 0
+
+
+    # ================================================================================
+    # ==== RECORD
+
+
+    def _append(self, feed: str, exchange: str, symbol: str, rows: List[tuple]):
+        self._buffers.setdefault((feed, exchange, symbol), []).extend(rows)
+        self._buffered += len(rows)
+
+        if self._buffered >= self.batch_size and self._flushing is None:
+            self._flushing = asyncio.ensure_future(self.flush())
+
+
+    def record_trades(self, exchange: str, trades: list, numeric: NumericConverter = None):
+        """
+        Args:
+            trades: list of TradeRecord or Trade models
+            numeric: converter that parsed trade records, None for Decimal values
+        """
+        if not trades:
+            return
+        symbol = trades[0].symbol
+        to_price = numeric.price_to_float if numeric else _to_float
+        to_volume = numeric.volume_to_float if numeric else _to_float
+
+        rows = [
+            (int(t.transactTime), to_price(t.avgPx, symbol), to_volume(t.cumQty, symbol), t.side, t.ordType)
+            for t in trades
+        ]
+        self._append("trade", exchange, symbol, rows)
+
+
+    def record_spread(self, exchange: str, spread, numeric: NumericConverter = None):
+        """
+        Args:
+            spread: SpreadRecord or Spread model
+            numeric: converter that parsed spread record, None for Decimal values
+        """
+        symbol = spread.symbol
+        to_price = numeric.price_to_float if numeric else _to_float
+
+        row = (int(spread.utcTime), to_price(spread.bestBid, symbol), to_price(spread.bestAsk, symbol))
+        self._append("spread", exchange, symbol, [row])
+
+
+    def record_orderbook(self, exchange: str, symbol: str, sequence: int, asks: dict, bids: dict, is_snapshot: bool,
+                         utcTime: int = None):
+        """Record full book (is_snapshot) or changed levels, a level with volume 0 was deleted
+
+        Rows are stamped with the exchange clock, like trades and spreads, and never go back in time
+        (levels of a snapshot can be older than the last update), so that replay can merge feeds in order.
+
+        Args:
+            asks, bids: {price: volume}
+            utcTime: exchange time of the message (ns), local time if the exchange does not send any
+        """
+        if utcTime is None:
+            utcTime = time.time_ns()
+        timestamp = max(int(utcTime), self._book_times.get((exchange, symbol), 0))
+        self._book_times[(exchange, symbol)] = timestamp
+
+        rows = [(timestamp, sequence, is_snapshot, "ask", float(price), float(volume)) for price, volume in asks.items()]
+        rows.extend((timestamp, sequence, is_snapshot, "bid", float(price), float(volume)) for price, volume in bids.items())
+        if not rows:
+            # keep the sequence continuous for replay
+            rows.append((timestamp, sequence, is_snapshot, None, None, None))
+        self._append("orderbook", exchange, symbol, rows)
+
+
+    # ================================================================================
+    # ==== WRITE
+
+
+    async def flush(self):
+        """Hand over buffered rows to the writer thread"""
+        try:
+            buffers, self._buffers, self._buffered = self._buffers, {}, 0
+            # also runs without new rows, so that idle files get closed once too old
+            if buffers or self._writers:
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(self._executor, self._write, buffers)
+        except Exception as e:
+            log_exception(logger, e)
+        finally:
+            self._flushing = None
+
+
+    def _write(self, buffers: dict):
+        for (feed, exchange, symbol), rows in buffers.items():
+
+            # rows are split by day of their timestamp (first column)
+            start = 0
+            while start < len(rows):
+                day_index = rows[start][0] // NS_PER_DAY
+                end = start
+                while end < len(rows) and rows[end][0] // NS_PER_DAY == day_index:
+                    end += 1
+                self._write_rows(feed, exchange, symbol, partition_day(rows[start][0]), rows[start:end])
+                start = end
+
+        self._close_expired_writers()
+
+
+    def _write_rows(self, feed: str, exchange: str, symbol: str, day: str, rows: List[tuple]):
+        key = (feed, exchange, symbol)
+        schema = SCHEMAS[feed]
+
+        current = self._writers.get(key)
+        if current is not None and (current[0] != day or current[2] >= self.max_rows_per_file):
+            current[1].close()
+            current = None
+
+        if current is None:
+            path = os.path.join(self.root,
+                                feed,
+                                f"exchange={exchange}",
+                                f"symbol={symbol}",
+                                f"date={day}",
+                                f"{datetime.utcnow().strftime('%H%M%S%f')}.parquet"
+                                )
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            current = [day, pq.ParquetWriter(path, schema, compression=self.compression), 0, time.monotonic()]
+            self._writers[key] = current
+            self.file_count += 1
+
+        columns = list(zip(*rows))
+        table = pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        )
+        current[1].write_table(table)
+        current[2] += len(rows)
+        self.written_count += len(rows)
+
+
+    def _close_expired_writers(self):
+        now = time.monotonic()
+        for key, (_, writer, _, opened_at) in list(self._writers.items()):
+            if now - opened_at >= self.max_file_age:
+                writer.close()
+                del self._writers[key]
+
+
+    def _close_writers(self):
+        for _, writer, _, _ in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+    # ================================================================================
+    # ==== LIFECYCLE
+
+
+    async def run(self):
+        """Periodic flush, to run as a task next to the feed readers"""
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+            except asyncio.CancelledError:
+                return
+            if self._flushing is None:
+                self._flushing = asyncio.ensure_future(self.flush())
+
+
+    async def close(self):
+        if self._flushing is not None:
+            try:
+                await self._flushing
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self._executor, self._close_writers)
+        self._executor.shutdown()
+        logger.info(f"Recorder --- Closed after writing {self.written_count} rows to {self.file_count} files")
+
+
+
+def _to_float(value, symbol: str):
+    return float(value)
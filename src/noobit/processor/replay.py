@@ -0,0 +1,351 @@
+"""
+Serve recorded market data (see processor.recorder) over a local websocket in Kraken wire format
+
+Feed readers connect to it instead of wss://ws.kraken.com (FeedHandler public_ws_uri)
+and subscribe as usual, recorded trades, spreads and orderbooks of the subscribed pairs
+are then streamed in timestamp order at <speed> times the recorded pace.
+
+Notes:
+    Orderbook updates carry the checksum of the replayed book, computed from the price and volume strings
+    we send, so readers detect a missing update (for ex dropped by their queue) and resync
+    Pairs can be unsubscribed and subscribed again while streaming (as readers do to resync a book),
+    a book subscribed again starts with a snapshot of the replayed book, new pairs are rejected
+    Ticker (instrument) and ohlc feeds are not recorded, subscriptions to them are rejected
+"""
+import os
+import glob
+import heapq
+import asyncio
+import itertools
+from decimal import Decimal
+from typing import List, Iterator, Tuple
+
+import ujson
+import websockets
+import numpy as np
+import pyarrow.parquet as pq
+
+from noobit.logger.structlogger import get_logger, log_exception
+from noobit.processor.orderbook import L2Book
+from noobit.models.data.websockets.stream.parse.kraken.orderbook import checksum_orderbook
+
+
+logger = get_logger(__name__)
+
+
+# kraken subscription name ==> recorded feed
+SUBSCRIPTION_TO_FEED = {
+    "trade": "trade",
+    "spread": "spread",
+    "book": "orderbook",
+}
+
+
+def list_files(root: str, feed: str, exchange: str, symbol: str, start_date: str = None, end_date: str = None) -> List[str]:
+    """Recorded files of feed/exchange/symbol in time order, dates are inclusive YYYY-MM-DD strings"""
+
+    partition = os.path.join(root, feed, f"exchange={exchange}", f"symbol={symbol}")
+    files = []
+    for date_dir in sorted(glob.glob(os.path.join(partition, "date=*"))):
+        day = date_dir.rsplit("=", 1)[-1]
+        if (start_date and day < start_date) or (end_date and day > end_date):
+            continue
+        # file names are their creation time, so they sort in write order
+        files.extend(sorted(glob.glob(os.path.join(date_dir, "*.parquet"))))
+    return files
+
+
+def read_rows(files: List[str]) -> Iterator[dict]:
+    """Rows of recorded files as dicts, one file in memory at a time"""
+    for path in files:
+        columns = pq.read_table(path).to_pydict()
+        names = list(columns.keys())
+        for values in zip(*columns.values()):
+            yield dict(zip(names, values))
+
+
+def _fmt(value: float) -> str:
+    # never in scientific notation ("1e-05"), fixed point numeric mode can not parse it
+    return np.format_float_positional(float(value), trim="0")
+
+
+def _fmt_time(timestamp_ns: int) -> str:
+    return f"{timestamp_ns // 10**9}.{timestamp_ns % 10**9:09d}"
+
+
+# ================================================================================
+# ==== KRAKEN WIRE FORMAT
+# each generator yields (timestamp in ns, message without channelID)
+
+
+def trade_messages(rows: Iterator[dict], pair: str) -> Iterator[Tuple[int, list]]:
+    # trades with the same timestamp are sent in a single message, as kraken does
+    for timestamp, group in itertools.groupby(rows, key=lambda row: row["transactTime"]):
+        trades = [
+            [_fmt(row["avgPx"]), _fmt(row["cumQty"]), _fmt_time(timestamp),
+             "b" if row["side"] == "buy" else "s", "m" if row["ordType"] == "market" else "l", ""]
+            for row in group
+        ]
+        yield timestamp, [trades, "trade", pair]
+
+
+def spread_messages(rows: Iterator[dict], pair: str) -> Iterator[Tuple[int, list]]:
+    for row in rows:
+        # bid and ask volumes are not recorded
+        spread = [_fmt(row["bestBid"]), _fmt(row["bestAsk"]), _fmt_time(row["utcTime"]), "0", "0"]
+        yield row["utcTime"], [spread, "spread", pair]
+
+
+def orderbook_messages(rows: Iterator[dict], pair: str, depth: int, book: L2Book = None) -> Iterator[Tuple[int, list]]:
+    """
+    Args:
+        book: replayed book, for update checksums (and snapshots on resubscription, see book_snapshot_message)
+    """
+    channel_name = f"book-{depth}"
+    if book is None:
+        book = L2Book(symbol=pair, depth=depth)
+
+    # all levels of a snapshot or update share the same sequence
+    for sequence, group in itertools.groupby(rows, key=lambda row: row["sequence"]):
+        group = [row for row in group if row["side"] is not None]
+        if not group:
+            continue
+
+        timestamp = group[0]["utcTime"]
+        asks = [[_fmt(row["price"]), _fmt(row["volume"]), _fmt_time(timestamp)] for row in group if row["side"] == "ask"]
+        bids = [[_fmt(row["price"]), _fmt(row["volume"]), _fmt_time(timestamp)] for row in group if row["side"] == "bid"]
+
+        # levels as readers parse them from the message strings
+        ask_levels = {Decimal(price): Decimal(volume) for price, volume, _ in asks}
+        bid_levels = {Decimal(price): Decimal(volume) for price, volume, _ in bids}
+
+        if group[0]["is_snapshot"]:
+            book.apply_snapshot(ask_levels, bid_levels)
+            yield timestamp, [{"as": asks, "bs": bids}, channel_name, pair]
+            continue
+
+        book.apply_update(ask_levels, bid_levels)
+        checksum = str(checksum_orderbook(book))
+        # as kraken does, checksum is in the last dict of the message
+        if asks and bids:
+            yield timestamp, [{"a": asks}, {"b": bids, "c": checksum}, channel_name, pair]
+        elif asks:
+            yield timestamp, [{"a": asks, "c": checksum}, channel_name, pair]
+        else:
+            yield timestamp, [{"b": bids, "c": checksum}, channel_name, pair]
+
+
+def book_snapshot_message(book: L2Book, pair: str, timestamp: int) -> list:
+    """Replayed book as a snapshot message, levels keep the precision they were sent with"""
+    sent_time = _fmt_time(timestamp)
+    asks = [[format(price, "f"), format(volume, "f"), sent_time] for price, volume in book.asks.items()]
+    bids = [[format(price, "f"), format(volume, "f"), sent_time] for price, volume in book.bids.items()]
+    return [{"as": asks, "bs": bids}, f"book-{book.depth}", pair]
+
+
+
+
+def _track_time(stream: Iterator[Tuple[int, list]], times: dict, pair: str) -> Iterator[Tuple[int, list]]:
+    for timestamp, msg in stream:
+        times[pair] = timestamp
+        yield timestamp, msg
+
+
+
+
+class ReplayServer():
+    """Local websocket server replaying recorded data of a single exchange
+
+    Args:
+        root (str): root directory of recorded data
+        exchange (str): recorded exchange to replay
+        speed (float): replay speed multiplier (1 = recorded pace), 0 or less for as fast as possible
+        start_date (str): first day to replay (YYYY-MM-DD), defaults to first recorded day
+        end_date (str): last day to replay (YYYY-MM-DD), defaults to last recorded day
+        settle (float): seconds without new subscription before streaming starts
+    """
+
+    def __init__(self,
+                 root: str,
+                 exchange: str = "kraken",
+                 speed: float = 1,
+                 start_date: str = None,
+                 end_date: str = None,
+                 settle: float = 0.5
+                 ):
+        self.root = root
+        self.exchange = exchange
+        self.speed = speed
+        self.start_date = start_date
+        self.end_date = end_date
+        self.settle = settle
+
+        self._channel_ids = itertools.count(1)
+        self.sent_count = 0
+
+
+    async def handler(self, ws, path):
+        """one replay per connection, streaming starts once client subscriptions have settled"""
+
+        await ws.send(ujson.dumps({"event": "systemStatus", "status": "online", "version": "replay", "connectionID": 0}))
+
+        # (subscription name, pair) ==> (channelID, depth) of active subscriptions
+        channels = {}
+        # pair ==> replayed book and timestamp of its last message, filled while streaming
+        books = {}
+        book_times = {}
+        streamed = None
+        streaming = None
+
+        try:
+            while True:
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=self.settle if channels and streaming is None else None)
+                except asyncio.TimeoutError:
+                    streamed = set(channels)
+                    subscriptions = [(name, pair, depth) for (name, pair), (_, depth) in channels.items()]
+                    streaming = asyncio.ensure_future(self.stream(ws, subscriptions, channels, books, book_times))
+                    continue
+
+                msg = ujson.loads(raw)
+                name = msg.get("subscription", {}).get("name")
+
+                if msg.get("event") == "subscribe":
+                    for status in self.subscribe(msg, streamed):
+                        await ws.send(ujson.dumps(status))
+                        if status["status"] != "subscribed":
+                            continue
+                        pair = status["pair"]
+                        channels[(name, pair)] = (status["channelID"], msg["subscription"].get("depth", 10))
+
+                        # updates go on from the replayed book, that the reader needs a snapshot of
+                        if name == "book" and pair in book_times:
+                            snapshot = book_snapshot_message(books[pair], pair, book_times[pair])
+                            await ws.send(ujson.dumps([status["channelID"], *snapshot]))
+
+                elif msg.get("event") == "unsubscribe":
+                    for pair in msg["pair"]:
+                        channel_id, _ = channels.pop((name, pair), (None, None))
+                        status = {"event": "subscriptionStatus", "pair": pair, "subscription": msg["subscription"]}
+                        if channel_id is None:
+                            status.update({"status": "error", "errorMessage": "Subscription Not Found"})
+                        else:
+                            status.update({"status": "unsubscribed", "channelID": channel_id, "channelName": name})
+                        await ws.send(ujson.dumps(status))
+
+        except websockets.ConnectionClosed:
+            pass
+
+        finally:
+            if streaming is not None:
+                streaming.cancel()
+
+
+    def subscribe(self, msg: dict, streamed: set = None) -> List[dict]:
+        """
+        Args:
+            streamed: (subscription name, pair) being streamed, None if streaming has not started
+                other subscriptions can not be merged into a running replay
+        """
+        name = msg["subscription"]["name"]
+        statuses = []
+
+        for pair in msg["pair"]:
+            status = {"event": "subscriptionStatus", "pair": pair, "subscription": msg["subscription"]}
+            if name not in SUBSCRIPTION_TO_FEED:
+                status.update({"status": "error", "errorMessage": f"Subscription {name} not available in replay"})
+            elif streamed is not None and (name, pair) not in streamed:
+                status.update({"status": "error", "errorMessage": f"Subscription {name} {pair} not available once replay has started"})
+            else:
+                status.update({"status": "subscribed", "channelID": next(self._channel_ids), "channelName": name})
+            statuses.append(status)
+
+        return statuses
+
+
+    def messages(self, subscriptions: list, books: dict = None, book_times: dict = None) -> Iterator[Tuple[int, tuple, list]]:
+        """merge recorded messages of all subscriptions in timestamp order, with their (subscription name, pair)
+
+        Args:
+            subscriptions: list of (subscription name, pair, depth)
+            books: filled with pair ==> replayed book
+            book_times: filled with pair ==> timestamp of the last book message
+        """
+        books = {} if books is None else books
+        book_times = {} if book_times is None else book_times
+
+        streams = []
+        for name, pair, depth in subscriptions:
+            feed = SUBSCRIPTION_TO_FEED[name]
+            files = list_files(self.root, feed, self.exchange, pair.replace("/", "-"), self.start_date, self.end_date)
+            rows = read_rows(files)
+
+            if feed == "trade":
+                stream = trade_messages(rows, pair)
+            elif feed == "spread":
+                stream = spread_messages(rows, pair)
+            else:
+                books[pair] = L2Book(symbol=pair, depth=depth)
+                stream = _track_time(orderbook_messages(rows, pair, depth, books[pair]), book_times, pair)
+
+            streams.append(((timestamp, (name, pair), msg) for timestamp, msg in stream))
+
+        return heapq.merge(*streams, key=lambda item: item[0])
+
+
+    async def stream(self, ws, subscriptions: list, channels: dict, books: dict = None, book_times: dict = None):
+        """
+        Args:
+            subscriptions: list of (subscription name, pair, depth) to replay
+            channels: (subscription name, pair) ==> (channelID, depth) of active subscriptions,
+                read for every message so that unsubscribed pairs are skipped
+        """
+        loop = asyncio.get_event_loop()
+        start_time = loop.time()
+        first_timestamp = None
+
+        try:
+            for timestamp, key, msg in self.messages(subscriptions, books, book_times):
+                if key not in channels:
+                    # books are still replayed, in case they are subscribed again
+                    continue
+
+                if self.speed > 0:
+                    if first_timestamp is None:
+                        first_timestamp = timestamp
+                    # sleep relative to replay start so that delays do not accumulate
+                    due = start_time + (timestamp - first_timestamp) / 10**9 / self.speed
+                    delay = due - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                # channel may have been unsubscribed while sleeping
+                if key not in channels:
+                    continue
+                await ws.send(ujson.dumps([channels[key][0], *msg]))
+                self.sent_count += 1
+
+                if self.speed <= 0 and self.sent_count % 1000 == 0:
+                    # let the server read incoming messages
+                    await asyncio.sleep(0)
+
+            logger.info(f"Replay --- Done, sent {self.sent_count} messages")
+
+        except (asyncio.CancelledError, websockets.ConnectionClosed):
+            pass
+
+        except Exception as e:
+            log_exception(logger, e)
+
+
+    def run(self, host: str = "localhost", port: int = 8765):
+        logger.info(f"Replay --- Serving {self.exchange} data from {self.root} on ws://{host}:{port} at speed {self.speed}")
+        loop = asyncio.get_event_loop()
+        server = loop.run_until_complete(websockets.serve(self.handler, host, port, max_size=None))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
@@ -0,0 +1,177 @@
+"""
+Shard feed subscriptions across processes, each running its own FeedHandler
+"""
+import os
+import time
+import signal
+import multiprocessing
+from typing import List, NamedTuple, Tuple
+
+from noobit.logger.structlogger import get_logger
+from noobit.processor.feed_handler import FeedHandler
+
+
+logger = get_logger(__name__)
+
+
+class Shard(NamedTuple):
+    exchange: str
+    private_feeds: Tuple[str, ...]
+    public_feeds: Tuple[str, ...]
+    pairs: Tuple[str, ...]
+
+    @property
+    def name(self):
+        feeds = "-".join(self.private_feeds or self.public_feeds)
+        pairs = "-".join(self.pairs) or "private"
+        return f"{self.exchange}:{feeds}:{pairs}"
+
+
+def plan_shards(exchanges: List[str],
+                private_feeds: List[str],
+                public_feeds: List[str],
+                pairs: List[str],
+                symbols_per_shard: int = 5
+                ) -> List[Shard]:
+    """Split subscriptions into (exchange, feed, symbol-group) shards
+
+    Private feeds are not per symbol, so each exchange gets a single private shard.
+
+    Returns:
+        list of Shard
+    """
+    groups = [tuple(pairs[i:i+symbols_per_shard]) for i in range(0, len(pairs), symbols_per_shard)]
+
+    shards = []
+    for exchange in exchanges:
+        exchange = exchange.lower()
+        if private_feeds:
+            shards.append(Shard(exchange, tuple(private_feeds), (), ()))
+        for feed in public_feeds:
+            for group in groups:
+                shards.append(Shard(exchange, (), (feed, ), group))
+
+    return shards
+
+
+def run_shard(shard: Shard, heartbeat, feedhandler_kwargs: dict):
+    """Process target, runs the FeedHandler of a single shard"""
+
+    fh = FeedHandler(exchanges=[shard.exchange],
+                     private_feeds=list(shard.private_feeds),
+                     public_feeds=list(shard.public_feeds),
+                     pairs=list(shard.pairs),
+                     heartbeat=heartbeat,
+                     **feedhandler_kwargs
+                     )
+    fh.run()
+
+
+
+
+class FeedHandlerSupervisor():
+    """Run one FeedHandler process per shard, restart only the shards that fail
+
+    A shard is considered failed when its process has exited (for ex a connection gave up reconnecting)
+    or when one of its connections has not received any frame for <heartbeat_timeout> seconds
+    (stalled connection or blocked event loop, see FeedHandler.beat).
+
+    Args:
+        shards (list): list of Shard, see plan_shards
+        feedhandler_kwargs (dict): passed to every FeedHandler (orderbook_mode, queue_size ...)
+        health_interval (float): seconds between health checks
+        heartbeat_timeout (float): seconds without frames on a connection before the shard is restarted
+        restart_delay (float): min seconds between two restarts of the same shard
+    """
+
+    def __init__(self,
+                 shards: List[Shard],
+                 feedhandler_kwargs: dict = None,
+                 health_interval: float = 5,
+                 heartbeat_timeout: float = 30,
+                 restart_delay: float = 5
+                 ):
+        self.shards = shards
+        self.feedhandler_kwargs = feedhandler_kwargs or {}
+        self.health_interval = health_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.restart_delay = restart_delay
+
+        # shard ==> process / heartbeat / last start time / restart count
+        self.processes = {}
+        self.heartbeats = {}
+        self.started_at = {}
+        self.restarts = {shard: 0 for shard in shards}
+        self.terminate = False
+
+
+    def start_shard(self, shard: Shard):
+        heartbeat = multiprocessing.Value("d", time.time())
+        process = multiprocessing.Process(target=run_shard,
+                                          args=(shard, heartbeat, self.feedhandler_kwargs),
+                                          name=shard.name,
+                                          daemon=False
+                                          )
+        process.start()
+        logger.info(f"Supervisor --- Started shard {shard.name} in process {process.pid}")
+
+        self.processes[shard] = process
+        self.heartbeats[shard] = heartbeat
+        self.started_at[shard] = time.time()
+
+
+    def stop_shard(self, shard: Shard, timeout: float = 10):
+        process = self.processes.get(shard)
+        if process is None or not process.is_alive():
+            return
+
+        # FeedHandler shuts down cleanly on KeyboardInterrupt
+        os.kill(process.pid, signal.SIGINT)
+        process.join(timeout)
+        if process.is_alive():
+            logger.warning(f"Supervisor --- Killing unresponsive shard {shard.name}")
+            process.kill()
+            process.join()
+
+
+    def is_healthy(self, shard: Shard) -> bool:
+        process = self.processes[shard]
+        if not process.is_alive():
+            logger.warning(f"Supervisor --- Shard {shard.name} exited with code {process.exitcode}")
+            return False
+
+        if time.time() - self.heartbeats[shard].value > self.heartbeat_timeout:
+            logger.warning(f"Supervisor --- Shard {shard.name} received no frame for {self.heartbeat_timeout}s")
+            return False
+
+        return True
+
+
+    def check_shards(self):
+        for shard in self.shards:
+            if self.is_healthy(shard):
+                continue
+            if time.time() - self.started_at[shard] < self.restart_delay:
+                continue
+
+            self.stop_shard(shard)
+            self.restarts[shard] += 1
+            logger.info(f"Supervisor --- Restarting shard {shard.name} (restart {self.restarts[shard]})")
+            self.start_shard(shard)
+
+
+    def run(self):
+        for shard in self.shards:
+            self.start_shard(shard)
+
+        try:
+            while not self.terminate:
+                time.sleep(self.health_interval)
+                self.check_shards()
+        except KeyboardInterrupt:
+            logger.info("Supervisor --- Keyboard Interrupt")
+        finally:
+            self.terminate = True
+            for shard in self.shards:
+                self.stop_shard(shard)
+            logger.info("Supervisor --- Shutdown complete")
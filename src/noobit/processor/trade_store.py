@@ -0,0 +1,216 @@
+"""
+Append-only binary store of historical trades, one file per exchange and symbol
+
+Trades are fixed-width records (see TRADE_DTYPE) in timestamp order, so a file is read
+as a memory-mapped numpy array without parsing, and only the pages of the requested rows are loaded.
+A sparse index (timestamp of every <INDEX_STEP>th row) narrows range queries down
+to a single block before the binary search on the mapped timestamps:
+    <root>/<exchange>_<symbol>.trades      records
+    <root>/<exchange>_<symbol>.index       (timestamp, row) of every INDEX_STEP rows
+"""
+import os
+from typing import Optional, Iterable
+
+import numpy as np
+import pandas as pd
+
+from noobit.logger.structlogger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+# packed, 26 bytes per trade
+TRADE_DTYPE = np.dtype([
+    ("transactTime", "<i8"),
+    ("avgPx", "<f8"),
+    ("cumQty", "<f8"),
+    ("side", "u1"),
+    ("ordType", "u1"),
+])
+
+INDEX_DTYPE = np.dtype([
+    ("transactTime", "<i8"),
+    ("row", "<i8"),
+])
+
+INDEX_STEP = 4096
+
+SIDES = {"buy": 0, "sell": 1}
+ORD_TYPES = {"market": 0, "limit": 1}
+
+
+def to_records(trades: Iterable[dict]) -> np.ndarray:
+    """Trade dicts (as in api responses) to store records"""
+    return np.array(
+        [
+            (int(t["transactTime"]), float(t["avgPx"]), float(t["cumQty"]), SIDES[t["side"]], ORD_TYPES.get(t["ordType"], 1))
+            for t in trades
+        ],
+        dtype=TRADE_DTYPE
+    )
+
+
+
+
+class TradeStore():
+    """
+    Args:
+        root (str): directory of trade files
+        exchange (str)
+        symbol (str)
+
+    Notes:
+        Appends must not go back in time, the downloader appends whole ranges in order.
+        Readers map the file when they read, so they see rows appended since they were created.
+    """
+
+    def __init__(self, root: str, exchange: str, symbol: str):
+        self.root = root
+        self.exchange = exchange.lower()
+        self.symbol = symbol
+        self.path = os.path.join(root, f"{exchange.lower()}_{symbol}.trades")
+        self.index_path = os.path.join(root, f"{exchange.lower()}_{symbol}.index")
+
+
+    def __len__(self) -> int:
+        try:
+            return os.path.getsize(self.path) // TRADE_DTYPE.itemsize
+        except FileNotFoundError:
+            return 0
+
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        records = self._map()
+        return int(records["transactTime"][-1]) if len(records) else None
+
+
+    # ================================================================================
+    # ==== WRITE
+
+
+    def append(self, records: np.ndarray):
+        if not len(records):
+            return
+        os.makedirs(self.root, exist_ok=True)
+
+        last = self.last_timestamp
+        if last is not None and records["transactTime"][0] < last:
+            raise ValueError(f"Trades must be appended in time order ({records['transactTime'][0]} < {last})")
+
+        start_row = len(self)
+        with open(self.path, "ab") as f:
+            records.astype(TRADE_DTYPE, copy=False).tofile(f)
+        self._update_index(start_row, records)
+
+
+    def append_file(self, path: str, size: int = None):
+        """Append records of a binary file written with TRADE_DTYPE (for ex a download part)"""
+        records = np.fromfile(path, dtype=TRADE_DTYPE, count=-1 if size is None else size // TRADE_DTYPE.itemsize)
+        self.append(records)
+
+
+    def truncate(self, rows: int):
+        """Drop rows after <rows> (for ex to redo an interrupted append)"""
+        if rows >= len(self):
+            return
+        with open(self.path, "r+b") as f:
+            f.truncate(rows * TRADE_DTYPE.itemsize)
+        index = self._read_index()
+        index[index["row"] < rows].tofile(self.index_path)
+
+
+    def _update_index(self, start_row: int, records: np.ndarray):
+        # rows of the new records that fall on an index step
+        first = -start_row % INDEX_STEP
+        rows = np.arange(first, len(records), INDEX_STEP)
+        entries = np.empty(len(rows), dtype=INDEX_DTYPE)
+        entries["transactTime"] = records["transactTime"][rows]
+        entries["row"] = rows + start_row
+        with open(self.index_path, "ab") as f:
+            entries.tofile(f)
+
+
+    # ================================================================================
+    # ==== READ
+
+
+    def _map(self) -> np.ndarray:
+        rows = len(self)
+        if not rows:
+            return np.empty(0, dtype=TRADE_DTYPE)
+        return np.memmap(self.path, dtype=TRADE_DTYPE, mode="r", shape=(rows,))
+
+
+    def _read_index(self) -> np.ndarray:
+        try:
+            return np.fromfile(self.index_path, dtype=INDEX_DTYPE)
+        except FileNotFoundError:
+            return np.empty(0, dtype=INDEX_DTYPE)
+
+
+    def _row(self, records: np.ndarray, index: np.ndarray, timestamp: int, side: str) -> int:
+        """First row >= timestamp (side="left") or > timestamp (side="right")"""
+        block = np.searchsorted(index["transactTime"], timestamp, side=side)
+        lo = int(index["row"][block - 1]) if block > 0 else 0
+        hi = int(index["row"][block]) if block < len(index) else len(records)
+        # only the block between two index entries is touched
+        return lo + int(np.searchsorted(records["transactTime"][lo:hi], timestamp, side=side))
+
+
+    def read(self, start: int = None, end: int = None) -> np.ndarray:
+        """Memory-mapped records with start <= transactTime < end (ns timestamps, None for unbounded)"""
+        records = self._map()
+        index = self._read_index()
+        lo = 0 if start is None else self._row(records, index, start, "left")
+        hi = len(records) if end is None else self._row(records, index, end, "left")
+        return records[lo:hi]
+
+
+    def to_frame(self, start: int = None, end: int = None) -> pd.DataFrame:
+        """Trades as a dataframe indexed by datetime, columns avgPx and cumQty"""
+        records = self.read(start, end)
+        return pd.DataFrame(
+            {"avgPx": records["avgPx"], "cumQty": records["cumQty"]},
+            index=pd.to_datetime(records["transactTime"], unit="ns").rename("transactTime")
+        )
+
+
+    # ================================================================================
+    # ==== MIGRATION
+
+
+    def import_legacy_csv(self) -> int:
+        """Import the csv file of previous versions if the store is empty"""
+        csv_path = os.path.join(self.root, f"{self.exchange}_{self.symbol}_historical_trade_data_fix_api.csv")
+        if len(self) or not os.path.exists(csv_path):
+            return 0
+        return self.import_csv(csv_path)
+
+
+    def import_csv(self, csv_path: str, chunksize: int = 1_000_000) -> int:
+        """Import a trade csv file written by previous versions of the historical trades downloader"""
+        count = 0
+        last = self.last_timestamp
+        for chunk in pd.read_csv(csv_path,
+                                 names=["symbol", "side", "ordType", "avgPx", "cumQty", "grossTradeAmt", "transactTime"],
+                                 chunksize=chunksize):
+            # previous versions wrote a header row and a row with timestamp 0
+            times = pd.to_numeric(chunk["transactTime"], errors="coerce")
+            keep = times > (last or 0)
+            chunk, times = chunk[keep], times[keep]
+
+            records = np.empty(len(chunk), dtype=TRADE_DTYPE)
+            records["transactTime"] = times.astype("int64")
+            records["avgPx"] = pd.to_numeric(chunk["avgPx"])
+            records["cumQty"] = pd.to_numeric(chunk["cumQty"])
+            records["side"] = chunk["side"].map(SIDES)
+            records["ordType"] = chunk["ordType"].map(ORD_TYPES).fillna(1)
+            records.sort(order="transactTime", kind="stable")
+            self.append(records)
+            count += len(records)
+            if len(records):
+                last = int(records["transactTime"][-1])
+        logger.info(f"Imported {count} trades from {csv_path}")
+        return count
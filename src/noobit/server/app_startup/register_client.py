@@ -1,7 +1,6 @@
 import logging
 
 from fastapi import FastAPI
-import httpx
 
 from noobit.server import settings
 # from noobit.logger.structlogger import get_logger
@@ -17,12 +16,14 @@ def register_session(
 
     @app.on_event('startup')
     async def init_session():
-        client = httpx.AsyncClient()
+        # pooled sessions and rest apis of all exchanges, views get them from settings.CLIENTS
+        await settings.CLIENTS.startup(list(settings.EXCHANGE_IDS_FROM_NAME.keys()))
+        client = settings.CLIENTS.session("default")
         settings.SESSION = client
         logger.info(f"Started HTTPX Session : {client}")
 
 
     @app.on_event('shutdown')
     async def close_session():
-        await settings.SESSION.aclose()
+        await settings.CLIENTS.shutdown()
         logger.info("Closed HTTPX Session")
\ No newline at end of file
@@ -1,9 +1,9 @@
+import asyncio
 import simplejson as ujson
 import logging
 
 from noobit.server import settings
 from noobit.models.orm import Exchange, Account
-from noobit.exchanges.mappings import rest_api_map
 from noobit.logger.structlogger import log_exception, log_exc_to_db
 
 logger = logging.getLogger("uvicorn.error")
@@ -22,20 +22,18 @@ async def record_new_account_update(event: str):
 
         #! update later
         api_key = f"{exchange_name}"
-        api = rest_api_map[api_key]()
+        api = settings.CLIENTS.api(api_key)
 
 
-        #! check if this returns an OKResponse
-        balances = await api.get_balances()
-        if not balances.is_ok:
-            return
-
-        exposure = await api.get_exposure()
-        if not exposure.is_ok:
-            return
+        # sent in parallel on different api keys if we have several (see key_lanes module)
+        balances, exposure, open_positions = await asyncio.gather(
+            api.get_balances(),
+            api.get_exposure(),
+            api.get_open_positions(mode="by_id")
+        )
 
-        open_positions = await api.get_open_positions(mode="by_id")
-        if not open_positions.is_ok:
+        #! check if this returns an OKResponse
+        if not (balances.is_ok and exposure.is_ok and open_positions.is_ok):
             return
 
         # redis = settings.AIOREDIS_POOL
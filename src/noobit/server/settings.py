@@ -10,6 +10,9 @@ import redis
 from dotenv import load_dotenv
 load_dotenv()
 
+from noobit.processor.orderbook import BookRegistry
+from noobit.exchanges.registry import ClientRegistry
+
 
 # Tasks scheduled to run (received from views and dispatched to watcher)
 SCHEDULED = deque()
@@ -28,10 +31,19 @@ AIOREDIS_POOL = None
 # HTTPX Session ==> should be sent to cache
 SESSION = None
 
+# Pooled httpx sessions and long-lived rest apis, one per exchange
+CLIENTS = ClientRegistry()
+
 # Dict containing mapping from exchange to unified pair/asset format
 SYMBOL_MAP_TO_EXCHANGE = {}
 SYMBOL_MAP_TO_STANDARD = {}
 
+# Dict containing price/volume decimals and leverage of each pair, by exchange
+PAIR_SPECS = {}
+
+# L2 Orderbooks by exchange and symbol, shared between feed readers, rest api and publishers
+ORDERBOOKS = BookRegistry()
+
 
 # ================================================================================
 
@@ -1,7 +1,7 @@
 from starlette import status
 
 from noobit.server.views import APIRouter, HTMLResponse, UJSONResponse
-from noobit.exchanges.mappings import rest_api_map
+from noobit.server import settings
 
 router = APIRouter()
 
@@ -15,7 +15,7 @@ router = APIRouter()
 async def get_open_orders(exchange: str):
 
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_open_orders_as_pandas()
         if response.is_ok:
             html_table = response.value.to_html()
@@ -36,7 +36,7 @@ async def get_open_orders(exchange: str):
 async def get_closed_orders(exchange: str):
 
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_closed_orders_as_pandas()
         if response.is_ok:
             html_table = response.value.to_html()
@@ -57,7 +57,7 @@ async def get_closed_orders(exchange: str):
 async def get_user_trades(exchange: str):
 
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_user_trades_as_pandas()
         if response.is_ok:
             html_table = response.value.to_html()
@@ -77,7 +77,7 @@ async def get_user_trades(exchange: str):
 @router.get('/open_positions/{exchange}')
 async def get_open_positions(exchange: str):
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_open_positions_as_pandas()
         if response.is_ok:
             html_table = response.value.to_html()
@@ -96,7 +96,7 @@ async def get_open_positions(exchange: str):
 @router.get('/closed_positions/{exchange}')
 async def get_closed_positions(exchange: str):
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_closed_positions_as_pandas()
         if response.is_ok:
             html_table = response.value.to_html()
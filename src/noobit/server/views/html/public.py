@@ -1,7 +1,7 @@
 from starlette import status
 
 from noobit.server.views import APIRouter, Query, HTMLResponse, UJSONResponse
-from noobit.exchanges.mappings import rest_api_map
+from noobit.server import settings
 
 
 router = APIRouter()
@@ -35,7 +35,7 @@ async def get_ohlc(exchange: str,
                    timeframe: int = Query(..., title="candle timeframe")
                    ):
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_ohlc_as_pandas(symbol=symbol, timeframe=int(timeframe))
         if response.is_ok:
             html_table = response.value.to_html()
@@ -57,7 +57,7 @@ async def get_orderbook(exchange: str,
                         symbol: str = Query(..., title="symbol"),
                         ):
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_orderbook_as_pandas(symbol=symbol)
         if response.is_ok:
             asks_table = response.value["asks"].to_html()
@@ -106,7 +106,7 @@ async def get_trades(exchange: str,
                      symbol: str = Query(..., title="symbol"),
                      ):
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_public_trades_as_pandas(symbol=symbol)
         if response.is_ok:
             html_table = response.value.to_html()
@@ -1,7 +1,7 @@
 from typing_extensions import Literal
 
 from noobit.server.views import APIRouter, Query, UJSONResponse
-from noobit.exchanges.mappings import rest_api_map
+from noobit.server import settings
 
 
 router = APIRouter()
@@ -19,7 +19,7 @@ async def get_open_orders(exchange: str,
 
 
     #! handle cases where exchange is unknown to return correct error message
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     response = await api.get_open_orders(mode=mode)
     return UJSONResponse(status_code=response.status_code, content=response.value)
@@ -30,7 +30,7 @@ async def get_open_orders(exchange: str,
 async def get_closed_orders(exchange: str,
                             mode: Literal["by_id", "to_list"] = Query(..., title="Sorting mode")
                             ):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     response = await api.get_closed_orders(mode=mode)
     return response
@@ -42,7 +42,7 @@ async def get_single_order(exchange: str,
                            mode: Literal["by_id", "to_list"] = Query(..., title="Sorting mode"),
                            order_id: str = Query(..., title="orderID to query")
                            ):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     response = await api.get_order(mode=mode, orderID=order_id)
     return response
@@ -52,7 +52,7 @@ async def get_single_order(exchange: str,
 async def get_trades(exchange: str,
                      mode: Literal["by_id", "to_list"] = Query(..., title="Sorting mode")
                      ):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     response = await api.get_user_trades(mode=mode)
     return response
@@ -63,7 +63,7 @@ async def get_single_trade(exchange: str,
                            mode: Literal["by_id", "to_list"] = Query(..., title="Sorting mode"),
                            trade_id: str = Query(..., title="trdMatchID to query")
                            ):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     response = await api.get_user_trade_by_id(mode=mode, trdMatchID=trade_id)
     return response
@@ -74,7 +74,7 @@ async def get_open_positions(exchange: str,
                              mode: Literal["by_id", "to_list"] = Query(..., title="Sorting mode"),
                              symbol: str = Query(..., title="symbol")
                              ):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     response = await api.get_open_positions(symbol=symbol, mode=mode)
     return response
@@ -85,7 +85,7 @@ async def get_closed_positions(exchange: str,
                                mode: Literal["by_id", "to_list"] = Query(..., title="Sorting mode"),
                                symbol: str = Query(..., title="symbol")
                                ):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     response = await api.get_closed_positions(symbol=symbol, mode=mode)
     return response
@@ -93,7 +93,7 @@ async def get_closed_positions(exchange: str,
 
 @router.get('/balances/{exchange}', response_class=UJSONResponse)
 async def get_balances(exchange: str):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     response = await api.get_balances()
     return response
@@ -101,7 +101,7 @@ async def get_balances(exchange: str):
 
 @router.get('/exposure/{exchange}', response_class=UJSONResponse)
 async def get_exposure(exchange: str):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     response = await api.get_exposure()
     return response
@@ -120,6 +120,6 @@ async def get_exposure(exchange: str):
 async def get_websocket_auth_token(exchange: str,
                                    validity: int = Query(None, title="Number of minutes the returned token will be valid")
                                    ):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
     response = await api.get_websocket_auth_token(validity=validity)
     return response
@@ -3,7 +3,6 @@ from starlette import status
 
 from noobit.server import settings
 from noobit.server.views import APIRouter, Query, UJSONResponse, WebSocket, HTMLResponse
-from noobit.exchanges.mappings import rest_api_map
 
 from noobit.models.data.response import Ohlc, Instrument, OrderBook, TradesList
 
@@ -22,7 +21,7 @@ async def get_public_trades(exchange: str,
                             ):
 
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_public_trades(symbol=symbol)
         if response.is_ok:
             return UJSONResponse(
@@ -47,7 +46,7 @@ async def get_orderbook(exchange: str,
                         ):
 
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_orderbook(symbol=symbol)
         if response.is_ok:
             return UJSONResponse(
@@ -77,7 +76,7 @@ async def get_instrument(exchange: str,
                          ):
 
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_instrument(symbol=symbol)
         if response.is_ok:
             return UJSONResponse(
@@ -103,7 +102,7 @@ async def get_ohlc(exchange: str,
                    timeframe: int = Query(..., title="candle timeframe")
                    ):
     try:
-        api = rest_api_map[exchange]()
+        api = settings.CLIENTS.api(exchange)
         response = await api.get_ohlc(symbol=symbol, timeframe=int(timeframe))
         if response.is_ok:
             return UJSONResponse(
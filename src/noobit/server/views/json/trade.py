@@ -1,5 +1,5 @@
 from noobit.server.views import APIRouter, Query, UJSONResponse
-from noobit.exchanges.mappings import rest_api_map
+from noobit.server import settings
 
 
 router = APIRouter()
@@ -25,7 +25,7 @@ async def place_order(exchange: str,
                       expire_time: int = Query(None, title="Expire Time")
                       ):
 
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
 
     # no price = market order => we set order price to last close to calculate slippage later
     if not price:
@@ -53,7 +53,7 @@ async def cancel_order(exchange: str,
                        txid: str = Query(..., title="ID of Order to cancel"),
                        retries: int = Query(None, title="Number of times to retry the request if it fails")
                        ):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
     response = await api.cancel_order(txid=txid, retries=retries)
     return response
 
@@ -63,6 +63,6 @@ async def cancel_order(exchange: str,
 async def cancel_all_orders(exchange: str,
                             retries: int = Query(None, title="Number of times to retry the request if it fails")
                             ):
-    api = rest_api_map[exchange]()
+    api = settings.CLIENTS.api(exchange)
     response = await api.cancel_all_orders(retries=retries)
     return response
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from noobit.engine.base.indicators import EMA, RSI
+
+
+def test_ema_matches_pandas():
+    rng = np.random.default_rng(5)
+    values = 10 + rng.standard_normal(50).cumsum()
+
+    # seeded with the simple average of the first 10 values
+    seeded = pd.Series(values[9:])
+    seeded.iloc[0] = values[:10].mean()
+    expected = seeded.ewm(span=10, adjust=False).mean()
+
+    result = EMA(timeperiod=10).update(values)
+    assert np.isnan(result[:9]).all()
+    assert np.allclose(result[9:], expected)
+
+
+def test_rsi_bounds():
+    assert RSI(timeperiod=3).update(np.arange(10.))[3:].tolist() == [100.] * 7
+    assert RSI(timeperiod=3).update(np.arange(10.)[::-1])[3:].tolist() == [0.] * 7
+    assert np.isnan(RSI(timeperiod=3).update(np.arange(10.))[:3]).all()
+
+
+def test_update_only_processes_new_rows_and_keeps_open_bar_out_of_state():
+    values = np.array([1., 2., 3., 4., 5.])
+    ema = EMA(timeperiod=2)
+    full = ema.update(values)
+
+    # last bar changes, then a new bar opens
+    changed = np.r_[values[:-1], 7.]
+    assert ema.update(changed, rows=1)[-1] == EMA(timeperiod=2).update(changed)[-1]
+    grown = np.r_[changed, 6.]
+    assert np.allclose(ema.update(grown, rows=2), EMA(timeperiod=2).update(grown)[-2:])
+    assert np.allclose(full[:-1], EMA(timeperiod=2).update(grown)[:4], equal_nan=True)
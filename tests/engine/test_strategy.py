@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from noobit.server import settings
+from noobit.engine.base import strategy
+from noobit.engine.base.strategy import StratBase
+from noobit.engine.base.indicators import EMA, RSI
+from noobit.processor.bar_cache import BarCache, MINUTE
+from noobit.processor.trade_store import TRADE_DTYPE
+
+
+def SMA(source, timeperiod):
+    return source.rolling(timeperiod).mean()
+
+
+def make_records(minutes, prices):
+    records = np.zeros(len(minutes), dtype=TRADE_DTYPE)
+    records["transactTime"] = np.asarray(minutes) * MINUTE
+    records["avgPx"] = prices
+    records["cumQty"] = 1
+    return records
+
+
+class Strat(StratBase):
+
+    def user_setup(self):
+        self.add_indicator(func=SMA, source="close", timeperiod=3)
+        self.add_crossup("close", "SMA")
+        self.add_crossdown("close", "SMA")
+        self.add_crossover("close", 10)
+        self.add_crossunder("close", 10)
+
+
+@pytest.fixture
+def strat(tmp_path, monkeypatch):
+    # no rest api, bars come from the trade stream
+    monkeypatch.setattr(settings.CLIENTS, "api", lambda exchange: None)
+    strat = Strat("test", "kraken", "XBT-USD", timeframe=1, volume=0, lookback=20)
+    strat.bars = BarCache(str(tmp_path), "kraken", "XBT-USD", timeframes=[1])
+    strat.trade_channel = "mock"
+    strat.user_setup()
+    return strat
+
+
+# ================================================================================
+
+
+@pytest.mark.asyncio
+async def test_incremental_update_matches_full_calculation(strat):
+    rng = np.random.default_rng(3)
+    prices = 10 + rng.standard_normal(60).cumsum()
+
+    for minute, price in enumerate(prices):
+        # two trades per bar, the second one changes the open bar
+        for trade in make_records([minute, minute + 0.5], [price - 1, price]):
+            strat._new_trades.append({
+                "transactTime": int(trade["transactTime"]), "avgPx": trade["avgPx"],
+                "cumQty": 1, "side": "buy", "ordType": "market"
+            })
+            rows = await strat.update_df()
+            strat.calculate_indicators(rows)
+            strat.calculate_crosses(rows)
+
+        assert len(strat.df) == min(minute + 1, 20)
+
+    incremental = strat.df.copy()
+
+    # full calculation over all bars
+    strat.df = strat.bars.to_frame(1)
+    strat.calculate_indicators()
+    strat.calculate_crosses()
+    full = strat.df.iloc[-20:]
+
+    assert np.allclose(incremental["SMA"], full["SMA"])
+    for col in ["CROSSUP_close_SMA", "CROSSDOWN_close_SMA", "CROSSOVER_close_10", "CROSSUNDER_close_10"]:
+        assert incremental[col].tolist() == full[col].tolist()
+    assert incremental["CROSSUP_close_SMA"].any() and incremental["CROSSDOWN_close_SMA"].any()
+
+
+@pytest.mark.asyncio
+async def test_no_new_bar_keeps_values(strat):
+    strat.bars.add_trades(make_records([0, 1, 2, 3], [1., 2., 3., 4.]))
+    rows = await strat.update_df()
+    assert rows == 4
+    strat.calculate_indicators(rows)
+
+    sma = strat.df["SMA"].tolist()
+
+    # last bar may still change, it is the only one calculated again
+    rows = await strat.update_df()
+    assert rows == 1
+    assert np.isnan(strat.df["SMA"].iloc[-1])
+    strat.calculate_indicators(rows)
+    assert np.allclose(strat.df["SMA"], sma, equal_nan=True)
+
+
+def test_crosses_are_calculated_at_once(strat):
+    strat.df = pd.DataFrame({
+        "close": [9., 11., 12., 8., 10.5, 9.],
+        "SMA": [10., 10., 13., 7., 11., 11.],
+    })
+    columns = list(strat.df.columns)
+    strat.calculate_crosses()
+
+    assert strat.df["CROSSUP_close_SMA"].tolist() == [False, True, False, True, False, False]
+    assert strat.df["CROSSDOWN_close_SMA"].tolist() == [False, False, True, False, True, False]
+    assert strat.df["CROSSOVER_close_10"].tolist() == [False, True, False, False, True, False]
+    assert strat.df["CROSSUNDER_close_10"].tolist() == [False, False, False, True, False, True]
+    # no temporary column left
+    assert list(strat.df.columns) == columns + [name for name, *_ in strat._crosses()]
+    assert (strat.df.dtypes[len(columns):] == bool).all()
+
+
+@pytest.mark.asyncio
+async def test_seeded_open_bar_is_completed_by_newer_trades(strat, monkeypatch):
+    # rest ohlc, last bar is still open
+    ohlc = pd.DataFrame({
+        "utcTime": [0, MINUTE], "open": [1., 2.], "high": [1., 3.], "low": [1., 2.], "close": [1., 3.],
+        "volume": [1., 2.], "trdCount": [1, 2]
+    })
+
+    async def get_ohlc():
+        return ohlc
+    monkeypatch.setattr(strat, "get_ohlc", get_ohlc)
+    monkeypatch.setattr(strategy.time, "time_ns", lambda: MINUTE + 10)
+
+    # received before the seed, already in the open bar
+    strat._new_trades.append({"transactTime": MINUTE + 5, "avgPx": 3., "cumQty": 1, "side": "buy", "ordType": "market"})
+    await strat.setup_df()
+    strat._new_trades.append({"transactTime": strat.seeded_at + 1, "avgPx": 4., "cumQty": 1, "side": "buy", "ordType": "market"})
+    await strat.update_df()
+
+    assert strat.df[["open", "high", "low", "close", "volume"]].values.tolist() == [
+        [1., 1., 1., 1., 1.],
+        [2., 4., 2., 4., 3.],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_incremental_indicators_do_not_drift(strat):
+    strat.add_indicator(func=EMA(timeperiod=10), source="close")
+    strat.add_indicator(func=RSI(timeperiod=5), source="close")
+
+    rng = np.random.default_rng(7)
+    prices = 10 + rng.standard_normal(60).cumsum()
+    for minute, price in enumerate(prices):
+        strat.bars.add_trades(make_records([minute], [price]))
+        rows = await strat.update_df()
+        strat.calculate_indicators(rows)
+
+    # same values as over the whole history, although the window only holds 20 bars
+    closes = strat.bars.to_frame(1)["close"].to_numpy()
+    assert len(strat.df) == 20
+    assert np.allclose(strat.df["EMA"], EMA(timeperiod=10).update(closes)[-20:])
+    assert np.allclose(strat.df["RSI"], RSI(timeperiod=5).update(closes)[-20:])
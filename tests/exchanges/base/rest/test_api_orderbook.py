@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+import pytest
+
+from noobit.server import settings
+from noobit.exchanges.base.rest.api import APIBase
+from noobit.models.data.base.response import OKResponse
+from noobit.processor.orderbook import BookRegistry
+
+
+class RequestParser():
+
+    def orderbook(self, symbol):
+        return {"pair": symbol}
+
+
+class ResponseParser():
+
+    def orderbook(self, response):
+        return {"sendingTime": 0, "symbol": "XBT-USD", "asks": {"9001": "1"}, "bids": {"9000": "2"}}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setattr(settings, "ORDERBOOKS", BookRegistry())
+
+    # no session needed, rest response is mocked
+    api = APIBase.__new__(APIBase)
+    api.exchange = "kraken"
+    api.request_parser = RequestParser()
+    api.response_parser = ResponseParser()
+
+    async def query_public(**kwargs):
+        return OKResponse(status_code=200, value={})
+    api.query_public = query_public
+    return api
+
+
+# ================================================================================
+
+
+@pytest.mark.asyncio
+async def test_rest_snapshot_does_not_create_shared_book(api):
+    response = await api.get_orderbook("XBT-USD")
+
+    assert response.is_ok
+    assert settings.ORDERBOOKS.find("kraken", "XBT-USD") is None
+
+
+@pytest.mark.asyncio
+async def test_rest_snapshot_leaves_feed_book_untouched(api):
+    # book of a websocket feed waiting for its snapshot (for ex during a resync)
+    book = settings.ORDERBOOKS.get("kraken", "XBT-USD", depth=10)
+
+    response = await api.get_orderbook("XBT-USD", cached=True)
+
+    assert response.value["asks"] == {Decimal("9001"): Decimal("1")}
+    assert not book.is_synced and len(book) == 0
@@ -0,0 +1,47 @@
+import time
+import asyncio
+
+import pytest
+
+from noobit.exchanges.base.rest.key_lanes import KeyScheduler
+from noobit.exchanges.base.rest.rate_limit import RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_use_all_lanes():
+    scheduler = KeyScheduler("mock", [("key1", "s1"), ("key2", "s2"), ("key3", "s3")])
+    used = []
+
+    async def query():
+        lane = await scheduler.acquire()
+        try:
+            used.append(lane.key)
+            await asyncio.sleep(0.05)
+        finally:
+            await scheduler.release(lane)
+
+    start = time.monotonic()
+    await asyncio.gather(*[query() for _ in range(6)])
+
+    # 6 queries, 3 lanes with one query in flight each: 2 rounds
+    assert 0.1 <= time.monotonic() - start < 0.15
+    assert sorted(used) == ["key1", "key1", "key2", "key2", "key3", "key3"]
+    assert all(lane.in_flight == 0 for lane in scheduler.lanes)
+
+
+@pytest.mark.asyncio
+async def test_picks_lane_with_rate_budget():
+    limiter = RateLimiter({"mock": {"private": (2, 0.01)}})
+    scheduler = KeyScheduler("mock", [("key1", "s1"), ("key2", "s2")], rate_limiter=limiter)
+    limiter.saturate("mock", "key1", "private")
+
+    lane = await scheduler.acquire("private", 2)
+    assert lane.key == "key2"
+    await scheduler.release(lane)
+
+
+@pytest.mark.asyncio
+async def test_no_keys():
+    scheduler = KeyScheduler("mock", [])
+    with pytest.raises(ValueError):
+        await scheduler.acquire()
@@ -0,0 +1,50 @@
+import asyncio
+import multiprocessing as mp
+
+import pytest
+
+from noobit.exchanges.base.rest.nonce import LocalNonce, FileNonce
+
+
+def _increasing(nonces):
+    return all(a < b for a, b in zip(nonces, nonces[1:]))
+
+
+@pytest.mark.asyncio
+async def test_local_nonce_concurrent():
+    source = LocalNonce("kraken", "key")
+    nonces = await asyncio.gather(*[source.next() for _ in range(1000)])
+    assert _increasing(nonces)
+
+
+@pytest.mark.asyncio
+async def test_file_nonce_survives_restart(tmp_path):
+    first = FileNonce("kraken", "key", directory=str(tmp_path))
+    last = [await first.next() for _ in range(100)][-1]
+
+    # new process reads last nonce from file
+    second = FileNonce("kraken", "key", directory=str(tmp_path))
+    assert await second.next() > last
+    assert "key" not in second.path.rsplit("/", 1)[-1]
+
+
+def _draw(directory, count, queue):
+    async def draw():
+        source = FileNonce("kraken", "key", directory=directory)
+        return [await source.next() for _ in range(count)]
+    queue.put(asyncio.run(draw()))
+
+
+def test_file_nonce_across_processes(tmp_path):
+    queue = mp.Queue()
+    processes = [mp.Process(target=_draw, args=(str(tmp_path), 200, queue)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    results = [queue.get(timeout=10) for _ in processes]
+    for process in processes:
+        process.join()
+
+    nonces = [nonce for result in results for nonce in result]
+    # every process sees increasing nonces, and no nonce is handed out twice
+    assert all(_increasing(result) for result in results)
+    assert len(set(nonces)) == len(nonces)
@@ -0,0 +1,58 @@
+import pytest
+
+from noobit.exchanges.base.rest.pair_metadata import PairMetadataCache
+
+
+class MockAPI():
+
+    exchange = "Mock"
+    requests = 0
+    fetches = 0
+
+    @classmethod
+    def _request_pair_metadata(cls):
+        cls.requests += 1
+        return {"XXBTZUSD": "XBT-USD"}
+
+    @classmethod
+    async def _fetch_pair_metadata(cls):
+        cls.fetches += 1
+        return {"XXBTZUSD": "XBT-USD", "XETHZUSD": "ETH-USD"}
+
+    @classmethod
+    def _parse_pair_metadata(cls, response):
+        return response, {v: {"price_decimals": 1} for v in response.values()}
+
+
+# ================================================================================
+
+
+@pytest.mark.asyncio
+async def test_load_then_warm_start_from_disk(tmp_path):
+    MockAPI.requests = MockAPI.fetches = 0
+
+    cache = PairMetadataCache(cache_dir=str(tmp_path))
+    metadata = await cache.load(MockAPI)
+    assert metadata.to_exchange_format == {"XBT-USD": "XXBTZUSD", "ETH-USD": "XETHZUSD"}
+    assert MockAPI.fetches == 1
+
+    # new process: read from disk, no request at all
+    other = PairMetadataCache(cache_dir=str(tmp_path))
+    assert other.get(MockAPI).pair_specs["ETH-USD"] == {"price_decimals": 1}
+    assert MockAPI.requests == 0 and MockAPI.fetches == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_updates_in_place(tmp_path):
+    MockAPI.requests = MockAPI.fetches = 0
+
+    cache = PairMetadataCache(cache_dir=None)
+    # cold start without disk copy falls back to a blocking request
+    metadata = cache.get(MockAPI)
+    mapping = metadata.to_standard_format
+    assert MockAPI.requests == 1
+    assert "XETHZUSD" not in mapping
+
+    await cache.refresh(MockAPI)
+    assert cache.get(MockAPI) is metadata
+    assert mapping["XETHZUSD"] == "ETH-USD"
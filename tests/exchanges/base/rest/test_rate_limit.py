@@ -0,0 +1,53 @@
+import time
+import asyncio
+
+import pytest
+
+from noobit.exchanges.base.rest.rate_limit import DecayingCounter, RateLimiter
+
+
+def test_counter_decays():
+    counter = DecayingCounter(max_count=2, decay_rate=10)
+    counter.count = 2
+    assert counter.wait_for(1) == pytest.approx(0.1, abs=0.01)
+
+    time.sleep(0.1)
+    assert counter.wait_for(1) == 0
+
+
+def test_cost_above_max_waits_for_empty_counter():
+    counter = DecayingCounter(max_count=1, decay_rate=1)
+    assert counter.wait_for(2) == 0
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_budget():
+    counter = DecayingCounter(max_count=2, decay_rate=20)
+
+    start = time.monotonic()
+    # burst of 2 goes through, then one call every 0.05s
+    for _ in range(4):
+        await counter.acquire(1)
+    assert 0.08 < time.monotonic() - start < 0.2
+    assert counter.wait_time > 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_acquire_shares_budget():
+    counter = DecayingCounter(max_count=1, decay_rate=20)
+
+    start = time.monotonic()
+    await asyncio.gather(*[counter.acquire(1) for _ in range(5)])
+    assert time.monotonic() - start >= 0.19
+
+
+def test_counters_per_key_and_class():
+    limiter = RateLimiter({"kraken": {"public": (1, 1), "private": (15, 0.33)}})
+
+    assert limiter.counter("Kraken", "key1", "private") is limiter.counter("kraken", "key1", "private")
+    assert limiter.counter("kraken", "key1", "private") is not limiter.counter("kraken", "key2", "private")
+    assert limiter.counter("kraken", None, "public").max_count == 1
+
+    limiter.saturate("kraken", "key1", "private")
+    assert limiter.counter("kraken", "key1", "private").wait_for(1) > 0
+    assert limiter.counter("kraken", "key2", "private").wait_for(1) == 0
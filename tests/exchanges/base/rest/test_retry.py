@@ -0,0 +1,115 @@
+import time
+
+import httpx
+import pytest
+
+from noobit.exchanges.base.rest.api import APIBase
+from noobit.exchanges.base.rest.retry import RetryPolicy
+from noobit.exchanges.base.rest.rate_limit import RateLimiter
+from noobit.models.data.response.parse.kraken.parser import KrakenResponseParser
+
+
+def test_gives_up_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3, base=0, cap=0)
+    retry = policy.start()
+
+    delays = []
+    for _ in range(3):
+        retry.attempt()
+        delays.append(retry.next_delay("ExchangeNotAvailable"))
+
+    assert delays == [0, 0, None]
+    assert policy.metrics() == {"attempts": 3, "retries": 2, "retry:ExchangeNotAvailable": 2, "giveups": 1}
+
+
+def test_min_delay_and_deadline():
+    policy = RetryPolicy(max_attempts=10, deadline=5, base=0.1, cap=0.1)
+    retry = policy.start()
+    retry.attempt()
+
+    assert retry.next_delay("DDoSProtection", min_delay=2) == 2
+    # advised sleep ends after the deadline, a retry would still be rate limited
+    assert retry.next_delay("RateLimitExceeded", min_delay=60) is None
+
+    retry.started_at -= 5
+    assert retry.next_delay("ExchangeNotAvailable") is None
+
+
+def test_not_retryable():
+    retry = RetryPolicy().start()
+    retry.attempt()
+    assert retry.next_delay("BadSymbol", retryable=False) is None
+
+
+def test_replace_shares_metrics():
+    policy = RetryPolicy(max_attempts=3)
+    single = policy.replace(max_attempts=1)
+    assert single.max_attempts == 1 and single.deadline == policy.deadline
+
+    retry = single.start()
+    retry.attempt()
+    assert retry.next_delay("RequestTimeout") is None
+    assert policy.metrics()["giveups"] == 1
+
+
+def test_retryable_exceptions():
+    class Response():
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    class StatusError(Exception):
+        def __init__(self, status_code):
+            self.response = Response(status_code)
+
+    assert RetryPolicy.is_retryable_exception(StatusError(503))
+    assert RetryPolicy.is_retryable_exception(StatusError(429))
+    assert not RetryPolicy.is_retryable_exception(StatusError(404))
+    assert RetryPolicy.is_retryable_exception(ConnectionResetError())
+    assert RetryPolicy.is_retryable_exception(httpx.HTTPError("connection reset"))
+    assert not RetryPolicy.is_retryable_exception(KeyError("result"))
+
+
+def make_api(responses):
+    # no session or keys needed for a public query
+    api = APIBase.__new__(APIBase)
+    api.response_parser = KrakenResponseParser()
+    api.calls = 0
+
+    async def query(**kwargs):
+        api.calls += 1
+        return responses.pop(0)
+    api._query = query
+    return api
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_query_gives_up_before_deadline():
+    api = make_api([{"error": ["EAPI:Rate limit exceeded"]}, {"error": [], "result": {"ok": 1}}])
+
+    # RateLimitExceeded advises a 60s sleep, longer than the deadline
+    policy = RetryPolicy(max_attempts=3, deadline=30)
+    started_at = time.monotonic()
+    result = await api._send("ohlc", "/0/public/OHLC", {}, private=False, timeout=None, policy=policy)
+
+    assert time.monotonic() - started_at < 1
+    assert result.exception == "RateLimitExceeded"
+    assert api.calls == 1
+    assert policy.metrics()["giveups"] == 1 and "retries" not in policy.metrics()
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_wait_counts_against_deadline():
+    api = make_api([{"error": [], "result": {"ok": 1}}])
+    api.exchange = "kraken"
+    api.method_costs = {}
+    api.rate_limits = {"public": (1, 0.01)}
+    api.rate_limiter = RateLimiter({"kraken": api.rate_limits})
+    # full counter, next call fits in 100s
+    api.rate_limiter.saturate("kraken", None, "public")
+
+    policy = RetryPolicy(max_attempts=3, deadline=0.05)
+    result = await api._send("ohlc", "/0/public/OHLC", {}, private=False, timeout=None, policy=policy)
+
+    assert result.status_code == 429 and not result.is_ok
+    assert api.calls == 0
+    assert policy.metrics()["giveups"] == 1
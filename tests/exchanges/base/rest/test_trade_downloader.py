@@ -0,0 +1,103 @@
+import pytest
+
+from noobit.exchanges.base.rest.trade_downloader import TradeDownloader
+
+
+class Response():
+
+    def __init__(self, value, is_ok=True):
+        self.value = value
+        self.is_ok = is_ok
+
+
+class MockAPI():
+    """One trade every 10ns from <first> to 1000, pages of 7 trades"""
+
+    exchange = "Mock"
+
+    def __init__(self, fail_after: int = None, first: int = 0):
+        self.calls = 0
+        self.fail_after = fail_after
+        self.first = first
+        self.since = []
+
+    async def get_public_trades(self, symbol, since):
+        self.calls += 1
+        self.since.append(since)
+        if self.fail_after is not None and self.calls > self.fail_after:
+            return Response("EService:Unavailable", is_ok=False)
+
+        times = [t for t in range(self.first, 1000, 10) if t > since][:7]
+        data = [
+            {"symbol": symbol, "side": "buy", "ordType": "market", "avgPx": 1.5,
+             "cumQty": 2, "grossTradeAmt": 3, "transactTime": t}
+            for t in times
+        ]
+        return Response({"data": data, "last": times[-1] if times else since})
+
+
+def read_times(store):
+    return store.read()["transactTime"].tolist()
+
+
+# ================================================================================
+
+
+@pytest.mark.asyncio
+async def test_ranges_are_stitched_in_order(tmp_path):
+    downloader = TradeDownloader(MockAPI(), data_dir=str(tmp_path), ranges=3)
+    counts = await downloader.download(["XBT-USD"], end=1000)
+
+    # since is exclusive, the trade at 0 is never returned
+    assert read_times(downloader.store("XBT-USD")) == list(range(10, 1000, 10))
+    assert counts == {"XBT-USD": 99}
+    assert downloader.load_checkpoint("XBT-USD") == {"cursor": 1000, "ranges": []}
+    # part files are removed once stitched
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "mock_XBT-USD.index", "mock_XBT-USD.trades", "mock_XBT-USD.trades.checkpoint.json"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_resume_after_failure(tmp_path):
+    failing = TradeDownloader(MockAPI(fail_after=5), data_dir=str(tmp_path), ranges=2)
+    await failing.download(["XBT-USD"], end=1000)
+    assert failing.load_checkpoint("XBT-USD")["ranges"]
+
+    resumed = TradeDownloader(MockAPI(), data_dir=str(tmp_path), ranges=2)
+    await resumed.download(["XBT-USD"])
+    assert read_times(resumed.store("XBT-USD")) == list(range(10, 1000, 10))
+
+
+@pytest.mark.asyncio
+async def test_incremental_download_appends(tmp_path):
+    downloader = TradeDownloader(MockAPI(), data_dir=str(tmp_path), ranges=2)
+    await downloader.download(["XBT-USD"], end=500)
+    assert read_times(downloader.store("XBT-USD"))[-1] == 500
+
+    await downloader.download(["XBT-USD"], end=1000)
+    assert read_times(downloader.store("XBT-USD")) == list(range(10, 1000, 10))
+
+
+
+@pytest.mark.asyncio
+async def test_first_download_is_split_from_first_trade(tmp_path):
+    api = MockAPI(first=700)
+    downloader = TradeDownloader(api, data_dir=str(tmp_path), ranges=3)
+    await downloader.download(["XBT-USD"], end=1000)
+
+    assert read_times(downloader.store("XBT-USD")) == list(range(700, 1000, 10))
+    # one query to find the first trade, then every range starts within history
+    assert api.since[0] == 0
+    assert {699, 799, 899} <= set(api.since[1:])
+    assert min(api.since[1:]) == 699
+
+
+@pytest.mark.asyncio
+async def test_first_download_from_given_start(tmp_path):
+    api = MockAPI()
+    downloader = TradeDownloader(api, data_dir=str(tmp_path), ranges=2)
+    await downloader.download(["XBT-USD"], start=500, end=1000)
+
+    assert read_times(downloader.store("XBT-USD")) == list(range(510, 1000, 10))
+    assert 0 not in api.since
@@ -0,0 +1,126 @@
+import pytest
+import ujson
+
+from noobit.exchanges.base.websockets import public as base_public
+from noobit.models.data.base.numeric import NumericConverter
+from noobit.exchanges.kraken.websockets.public import KrakenPublicFeedReader
+
+
+def status(channel_id, name, status="subscribed", pair="XBT/USD", **subscription):
+    msg = {"event": "subscriptionStatus", "pair": pair, "status": status, "subscription": {"name": name, **subscription}}
+    if channel_id is not None:
+        msg["channelID"] = channel_id
+    return msg
+
+
+class MockWebSocket():
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, payload):
+        self.sent.append(payload)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def feed_reader():
+    return KrakenPublicFeedReader(pairs=["XBT-USD"], feeds=["trade"])
+
+
+# ================================================================================
+
+
+@pytest.mark.asyncio
+async def test_subscribe_and_unsubscribe_update_channel_routes(feed_reader):
+    assert await feed_reader.route_message(status(42, "book", depth=10)) == "subscription_status"
+    assert await feed_reader.route_message(status(7, "trade")) == "subscription_status"
+    assert feed_reader.channel_routes == {42: "orderbook", 7: "trade"}
+
+    # routed by channelID, whatever the channel name says
+    assert await feed_reader.route_message([42, {"a": [["5541.3", "0.1", "1534614248.1"]]}, "not-a-feed", "XBT/USD"]) == "orderbook"
+    assert await feed_reader.route_message([7, [["5541.2", "0.1", "1534614057.3", "s", "l", ""]], "not-a-feed", "XBT/USD"]) == "trade"
+
+    await feed_reader.route_message(status(42, "book", status="unsubscribed", depth=10))
+    assert feed_reader.channel_routes == {7: "trade"}
+    # unknown channelID falls back to the channel name
+    assert await feed_reader.route_message([42, {"a": []}, "book-10", "XBT/USD"]) == "orderbook"
+
+
+@pytest.mark.asyncio
+async def test_error_status_does_not_add_route(feed_reader):
+    await feed_reader.route_message(status(7, "trade"))
+
+    # kraken error statuses carry no channelID
+    await feed_reader.route_message(status(None, "spread", status="error", errorMessage="Subscription depth not supported"))
+    # an error for an existing channel removes it
+    await feed_reader.route_message(status(7, "trade", status="error", errorMessage="Currency pair not supported"))
+    assert feed_reader.channel_routes == {}
+
+
+@pytest.mark.asyncio
+async def test_channel_routes_are_reset_on_reconnect(feed_reader, monkeypatch):
+    async def connect(**kwargs):
+        return MockWebSocket()
+    monkeypatch.setattr(base_public.websockets, "connect", connect)
+
+    await feed_reader.subscribe(ping_interval=10, ping_timeout=10)
+    await feed_reader.route_message(status(7, "trade"))
+    assert feed_reader.channel_routes == {7: "trade"}
+
+    # channel ids are assigned per connection
+    await feed_reader.reconnect()
+    assert feed_reader.channel_routes == {}
+    assert len(feed_reader.ws.sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_frame_is_decoded_once(feed_reader, monkeypatch):
+    loads = []
+    rapidjson_loads = base_public.rapidjson.loads
+
+    def counting_loads(msg):
+        loads.append(msg)
+        return rapidjson_loads(msg)
+    monkeypatch.setattr(base_public.rapidjson, "loads", counting_loads)
+
+    routed = []
+    route_message = feed_reader.route_message
+
+    async def spy_route_message(msg):
+        routed.append(msg)
+        return await route_message(msg)
+    monkeypatch.setattr(feed_reader, "route_message", spy_route_message)
+
+    published = []
+
+    async def publish_data_trade(msg, redis_pool):
+        published.append(msg)
+    feed_reader.route_to_method["trade"] = publish_data_trade
+
+    await feed_reader.msg_handler('[7,[["5541.2","0.1","1534614057.3","s","l",""]],"trade","XBT/USD"]', None)
+
+    assert len(loads) == 1
+    # routing and publish method receive the same decoded message
+    assert isinstance(routed[0], list)
+    assert published[0] is routed[0]
+
+
+@pytest.mark.asyncio
+async def test_fixed_point_trades_are_published_as_floats():
+    numeric = NumericConverter("fixed", pair_specs={"XBT-USD": {"price_decimals": 1, "volume_decimals": 8}})
+    feed_reader = KrakenPublicFeedReader(pairs=["XBT-USD"], feeds=["trade"], stream_validation="never", numeric=numeric)
+
+    published = []
+
+    class RedisPool():
+        async def publish(self, channel, payload):
+            published.append(ujson.loads(payload))
+
+    await feed_reader.publish_data_trade([7, [["5541.20000", "0.50000000", "1534614057.321597", "s", "l", ""]], "trade", "XBT/USD"], RedisPool())
+
+    assert published[0]["avgPx"] == 5541.2
+    assert published[0]["cumQty"] == 0.5
+    assert published[0]["grossTradeAmt"] == 2770.6
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from noobit.server import settings
+from noobit.exchanges.registry import ClientRegistry
+from noobit.exchanges.base.rest.api import APIBase
+from noobit.exchanges.base.rest.pair_metadata import PairMetadataCache
+from noobit.exchanges.kraken.rest.api import KrakenRestAPI
+
+
+ASSET_PAIRS = {
+    "error": [],
+    "result": {
+        "XXBTZUSD": {"altname": "XBTUSD", "wsname": "XBT/USD", "base": "XXBT", "quote": "ZUSD",
+                     "pair_decimals": 1, "lot_decimals": 8, "leverage_sell": [2, 3]},
+    }
+}
+
+
+@pytest.fixture
+def pair_metadata(monkeypatch):
+    # no disk copy and no request to the exchange
+    monkeypatch.setattr(APIBase, "pair_metadata", PairMetadataCache(cache_dir=None))
+    monkeypatch.setattr(KrakenRestAPI, "_request_pair_metadata", classmethod(lambda cls: ASSET_PAIRS))
+
+
+@pytest.mark.asyncio
+async def test_api_is_long_lived_and_shares_session(pair_metadata):
+    registry = ClientRegistry()
+
+    api = registry.api("Kraken")
+    assert registry.api("kraken") is api
+    assert api.session is registry.session("kraken")
+    assert api.shared_session
+
+    # closing the api must not close the pooled session under other users
+    await api.close()
+    assert registry.api("kraken").session is api.session
+
+    await registry.shutdown()
+    assert registry.api("kraken") is not api
+    await registry.shutdown()
+
+
+def test_startup_creates_limiters_on_each_loop(pair_metadata):
+    registry = ClientRegistry()
+
+    async def run():
+        await registry.startup(["kraken"])
+        limiter = registry.api("kraken").rate_limiter
+        limiter.set_limits("kraken", {"public": (1, 100)})
+        # second and third calls wait for the budget, contending for the counter lock
+        await asyncio.gather(*[limiter.acquire("kraken", None, "public") for _ in range(3)])
+        return limiter
+
+    # for ex tests or supervisor shards, each running their own loop
+    first = asyncio.run(run())
+    second = asyncio.run(run())
+    assert first is not second
+    assert registry.api("kraken").key_scheduler.rate_limiter is second
+
+    asyncio.run(registry.shutdown())
+
+
+def test_settings_registry():
+    assert isinstance(settings.CLIENTS, ClientRegistry)
@@ -0,0 +1,45 @@
+from decimal import Decimal
+
+import pytest
+
+from noobit.models.data.base.numeric import NumericConverter, to_fixed, from_fixed
+from noobit.models.data.websockets.stream.records import TradeRecord
+
+
+def test_to_fixed():
+    assert to_fixed("5541.30000", 1) == 55413
+    assert to_fixed("0.15850568", 8) == 15850568
+    assert to_fixed("12", 2) == 1200
+    assert to_fixed("-0.5", 1) == -5
+    assert from_fixed(55413, 1) == Decimal("5541.3")
+
+
+def test_converter_modes():
+    specs = {"XBT-USD": {"price_decimals": 1, "volume_decimals": 8}}
+
+    assert NumericConverter("decimal").price("5541.3", "XBT-USD") == Decimal("5541.3")
+    assert NumericConverter("float").volume("0.5", "XBT-USD") == 0.5
+    assert NumericConverter("fixed", pair_specs=specs).volume("0.5", "XBT-USD") == 50000000
+
+    with pytest.raises(ValueError):
+        NumericConverter("fixed")
+
+
+def test_converter_to_float():
+    specs = {"XBT-USD": {"price_decimals": 1, "volume_decimals": 8}}
+    fixed = NumericConverter("fixed", pair_specs=specs)
+
+    assert fixed.price_to_float(fixed.price("5541.3", "XBT-USD"), "XBT-USD") == 5541.3
+    assert fixed.volume_to_float(50000000, "XBT-USD") == 0.5
+    assert NumericConverter("decimal").price_to_float(Decimal("5541.3"), "XBT-USD") == 5541.3
+
+
+def test_record_to_dict_scales_fixed_values_back():
+    specs = {"XBT-USD": {"price_decimals": 1, "volume_decimals": 8}}
+    fixed = NumericConverter("fixed", pair_specs=specs)
+    record = TradeRecord(trdMatchID=None, orderID=None, symbol="XBT-USD", side="buy", ordType="limit",
+                         avgPx=55412, cumQty=50000000, grossTradeAmt=55412 * 50000000, transactTime=1)
+
+    values = fixed.record_to_dict(record)
+    assert (values["avgPx"], values["cumQty"], values["grossTradeAmt"]) == (5541.2, 0.5, 2770.6)
+    assert values["transactTime"] == 1
@@ -2,10 +2,14 @@ import logging
 from decimal import Decimal
 
 import ujson
+import pytest
 import stackprinter
 from pydantic import ValidationError
 
+from noobit.server import settings
+from noobit.models.data.base.numeric import NumericConverter
 from noobit.models.data.response.order import OrdersList, OrdersByID
+from noobit.models.data.response.trade import TradesList
 from noobit.models.data.response.parse.kraken import KrakenResponseParser
 
 
@@ -174,3 +178,28 @@ def test_parse_order_response_by_id(response=response, symbol=None, mode="by_id"
         logging.error(stackprinter.format(e, style="darkbg2"))
 
     assert isinstance(validated.data, dict), validated.data
+
+
+
+public_trades = {
+    "XXBTZUSD": [
+        ["8943.10000", "0.01000000", 1588710118.4965, "b", "m", ""],
+        ["8941.10000", "0.04000000", 1588710129.8625, "s", "l", ""],
+    ],
+    "last": "1588712775751709062"
+}
+
+
+def test_parse_public_trades_numeric_modes(monkeypatch):
+    monkeypatch.setitem(settings.SYMBOL_MAP_TO_STANDARD, "KRAKEN", {"XXBTZUSD": "XBT-USD"})
+
+    decimal = KrakenResponseParser().trades(public_trades)
+    floats = KrakenResponseParser(numeric=NumericConverter("float")).trades(public_trades)
+
+    assert decimal["data"][0]["grossTradeAmt"] == Decimal("8943.1") * Decimal("0.01")
+    assert floats["data"][0]["avgPx"] == 8943.1 and floats["data"][0]["cumQty"] == 0.01
+    # both validate to the same Decimal values
+    assert TradesList(**floats).data[1].avgPx == TradesList(**decimal).data[1].avgPx == Decimal("8941.1")
+
+    with pytest.raises(ValueError):
+        KrakenResponseParser(numeric=NumericConverter("fixed", pair_specs={"XBT-USD": {"price_decimals": 1, "volume_decimals": 8}}))
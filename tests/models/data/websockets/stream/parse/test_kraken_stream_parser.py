@@ -0,0 +1,112 @@
+import zlib
+from decimal import Decimal
+
+from noobit.processor.orderbook import L2Book
+from noobit.models.data.base.numeric import NumericConverter
+from noobit.models.data.websockets.stream.parse.base import BaseStreamParser
+from noobit.models.data.websockets.stream.parse.kraken import KrakenStreamParser
+
+
+trades = [
+    0,
+    [
+        ["5541.20000", "0.15850568", "1534614057.321597", "s", "l", ""],
+        ["6060.00000", "0.02455000", "1534614057.324998", "b", "m", ""]
+    ],
+    "trade",
+    "XBT/USD"
+]
+
+
+update = [
+    1234,
+    {"a": [["5541.30000", "2.50700000", "1534614248.456738"]]},
+    {"b": [["5541.20000", "0.00000000", "1534614335.345903"]], "c": "974942666"},
+    "book-10",
+    "XBT/USD"
+]
+
+
+class ValidatedOnlyParser(BaseStreamParser):
+    """Parser without trusted stream methods, records come from the validated path"""
+
+    kraken = KrakenStreamParser()
+
+    def trade(self, message):
+        return self.kraken.trade(message)
+
+    def instrument(self, message):
+        return self.kraken.instrument(message)
+
+    def spread(self, message):
+        return self.kraken.spread(message)
+
+    def orderbook(self, message):
+        return self.kraken.orderbook(message)
+
+
+def test_parse_update_both_sides():
+    parsed = KrakenStreamParser().orderbook(update)
+
+    assert parsed["symbol"] == "XBT-USD"
+    assert parsed["asks"] == {"5541.30000": "2.50700000"}
+    assert parsed["bids"] == {"5541.20000": "0.00000000"}
+    assert parsed["checksum"] == "974942666"
+    assert parsed["is_update"]
+
+
+def test_checksum_keeps_sent_precision():
+    book = L2Book(symbol="XBT-USD", depth=10)
+    book.apply_snapshot(
+        asks={Decimal("0.05005"): Decimal("0.00000500"), Decimal("0.05010"): Decimal("0.00000010")},
+        bids={Decimal("0.05004"): Decimal("0.00000100")}
+    )
+
+    expected = zlib.crc32(b"5005" + b"500" + b"5010" + b"10" + b"5004" + b"100")
+    assert KrakenStreamParser().orderbook_checksum(book) == expected
+
+
+def test_orderbook_record_has_decimal_levels():
+    record = KrakenStreamParser().orderbook_record(update)
+
+    assert record.symbol == "XBT-USD"
+    assert record.asks == {Decimal("5541.3"): Decimal("2.507")}
+    assert record.bids == {Decimal("5541.2"): Decimal("0")}
+    assert record.checksum == 974942666
+    assert not record.is_snapshot
+
+
+def test_trade_records():
+    records = KrakenStreamParser().trade_records(trades)
+
+    assert [r.side for r in records] == ["sell", "buy"]
+    assert [r.ordType for r in records] == ["limit", "market"]
+    assert records[0].symbol == "XBT-USD"
+    assert records[0].transactTime == 1534614057321597000
+    assert records[0].avgPx == Decimal("5541.2")
+    assert records[0].grossTradeAmt == Decimal("5541.2") * Decimal("0.15850568")
+
+
+def test_trade_records_fixed_point():
+    numeric = NumericConverter("fixed", pair_specs={"XBT-USD": {"price_decimals": 1, "volume_decimals": 8}})
+    records = KrakenStreamParser(numeric=numeric).trade_records(trades)
+
+    assert records[0].avgPx == 55412
+    assert records[0].cumQty == 15850568
+    assert records[0].grossTradeAmt == 55412 * 15850568
+
+
+def test_records_fall_back_to_validated_path():
+    parser = ValidatedOnlyParser()
+
+    assert parser.orderbook_record(update) == KrakenStreamParser().orderbook_record(update)
+
+    records = parser.trade_records(trades)
+    expected = KrakenStreamParser().trade_records(trades)
+    assert [r.side for r in records] == ["sell", "buy"]
+    assert [(r.symbol, r.avgPx, r.cumQty) for r in records] == [(r.symbol, r.avgPx, r.cumQty) for r in expected]
+
+
+def test_orderbook_has_exchange_time_of_latest_level():
+    assert KrakenStreamParser().orderbook(update)["utcTime"] == 1534614335345903000
+    assert KrakenStreamParser().orderbook_record(update).utcTime == 1534614335345903000
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from noobit.processor import bar_cache
+from noobit.processor.bar_cache import BarCache, MINUTE, aggregate
+from noobit.processor.trade_store import TradeStore, TRADE_DTYPE
+
+
+def make_records(times, prices=None):
+    records = np.zeros(len(times), dtype=TRADE_DTYPE)
+    records["transactTime"] = times
+    records["avgPx"] = np.arange(len(times)) + 1.0 if prices is None else prices
+    records["cumQty"] = 1
+    return records
+
+
+def expected_bars(records, timeframe):
+    # reference implementation with pandas resampling
+    df = pd.DataFrame(
+        {"avgPx": records["avgPx"], "cumQty": records["cumQty"]},
+        index=pd.to_datetime(records["transactTime"], unit="ns")
+    )
+    resampled = df.resample(f"{timeframe}min").agg({"avgPx": "ohlc", "cumQty": "sum"}).dropna()
+    return resampled.droplevel(0, axis=1)
+
+
+# ================================================================================
+
+
+def test_aggregate():
+    records = make_records([0, MINUTE - 1, MINUTE, 3*MINUTE + 5], prices=[2., 3., 1., 4.])
+    bars = aggregate(records)
+
+    assert bars["utcTime"].tolist() == [0, MINUTE, 3*MINUTE]
+    assert bars[0].tolist() == (0, 2., 3., 2., 3., 2., 2)
+    assert bars["trdCount"].tolist() == [2, 1, 1]
+
+
+def test_update_from_store_only_adds_tail(tmp_path, monkeypatch):
+    monkeypatch.setattr(bar_cache, "CHUNK_ROWS", 7)
+    rng = np.random.default_rng(1)
+    times = np.sort(rng.integers(0, 3 * 1440 * MINUTE, 500))
+    records = make_records(times, prices=rng.random(500))
+
+    store = TradeStore(str(tmp_path), "Kraken", "XBT-USD")
+    cache = BarCache(str(tmp_path), "Kraken", "XBT-USD")
+
+    # several updates, splitting bars of every timeframe
+    for chunk in np.array_split(records, 3):
+        store.append(chunk)
+        assert cache.update_from_store(store) > 0
+    # nothing new, only the trades of the last daily bar are read again
+    cache.update_from_store(store)
+
+    for timeframe in cache.timeframes:
+        df = cache.to_frame(timeframe, fill=False)
+        expected = expected_bars(records, timeframe)
+        assert df.index.equals(expected.index.rename("utcTime"))
+        assert np.allclose(df[["open", "high", "low", "close", "volume"]].values,
+                           expected[["open", "high", "low", "close", "cumQty"]].values)
+
+
+def test_add_trades_merges_last_bar(tmp_path):
+    cache = BarCache(str(tmp_path), "Kraken", "XBT-USD", timeframes=[1, 5])
+    cache.add_trades(make_records([10, 20], prices=[5., 6.]))
+    cache.add_trades(make_records([30, 2*MINUTE], prices=[4., 7.]))
+    assert cache.read(5).tolist() == [(0, 5., 7., 4., 7., 4., 4)]
+
+    # trades of closed bars are ignored
+    cache.add_trades(make_records([40], prices=[100.]))
+    assert cache.read(1).tolist() == [(0, 5., 6., 4., 4., 3., 3), (2*MINUTE, 7., 7., 7., 7., 1., 1)]
+
+
+def test_to_frame_fills_gaps(tmp_path):
+    cache = BarCache(str(tmp_path), "Kraken", "XBT-USD", timeframes=[1])
+    cache.add_trades(make_records([0, 3*MINUTE], prices=[5., 7.]))
+
+    df = cache.to_frame(1)
+    assert len(df) == 4
+    assert df["close"].tolist() == [5., 5., 5., 7.]
+    assert df["volume"].tolist() == [1., 0., 0., 1.]
+    assert len(cache.to_frame(1, count=2)) == 2
+
+
+def test_seed_replaces_tail(tmp_path):
+    cache = BarCache(str(tmp_path), "Kraken", "XBT-USD", timeframes=[1])
+    cache.add_trades(make_records([0, MINUTE, 2*MINUTE]))
+
+    seed = aggregate(make_records([MINUTE, 3*MINUTE], prices=[9., 9.]))
+    cache.seed(1, seed)
+    assert cache.read(1)["utcTime"].tolist() == [0, MINUTE, 3*MINUTE]
+    assert cache.read(1)["close"].tolist() == [1., 9., 9.]
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from noobit.processor.feed_handler import FeedHandler
+from noobit.processor.feed_queue import FeedQueue
+
+
+class ClosedSocket():
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+
+class FeedReader():
+
+    def __init__(self):
+        self.ws = ClosedSocket()
+
+    async def msg_handler(self, msg, publisher):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_stops_all_tasks_when_reconnection_gives_up():
+    fh = FeedHandler(exchanges=["kraken"], private_feeds=[], public_feeds=["trade"], pairs=["XBT/USD"], retries=0)
+    fh.public_feed_readers["kraken"] = FeedReader()
+    fh.public_queues["kraken"] = FeedQueue(maxsize=10)
+
+    async def give_up(feed_reader, backoff):
+        return False
+    fh.reconnect = give_up
+
+    fh.tasks = [fh.consume_public("kraken"), fh.handle_public("kraken"), fh.log_queue_metrics()]
+    await asyncio.wait_for(fh.main(), 1)
+
+    assert fh.terminate
+    assert all(task.done() for task in fh.running_tasks)
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from noobit.processor.feed_queue import FeedQueue
+
+
+def is_book_update(frame):
+    return frame.startswith("book")
+
+
+# ================================================================================
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_droppable():
+    queue = FeedQueue(maxsize=3, policy="drop_oldest", droppable=is_book_update)
+
+    for frame in ["trade-1", "book-1", "book-2", "book-3"]:
+        await queue.put(frame)
+
+    assert [queue.get_nowait() for _ in range(3)] == ["trade-1", "book-2", "book-3"]
+    assert queue.metrics() == {"depth": 0, "max_depth": 3, "received": 4, "dropped": 1}
+
+
+@pytest.mark.asyncio
+async def test_block_when_nothing_droppable():
+    queue = FeedQueue(maxsize=2, policy="drop_oldest", droppable=is_book_update)
+
+    await queue.put("trade-1")
+    await queue.put("trade-2")
+
+    put = asyncio.ensure_future(queue.put("trade-3"))
+    await asyncio.sleep(0)
+    assert not put.done()
+
+    assert queue.get_nowait() == "trade-1"
+    queue.task_done()
+    await asyncio.wait_for(put, 1)
+
+    assert [queue.get_nowait() for _ in range(2)] == ["trade-2", "trade-3"]
+    assert queue.dropped_count == 0
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        FeedQueue(policy="drop_newest")
@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+from noobit.processor.orderbook import L2Book, BookRegistry, L2BookReplica, serialize_levels
+
+
+# ==== PyTest Fixtures
+# ========================================
+
+
+def make_book(depth=3):
+    book = L2Book(symbol="XBT-USD", depth=depth)
+    book.apply_snapshot(
+        asks={Decimal("5541.3"): Decimal("2.5"), Decimal("5541.8"): Decimal("0.33"), Decimal("5542.7"): Decimal("0.647")},
+        bids={Decimal("5541.2"): Decimal("1.529"), Decimal("5539.9"): Decimal("0.3"), Decimal("5539.5"): Decimal("5")}
+    )
+    return book
+
+
+# ================================================================================
+
+
+def test_best_levels():
+    book = make_book()
+
+    assert book.best_ask() == (Decimal("5541.3"), Decimal("2.5"))
+    assert book.best_bid() == (Decimal("5541.2"), Decimal("1.529"))
+
+
+def test_update_replaces_volume():
+    book = make_book()
+    book.apply_update(asks={Decimal("5541.3"): Decimal("1")}, bids={})
+
+    assert book.best_ask() == (Decimal("5541.3"), Decimal("1"))
+
+
+def test_update_zero_volume_deletes_level():
+    book = make_book()
+    book.apply_update(asks={}, bids={Decimal("5541.2"): Decimal("0.00000000")})
+
+    assert Decimal("5541.2") not in book.bids
+    assert book.best_bid() == (Decimal("5539.9"), Decimal("0.3"))
+
+
+def test_update_returns_diff():
+    book = make_book()
+    asks_diff, bids_diff = book.apply_update(asks={Decimal("5540"): Decimal("1")}, bids={Decimal("1"): Decimal("0")})
+
+    # level pushed out of depth is reported as deleted, deleting unknown level is not a change
+    assert asks_diff == {Decimal("5540"): Decimal("1"), Decimal("5542.7"): 0}
+    assert bids_diff == {}
+
+
+def test_update_truncates_to_depth():
+    book = make_book()
+    book.apply_update(asks={Decimal("5540"): Decimal("1")}, bids={Decimal("5541.25"): Decimal("1")})
+
+    assert list(book.asks.keys()) == [Decimal("5540"), Decimal("5541.3"), Decimal("5541.8")]
+    assert list(book.bids.keys()) == [Decimal("5541.25"), Decimal("5541.2"), Decimal("5539.9")]
+
+
+def test_snapshot_replaces_book():
+    book = make_book()
+    book.apply_snapshot(asks={Decimal("6000"): Decimal("1")}, bids={})
+
+    assert len(book) == 1
+    assert book.best_bid() is None
+
+
+def test_registry_books_are_per_symbol():
+    registry = BookRegistry()
+    xbt = registry.get("Kraken", "XBT-USD")
+    eth = registry.get("kraken", "ETH-USD")
+    xbt.apply_snapshot(asks={Decimal("9000"): Decimal("1")}, bids={})
+
+    assert registry.get("kraken", "XBT-USD") is xbt
+    assert registry.find("kraken", "ETH-USD") is eth
+    assert len(eth) == 0
+    assert xbt.is_synced and not eth.is_synced
+    assert registry.find("bitmex", "XBT-USD") is None
+
+
+def test_registry_invalidate_symbols():
+    registry = BookRegistry()
+    xbt = registry.get("kraken", "XBT-USD")
+    eth = registry.get("kraken", "ETH-USD")
+    xbt.apply_snapshot(asks={Decimal("9000"): Decimal("1")}, bids={})
+    eth.apply_snapshot(asks={Decimal("200"): Decimal("1")}, bids={})
+
+    registry.invalidate("kraken", ["XBT-USD", "LTC-USD"])
+
+    assert not xbt.is_synced and len(xbt) == 0
+    assert eth.is_synced
+    assert registry.find("kraken", "LTC-USD") is None
+
+
+def test_replica_follows_diffs():
+    book = make_book()
+    replica = L2BookReplica("XBT-USD")
+    replica.on_snapshot({"sequence": book.sequence, "asks": serialize_levels(book.asks), "bids": serialize_levels(book.bids)})
+
+    asks_diff, bids_diff = book.apply_update(asks={Decimal("5540"): Decimal("1")}, bids={Decimal("5541.2"): Decimal("0")})
+    assert replica.on_diff({"sequence": book.sequence, "asks": serialize_levels(asks_diff), "bids": serialize_levels(bids_diff)})
+
+    assert replica.book.to_dict()["asks"] == book.to_dict()["asks"]
+    assert replica.book.to_dict()["bids"] == book.to_dict()["bids"]
+
+
+def test_replica_waits_for_snapshot_on_gap():
+    replica = L2BookReplica("XBT-USD")
+    replica.on_snapshot({"sequence": 1, "asks": {"10.0": "1"}, "bids": {"9.0": "1"}})
+
+    assert not replica.on_diff({"sequence": 3, "asks": {}, "bids": {}})
+    assert not replica.book.is_synced
+    assert replica.on_snapshot({"sequence": 3, "asks": {"11.0": "1"}, "bids": {}})
+    assert replica.on_diff({"sequence": 4, "asks": {"11.0": "0"}, "bids": {}})
+    assert len(replica.book) == 0
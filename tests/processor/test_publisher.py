@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from noobit.processor.publisher import BatchPublisher
+
+
+class MockPipeline():
+
+    def __init__(self, published):
+        self.published = published
+        self.commands = []
+
+    def publish(self, channel, message):
+        self.commands.append((channel, message))
+
+    async def execute(self):
+        self.published.append(self.commands)
+
+
+class MockRedis():
+
+    def __init__(self):
+        self.published = []
+
+    def pipeline(self):
+        return MockPipeline(self.published)
+
+
+# ================================================================================
+
+
+@pytest.mark.asyncio
+async def test_flush_on_max_batch():
+    redis = MockRedis()
+    publisher = BatchPublisher(redis, max_batch=3, max_delay=10)
+
+    for i in range(7):
+        await publisher.publish("chan", i)
+
+    assert redis.published == [[("chan", 0), ("chan", 1), ("chan", 2)], [("chan", 3), ("chan", 4), ("chan", 5)]]
+
+    await publisher.close()
+    assert redis.published[-1] == [("chan", 6)]
+
+
+@pytest.mark.asyncio
+async def test_flush_after_delay():
+    redis = MockRedis()
+    publisher = BatchPublisher(redis, max_batch=100, max_delay=0)
+
+    await publisher.publish("chan", "a")
+    await publisher.publish("chan", "b")
+    assert redis.published == []
+
+    await asyncio.sleep(0.01)
+    assert redis.published == [[("chan", "a"), ("chan", "b")]]
@@ -0,0 +1,46 @@
+import time
+
+from noobit.processor.reconnect import Backoff
+
+
+def test_delay_is_capped():
+    backoff = Backoff(base=1, cap=10)
+
+    for _ in range(100):
+        backoff.failed()
+        assert 0 <= backoff.delay() <= 10
+
+    assert not backoff.exhausted
+
+
+def test_exhausted():
+    backoff = Backoff(max_retries=2)
+
+    backoff.failed()
+    backoff.failed()
+    assert not backoff.exhausted
+    backoff.failed()
+    assert backoff.exhausted
+
+
+def test_reset_after_healthy_period():
+    backoff = Backoff(max_retries=2, reset_after=0.01)
+
+    backoff.failed()
+    backoff.failed()
+    backoff.connected()
+    time.sleep(0.02)
+    backoff.failed()
+
+    assert backoff.attempts == 1
+    assert backoff.reconnect_count == 3
+
+
+def test_no_reset_on_short_connection():
+    backoff = Backoff(reset_after=60)
+
+    backoff.failed()
+    backoff.connected()
+    backoff.failed()
+
+    assert backoff.attempts == 2
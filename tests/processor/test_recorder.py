@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+import pytest
+import pyarrow.parquet as pq
+
+from noobit.processor.recorder import Recorder
+from noobit.models.data.base.numeric import NumericConverter
+from noobit.models.data.websockets.stream.records import TradeRecord
+
+
+def make_trade(price, volume, timestamp):
+    return TradeRecord(trdMatchID=None, orderID=None, symbol="XBT-USD", side="buy", ordType="limit",
+                       avgPx=price, cumQty=volume, grossTradeAmt=price*volume, transactTime=timestamp)
+
+
+# ================================================================================
+
+
+@pytest.mark.asyncio
+async def test_trades_are_partitioned_by_day(tmp_path):
+    recorder = Recorder(root=str(tmp_path))
+    numeric = NumericConverter("decimal")
+
+    recorder.record_trades("kraken", [make_trade(Decimal("5541.2"), Decimal("0.5"), 1534614057321597000)], numeric)
+    # next day
+    recorder.record_trades("kraken", [make_trade(Decimal("5542"), Decimal("1"), 1534700457321597000)], numeric)
+    await recorder.close()
+
+    first = list((tmp_path / "trade" / "exchange=kraken" / "symbol=XBT-USD" / "date=2018-08-18").iterdir())
+    second = list((tmp_path / "trade" / "exchange=kraken" / "symbol=XBT-USD" / "date=2018-08-19").iterdir())
+    assert len(first) == len(second) == 1
+
+    table = pq.read_table(str(first[0]))
+    assert table.to_pydict()["avgPx"] == [5541.2]
+    assert table.to_pydict()["transactTime"] == [1534614057321597000]
+    assert recorder.written_count == 2
+
+
+@pytest.mark.asyncio
+async def test_orderbook_rows(tmp_path):
+    recorder = Recorder(root=str(tmp_path))
+
+    recorder.record_orderbook("kraken", "XBT-USD", 1, {Decimal("5541.3"): Decimal("2")}, {Decimal("5541.2"): Decimal("1")}, is_snapshot=True)
+    recorder.record_orderbook("kraken", "XBT-USD", 2, {Decimal("5541.3"): Decimal("0")}, {}, is_snapshot=False)
+    await recorder.close()
+
+    path = next((tmp_path / "orderbook" / "exchange=kraken" / "symbol=XBT-USD").glob("*/*.parquet"))
+    rows = pq.read_table(str(path)).to_pydict()
+    assert rows["sequence"] == [1, 1, 2]
+    assert rows["side"] == ["ask", "bid", "ask"]
+    assert rows["volume"] == [2.0, 1.0, 0.0]
+
+
+@pytest.mark.asyncio
+async def test_orderbook_rows_use_exchange_clock(tmp_path):
+    recorder = Recorder(root=str(tmp_path))
+
+    recorder.record_orderbook("kraken", "XBT-USD", 1, {Decimal("5541.3"): Decimal("2")}, {}, is_snapshot=True, utcTime=1534614248456738000)
+    recorder.record_orderbook("kraken", "XBT-USD", 2, {Decimal("5541.3"): Decimal("0")}, {}, is_snapshot=False, utcTime=1534614335345903000)
+    # resync snapshot with older levels
+    recorder.record_orderbook("kraken", "XBT-USD", 1, {Decimal("5541.4"): Decimal("1")}, {}, is_snapshot=True, utcTime=1534614000000000000)
+    await recorder.close()
+
+    path = next((tmp_path / "orderbook" / "exchange=kraken" / "symbol=XBT-USD").glob("*/*.parquet"))
+    rows = pq.read_table(str(path)).to_pydict()
+    assert rows["utcTime"] == [1534614248456738000, 1534614335345903000, 1534614335345903000]
+
+
+@pytest.mark.asyncio
+async def test_files_are_closed_once_too_old(tmp_path):
+    recorder = Recorder(root=str(tmp_path), max_file_age=0)
+    numeric = NumericConverter("decimal")
+
+    recorder.record_trades("kraken", [make_trade(Decimal("5541.2"), Decimal("0.5"), 1534614057321597000)], numeric)
+    await recorder.flush()
+    recorder.record_trades("kraken", [make_trade(Decimal("5542"), Decimal("1"), 1534614058321597000)], numeric)
+    await recorder.flush()
+
+    # files are readable without closing the recorder (as if the process was killed)
+    paths = sorted((tmp_path / "trade" / "exchange=kraken" / "symbol=XBT-USD").glob("*/*.parquet"))
+    assert len(paths) == 2
+    assert [pq.read_table(str(path)).num_rows for path in paths] == [1, 1]
+    await recorder.close()
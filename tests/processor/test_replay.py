@@ -0,0 +1,147 @@
+import zlib
+import asyncio
+from decimal import Decimal
+
+import pytest
+import ujson
+
+from noobit.processor.recorder import Recorder
+from noobit.processor.orderbook import L2Book
+from noobit.processor.replay import trade_messages, orderbook_messages, ReplayServer
+from noobit.models.data.websockets.stream.parse.kraken.orderbook import parse_orderbook_record, checksum_orderbook
+
+
+def test_trades_with_same_timestamp_are_grouped():
+    rows = [
+        {"transactTime": 1534614057321597000, "avgPx": 5541.2, "cumQty": 0.5, "side": "sell", "ordType": "limit"},
+        {"transactTime": 1534614057321597000, "avgPx": 5541.3, "cumQty": 1.0, "side": "buy", "ordType": "market"},
+        {"transactTime": 1534614058000000000, "avgPx": 5542.0, "cumQty": 2.0, "side": "buy", "ordType": "limit"},
+    ]
+    messages = list(trade_messages(iter(rows), "XBT/USD"))
+
+    assert len(messages) == 2
+    timestamp, msg = messages[0]
+    assert timestamp == 1534614057321597000
+    assert msg == [
+        [["5541.2", "0.5", "1534614057.321597000", "s", "l", ""], ["5541.3", "1.0", "1534614057.321597000", "b", "m", ""]],
+        "trade",
+        "XBT/USD"
+    ]
+
+
+def test_orderbook_snapshot_and_updates():
+    rows = [
+        {"utcTime": 1, "sequence": 1, "is_snapshot": True, "side": "ask", "price": 5541.3, "volume": 2.0},
+        {"utcTime": 1, "sequence": 1, "is_snapshot": True, "side": "bid", "price": 5541.2, "volume": 1.0},
+        {"utcTime": 2, "sequence": 2, "is_snapshot": False, "side": "bid", "price": 5541.2, "volume": 0.0},
+        {"utcTime": 3, "sequence": 3, "is_snapshot": False, "side": None, "price": None, "volume": None},
+    ]
+    messages = [msg for _, msg in orderbook_messages(iter(rows), "XBT/USD", 10)]
+
+    # update checksum of the book left with ask 5541.3 x 2.0
+    assert messages == [
+        [{"as": [["5541.3", "2.0", "0.000000001"]], "bs": [["5541.2", "1.0", "0.000000001"]]}, "book-10", "XBT/USD"],
+        [{"b": [["5541.2", "0.0", "0.000000002"]], "c": str(zlib.crc32(b"5541320"))}, "book-10", "XBT/USD"],
+    ]
+
+
+def test_orderbook_checksums_detect_missing_update():
+    rows = [
+        {"utcTime": 1, "sequence": 1, "is_snapshot": True, "side": "ask", "price": 0.00012, "volume": 2.0},
+        {"utcTime": 1, "sequence": 1, "is_snapshot": True, "side": "bid", "price": 0.00011, "volume": 0.00001},
+        {"utcTime": 2, "sequence": 2, "is_snapshot": False, "side": "ask", "price": 0.000115, "volume": 1.5},
+        {"utcTime": 3, "sequence": 3, "is_snapshot": False, "side": "bid", "price": 0.00011, "volume": 3.0},
+    ]
+    messages = [[0, *msg] for _, msg in orderbook_messages(iter(rows), "XBT/USD", 10)]
+
+    # small values are not sent in scientific notation
+    assert messages[0][1]["bs"][0][:2] == ["0.00011", "0.00001"]
+
+    def apply(book, msg):
+        record = parse_orderbook_record(msg)
+        if record.is_snapshot:
+            book.apply_snapshot(record.asks, record.bids)
+        else:
+            book.apply_update(record.asks, record.bids)
+        return record.checksum
+
+    book = L2Book("XBT-USD")
+    for msg in messages:
+        checksum = apply(book, msg)
+        assert checksum is None or checksum == checksum_orderbook(book)
+
+    # reader that dropped the first update
+    book = L2Book("XBT-USD")
+    apply(book, messages[0])
+    assert apply(book, messages[2]) != checksum_orderbook(book)
+
+
+def test_subscribe_unrecorded_feed():
+    server = ReplayServer(root="")
+    statuses = server.subscribe({"event": "subscribe", "pair": ["XBT/USD"], "subscription": {"name": "ticker"}})
+
+    assert statuses[0]["status"] == "error"
+
+
+
+class MockWebSocket():
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    async def recv(self):
+        return await self.incoming.get()
+
+    async def send(self, payload):
+        self.sent.append(ujson.loads(payload))
+
+
+async def wait_for_message(ws, condition, start=0):
+    for _ in range(200):
+        for msg in ws.sent[start:]:
+            if condition(msg):
+                return msg
+        await asyncio.sleep(0.01)
+    raise AssertionError("message not sent")
+
+
+@pytest.mark.asyncio
+async def test_book_subscribed_again_mid_replay_starts_with_snapshot(tmp_path):
+    recorder = Recorder(root=str(tmp_path))
+    start = 1534614000 * 10**9
+    recorder.record_orderbook("kraken", "XBT-USD", 1, {Decimal("5541.3"): Decimal("2")}, {Decimal("5541.2"): Decimal("1")}, True, utcTime=start)
+    for sequence in range(2, 12):
+        recorder.record_orderbook("kraken", "XBT-USD", sequence, {Decimal("5541.3"): Decimal(sequence)}, {}, False, utcTime=start + sequence * 10**9)
+    await recorder.close()
+
+    server = ReplayServer(root=str(tmp_path), speed=50, settle=0.01)
+    ws = MockWebSocket()
+    handler = asyncio.ensure_future(server.handler(ws, "/"))
+
+    subscription = {"pair": ["XBT/USD"], "subscription": {"name": "book", "depth": 10}}
+    await ws.incoming.put(ujson.dumps({"event": "subscribe", **subscription}))
+    await wait_for_message(ws, lambda msg: isinstance(msg, list) and "c" in msg[1])
+
+    # as readers do on checksum mismatch
+    await ws.incoming.put(ujson.dumps({"event": "unsubscribe", **subscription}))
+    await ws.incoming.put(ujson.dumps({"event": "subscribe", **subscription}))
+    unsubscribed = await wait_for_message(ws, lambda msg: isinstance(msg, dict) and msg.get("status") == "unsubscribed")
+    resubscribed = await wait_for_message(ws, lambda msg: isinstance(msg, dict) and msg.get("status") == "subscribed", ws.sent.index(unsubscribed))
+    await wait_for_message(ws, lambda msg: isinstance(msg, list) and msg[1].get("a") == [["5541.3", "11.0", "1534614011.000000000"]])
+    handler.cancel()
+
+    channel_id = resubscribed["channelID"]
+    assert channel_id != unsubscribed["channelID"]
+    resumed = [msg for msg in ws.sent if isinstance(msg, list) and msg[0] == channel_id]
+    assert "as" in resumed[0][1]
+
+    # updates after the snapshot match the reader book
+    book = L2Book("XBT-USD")
+    for msg in resumed:
+        record = parse_orderbook_record(msg)
+        if record.is_snapshot:
+            book.apply_snapshot(record.asks, record.bids)
+        else:
+            book.apply_update(record.asks, record.bids)
+            assert record.checksum == checksum_orderbook(book)
@@ -0,0 +1,111 @@
+import time
+import asyncio
+
+import pytest
+
+from noobit.processor.feed_handler import FeedHandler
+from noobit.processor.supervisor import plan_shards, Shard, FeedHandlerSupervisor
+
+
+def test_plan_shards():
+    shards = plan_shards(exchanges=["Kraken"],
+                         private_feeds=["trade", "order"],
+                         public_feeds=["trade", "orderbook"],
+                         pairs=["XBT-USD", "ETH-USD", "LTC-USD"],
+                         symbols_per_shard=2
+                         )
+
+    assert shards == [
+        Shard("kraken", ("trade", "order"), (), ()),
+        Shard("kraken", (), ("trade", ), ("XBT-USD", "ETH-USD")),
+        Shard("kraken", (), ("trade", ), ("LTC-USD", )),
+        Shard("kraken", (), ("orderbook", ), ("XBT-USD", "ETH-USD")),
+        Shard("kraken", (), ("orderbook", ), ("LTC-USD", )),
+    ]
+    assert shards[3].name == "kraken:orderbook:XBT-USD-ETH-USD"
+
+
+def test_plan_shards_no_private():
+    shards = plan_shards(["kraken"], [], ["spread"], ["XBT-USD"])
+    assert shards == [Shard("kraken", (), ("spread", ), ("XBT-USD", ))]
+
+
+class Process():
+
+    def __init__(self):
+        self.alive = True
+        self.exitcode = None
+
+    def is_alive(self):
+        return self.alive
+
+
+class Heartbeat():
+
+    def __init__(self, value):
+        self.value = value
+
+
+@pytest.fixture
+def supervisor(monkeypatch):
+    shard = Shard("kraken", (), ("trade", ), ("XBT-USD", ))
+    supervisor = FeedHandlerSupervisor([shard], heartbeat_timeout=30, restart_delay=5)
+
+    def start_shard(shard):
+        supervisor.processes[shard] = Process()
+        supervisor.heartbeats[shard] = Heartbeat(time.time())
+        supervisor.started_at[shard] = time.time()
+
+    monkeypatch.setattr(supervisor, "start_shard", start_shard)
+    monkeypatch.setattr(supervisor, "stop_shard", lambda shard: None)
+    start_shard(shard)
+    return supervisor
+
+
+def test_stalled_shard_is_restarted(supervisor):
+    [shard] = supervisor.shards
+    supervisor.check_shards()
+    assert supervisor.restarts[shard] == 0
+
+    # no frame received on one of the connections
+    supervisor.heartbeats[shard].value -= 60
+    # restart delay not elapsed yet
+    supervisor.check_shards()
+    assert supervisor.restarts[shard] == 0
+
+    supervisor.started_at[shard] -= 10
+    supervisor.check_shards()
+    assert supervisor.restarts[shard] == 1
+    assert supervisor.is_healthy(shard)
+
+
+def test_exited_shard_is_restarted(supervisor):
+    [shard] = supervisor.shards
+    supervisor.processes[shard].alive = False
+    supervisor.started_at[shard] -= 10
+
+    assert not supervisor.is_healthy(shard)
+    supervisor.check_shards()
+    assert supervisor.restarts[shard] == 1
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_is_last_frame_of_stalest_connection():
+    heartbeat = Heartbeat(0)
+    fh = FeedHandler(exchanges=["kraken"], private_feeds=[], public_feeds=["trade"], pairs=["XBT/USD"],
+                     heartbeat=heartbeat, heartbeat_interval=0.01)
+
+    async def beat_once():
+        task = asyncio.ensure_future(fh.beat())
+        await asyncio.sleep(0.02)
+        fh.terminate = True
+        await task
+        fh.terminate = False
+
+    # still setting up
+    await beat_once()
+    assert time.time() - heartbeat.value < 1
+
+    fh.last_frame_at = {("public", "kraken"): 100., ("private", "kraken"): 200.}
+    await beat_once()
+    assert heartbeat.value == 100.
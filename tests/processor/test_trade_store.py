@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from noobit.processor import trade_store
+from noobit.processor.trade_store import TradeStore, TRADE_DTYPE, to_records
+
+
+def make_records(times):
+    records = np.zeros(len(times), dtype=TRADE_DTYPE)
+    records["transactTime"] = times
+    records["avgPx"] = np.arange(len(times)) + 0.5
+    return records
+
+
+@pytest.fixture
+def small_index(monkeypatch):
+    monkeypatch.setattr(trade_store, "INDEX_STEP", 4)
+
+
+# ================================================================================
+
+
+def test_append_and_range_query(tmp_path, small_index):
+    store = TradeStore(str(tmp_path), "Kraken", "XBT-USD")
+    # several appends, index entries must follow global rows
+    for chunk in np.array_split(np.arange(0, 1000, 10), 7):
+        store.append(make_records(chunk))
+
+    assert len(store) == 100
+    assert store.last_timestamp == 990
+    assert store._read_index()["row"].tolist() == list(range(0, 100, 4))
+
+    assert store.read(start=250, end=300)["transactTime"].tolist() == [250, 260, 270, 280, 290]
+    assert store.read(start=255, end=261)["transactTime"].tolist() == [260]
+    assert len(store.read(end=0)) == 0
+    assert len(store.read(start=2000)) == 0
+    assert isinstance(store.read(), np.memmap)
+
+
+def test_append_out_of_order(tmp_path):
+    store = TradeStore(str(tmp_path), "Kraken", "XBT-USD")
+    store.append(make_records([10, 20]))
+    with pytest.raises(ValueError):
+        store.append(make_records([15]))
+
+
+def test_truncate(tmp_path, small_index):
+    store = TradeStore(str(tmp_path), "Kraken", "XBT-USD")
+    store.append(make_records(list(range(20))))
+    store.truncate(9)
+
+    assert len(store) == 9
+    assert store._read_index()["row"].tolist() == [0, 4, 8]
+    store.append(make_records(list(range(9, 20))))
+    assert store.read()["transactTime"].tolist() == list(range(20))
+    assert store._read_index()["row"].tolist() == [0, 4, 8, 12, 16]
+
+
+def test_to_records_and_frame(tmp_path):
+    store = TradeStore(str(tmp_path), "Kraken", "XBT-USD")
+    store.append(to_records([
+        {"transactTime": 1588712775751709062, "avgPx": "8888.1", "cumQty": "0.5", "side": "sell", "ordType": "limit"},
+    ]))
+
+    df = store.to_frame()
+    assert df.index.name == "transactTime"
+    assert df["avgPx"].iloc[0] == 8888.1
+    assert store.read()["side"][0] == 1
+
+
+def test_import_legacy_csv(tmp_path):
+    csv_path = tmp_path / "kraken_XBT-USD_historical_trade_data_fix_api.csv"
+    csv_path.write_text(
+        "symbol,side,ordType,avgPx,cumQty,grossTradeAmt,transactTime\n"
+        "XBT-USD,buy,market,1.0,1.0,1.0,0\n"
+        "XBT-USD,buy,market,2.0,1.0,2.0,200\n"
+        "XBT-USD,sell,limit,3.0,1.0,3.0,100\n"
+    )
+    store = TradeStore(str(tmp_path), "Kraken", "XBT-USD")
+
+    assert store.import_legacy_csv() == 2
+    assert store.read()["transactTime"].tolist() == [100, 200]
+    # only imported once
+    assert store.import_legacy_csv() == 0